@@ -0,0 +1,123 @@
+"""Сравнение пропускной способности WSGI и ASGI на страницах чтения.
+
+Запуск (нужны пакеты из benchmarks/requirements.txt):
+
+    python -m benchmarks.asgi_vs_wsgi --notes 1000 --duration 10
+
+Поднимает gunicorn (WSGI, потоки) и uvicorn (ASGI) на отдельной базе,
+авторизуется одним пользователем и для каждого уровня конкурентности
+меряет rps и p50/p95/p99 на синхронном и асинхронном списке и API.
+"""
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from benchmarks.load import http_load, start_server, wait_for_port
+
+HOST = '127.0.0.1'
+TARGETS = (
+    # (сервер, путь)
+    ('wsgi', '/notes/'),
+    ('asgi', '/notes/'),
+    ('asgi', '/async/notes/'),
+    ('wsgi', '/api/notes/'),
+    ('asgi', '/api/notes/'),
+    ('asgi', '/async/api/notes/'),
+)
+
+
+def prepare_database(path, notes):
+    """Создаёт базу, пользователя с notes заметками и его сессию."""
+    os.environ['YANOTE_DATABASE'] = str(path)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+    import django
+    django.setup()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test import Client
+
+    from notes.models import Note
+
+    call_command('migrate', verbosity=0)
+    user = get_user_model().objects.create(username='bench')
+    Note.objects.bulk_create(
+        Note(title=f'Заметка {index}', text='Текст ' * 50,
+             slug=f'bench-{index}', author=user)
+        for index in range(notes)
+    )
+    client = Client()
+    client.force_login(user)
+    return client.cookies['sessionid'].value
+
+
+def start_servers(wsgi_port, asgi_port, workers, threads):
+    return {
+        'wsgi': (
+            start_server('wsgi', HOST, wsgi_port, workers, threads),
+            wsgi_port,
+        ),
+        'asgi': (
+            start_server('asgi', HOST, asgi_port, workers, threads),
+            asgi_port,
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument(
+        '--concurrency', type=int, nargs='+', default=(1, 8, 32, 64)
+    )
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument(
+        '--threads', type=int, default=8,
+        help='Потоков на воркер gunicorn.',
+    )
+    parser.add_argument('--wsgi-port', type=int, default=8801)
+    parser.add_argument('--asgi-port', type=int, default=8802)
+    parser.add_argument('--output', help='Куда сохранить JSON с результатами.')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        session = prepare_database(
+            Path(directory) / 'bench.sqlite3', options.notes
+        )
+        servers = start_servers(
+            options.wsgi_port, options.asgi_port,
+            options.workers, options.threads,
+        )
+        try:
+            for _, port in servers.values():
+                wait_for_port(HOST, port)
+            results = []
+            headers = {'Cookie': f'sessionid={session}'}
+            for concurrency in options.concurrency:
+                for server, path in TARGETS:
+                    stats = http_load(
+                        HOST, servers[server][1], path, concurrency,
+                        options.duration, headers,
+                    )
+                    stats.update(
+                        server=server, path=path, concurrency=concurrency
+                    )
+                    results.append(stats)
+                    print(
+                        f'{server:4} {path:20} c={concurrency:<3} '
+                        f'{stats["rps"]:>8} rps  '
+                        f'p99 {stats["p99_ms"]} ms  '
+                        f'ошибок {stats["errors"]}'
+                    )
+        finally:
+            for process, _ in servers.values():
+                process.terminate()
+                process.wait()
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
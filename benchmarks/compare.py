@@ -0,0 +1,59 @@
+"""Сравнение двух отчётов benchmarks.suite.
+
+    python -m benchmarks.compare base.json head.json
+
+Печатает rps и p99 по каждому (режим, сценарий, конкурентность),
+которые есть в обоих отчётах, и изменение rps в процентах.
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def load(path):
+    report = json.loads(Path(path).read_text())
+    return report['meta'], {
+        (row['mode'], row['scenario'], row['concurrency']): row
+        for row in report['results']
+    }
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return round((new - old) / old * 100, 1)
+
+
+def compare(base, head):
+    rows = []
+    for key in base:
+        if key in head:
+            old, new = base[key], head[key]
+            rows.append((
+                *key, old['rps'], new['rps'],
+                change(old['rps'], new['rps']),
+                old['p99_ms'], new['p99_ms'],
+            ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('head')
+    options = parser.parse_args()
+    base_meta, base = load(options.base)
+    head_meta, head = load(options.head)
+    print(f'{base_meta.get("commit")} -> {head_meta.get("commit")}')
+    for mode, scenario, concurrency, *values in compare(base, head):
+        old_rps, new_rps, delta, old_p99, new_p99 = values
+        delta = 'н/д' if delta is None else f'{delta:+}%'
+        print(
+            f'{mode:6} {scenario:7} c={concurrency:<3} '
+            f'rps {old_rps:>8} -> {new_rps:<8} ({delta})  '
+            f'p99 {old_p99} -> {new_p99} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Быстрое наполнение базы: users пользователей по notes заметок.
+
+    export YANOTE_DATABASE=/tmp/bench.sqlite3
+    python -m benchmarks.data --users 100 --notes 1000
+
+Пользователи и заметки создаются через bulk_create пачками; пароль
+хешируется один раз и общий у всех пользователей (PASSWORD), чтобы
+сценарий входа мог им воспользоваться.
+"""
+import argparse
+import os
+import time
+
+PASSWORD = 'bench-password-1'
+TEXT = 'Текст заметки для нагрузочного теста. ' * 10
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+    import django
+    django.setup()
+
+
+def slug(user_index, number):
+    return f'bench-{user_index}-{number}'
+
+
+def generate(users, notes, batch_size=1000, prefix='bench'):
+    """Создаёт пользователей с заметками, возвращает [(user, slugs)]."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import transaction
+
+    from notes import search, sharding
+    from notes.models import Note
+
+    user_model = get_user_model()
+    password = make_password(PASSWORD)
+    user_model.objects.bulk_create(
+        (user_model(username=f'{prefix}-{index}', password=password)
+         for index in range(users)),
+        batch_size=batch_size,
+    )
+    # SQLite не возвращает pk из bulk_create в Django 3.2.
+    created = list(user_model.objects.filter(
+        username__startswith=f'{prefix}-'
+    ).order_by('id'))
+    result = []
+    for index, user in enumerate(created):
+        alias = sharding.shard_for(user.pk)
+        slugs = [slug(index, number) for number in range(notes)]
+        with transaction.atomic(using=alias):
+            sharding.claim_slugs(user.pk, slugs)
+            Note.objects.using(alias).bulk_create(
+                (Note(title=f'Заметка {number}', text=TEXT,
+                      slug=value, author=user)
+                 for number, value in enumerate(slugs)),
+                batch_size=batch_size,
+            )
+        result.append((user, slugs))
+    # bulk_create обходит сигналы, индекс строим одним проходом.
+    search.rebuild(batch_size=batch_size)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--notes', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    options = parser.parse_args()
+    setup()
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    started = time.monotonic()
+    generate(options.users, options.notes, options.batch_size)
+    print(
+        f'Создано {options.users} x {options.notes} заметок '
+        f'за {time.monotonic() - started:.1f} с'
+    )
+
+
+if __name__ == '__main__':
+    main()
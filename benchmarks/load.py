@@ -0,0 +1,118 @@
+import http.client
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+SERVERS = {
+    'wsgi': 'gunicorn',
+    'asgi': 'uvicorn',
+}
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': _ms(percentile(latencies, 0.50)),
+        'p95_ms': _ms(percentile(latencies, 0.95)),
+        'p99_ms': _ms(percentile(latencies, 0.99)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def http_load(host, port, path, concurrency, duration, headers=None):
+    """Гоняет GET-запросы в concurrency потоков duration секунд.
+
+    Каждый поток держит своё keep-alive соединение. Ответ, отличный
+    от 200, считается ошибкой.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        own_latencies = []
+        own_errors = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(
+                    host, port, timeout=30
+                )
+                ok = False
+            if ok:
+                own_latencies.append(time.perf_counter() - started)
+            else:
+                own_errors += 1
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            errors[0] += own_errors
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.monotonic() - started)
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер на порту {port} не поднялся за {timeout} с')
+
+
+def start_server(kind, host, port, workers, threads):
+    """Запускает gunicorn (wsgi) или uvicorn (asgi) с текущим окружением."""
+    binary = SERVERS[kind]
+    if shutil.which(binary) is None:
+        sys.exit(
+            f'Не найден {binary}: pip install -r benchmarks/requirements.txt'
+        )
+    if kind == 'wsgi':
+        command = [
+            binary, 'yanote.wsgi', '--bind', f'{host}:{port}',
+            '--workers', str(workers), '--threads', str(threads),
+            '--log-level', 'warning',
+        ]
+    else:
+        command = [
+            binary, 'yanote.asgi:application', '--host', host,
+            '--port', str(port), '--workers', str(workers),
+            '--log-level', 'warning', '--no-access-log',
+        ]
+    return subprocess.Popen(command, env=dict(os.environ))
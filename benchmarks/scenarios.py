@@ -0,0 +1,95 @@
+"""Сценарии нагрузки: каждый готовит запрос и возвращает его замер.
+
+Сценарий получает Worker и возвращает функцию без аргументов, которая
+делает один измеряемый запрос и возвращает, удался ли он. Подготовка
+(выбор заметки, создание заметки под удаление) в замер не входит.
+"""
+import itertools
+import random
+
+from benchmarks.data import PASSWORD, TEXT
+
+# Общий счётчик для уникальных slug и имён между потоками и прогонами.
+_sequence = itertools.count()
+
+
+class Worker:
+    """Состояние одного потока нагрузки.
+
+    session - клиент, вошедший под username, guest - анонимный клиент
+    для регистрации и входа, slugs - заметки пользователя.
+    """
+
+    def __init__(self, number, username, slugs, session, guest):
+        self.username = username
+        self.slugs = slugs
+        self.session = session
+        self.guest = guest
+        self.created = []
+        self.rng = random.Random(number)
+
+    def unique(self, kind):
+        return f'{kind}-{next(_sequence)}'
+
+
+def notes_list(worker):
+    return lambda: worker.session.get('/notes/') == 200
+
+
+def note_detail(worker):
+    slug = worker.rng.choice(worker.slugs)
+    return lambda: worker.session.get(f'/note/{slug}/') == 200
+
+
+def note_create(worker):
+    slug = worker.unique('bench-new')
+    data = {'title': f'Заметка {slug}', 'text': TEXT, 'slug': slug}
+
+    def request():
+        ok = worker.session.post('/add/', data) == 302
+        if ok:
+            worker.created.append(slug)
+        return ok
+    return request
+
+
+def note_edit(worker):
+    slug = worker.rng.choice(worker.slugs)
+    data = {
+        'title': f'Заметка {worker.rng.random()}', 'text': TEXT, 'slug': slug,
+    }
+    return lambda: worker.session.post(f'/edit/{slug}/', data) == 302
+
+
+def note_delete(worker):
+    if not worker.created:
+        note_create(worker)()
+    if not worker.created:
+        return lambda: False
+    slug = worker.created.pop()
+    return lambda: worker.session.post(f'/delete/{slug}/', {}) == 302
+
+
+def signup(worker):
+    data = {
+        'username': worker.unique('signup'),
+        'password1': PASSWORD,
+        'password2': PASSWORD,
+    }
+    return lambda: worker.guest.post('/auth/signup/', data) == 302
+
+
+def login(worker):
+    data = {'username': worker.username, 'password': PASSWORD}
+    return lambda: worker.guest.post('/auth/login/', data) == 302
+
+
+SCENARIOS = {
+    'list': notes_list,
+    'detail': note_detail,
+    'create': note_create,
+    'edit': note_edit,
+    'delete': note_delete,
+    'signup': signup,
+    'login': login,
+}
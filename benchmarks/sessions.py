@@ -0,0 +1,97 @@
+"""Клиенты для сценариев: тестовый клиент Django и настоящий HTTP.
+
+У обоих get(path) и post(path, data) возвращают код ответа; 0 - ошибка
+соединения.
+"""
+import http.client
+from urllib.parse import urlencode
+
+
+class ClientSession:
+    """Запросы в том же процессе через django.test.Client."""
+
+    def __init__(self, user=None):
+        from django.test import Client
+
+        self.client = Client(raise_request_exception=False)
+        if user is not None:
+            self.client.force_login(user)
+
+    def get(self, path):
+        return self._finish(self.client.get(path))
+
+    def post(self, path, data):
+        return self._finish(self.client.post(path, data))
+
+    def _finish(self, response):
+        from django.db import close_old_connections
+
+        # Тестовый клиент не закрывает соединения сам - делаем это
+        # как обработчик запросов, с учётом CONN_MAX_AGE.
+        close_old_connections()
+        return response.status_code
+
+
+class HttpSession:
+    """Keep-alive соединение к серверу с cookie и CSRF-токеном."""
+
+    def __init__(self, host, port, cookies=None):
+        self.host = host
+        self.port = port
+        self.cookies = dict(cookies or {})
+        self.connection = None
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, data):
+        if 'csrftoken' not in self.cookies:
+            # Страница формы выставляет cookie с CSRF-токеном.
+            self.get(path)
+        data = dict(data, csrfmiddlewaretoken=self.cookies.get('csrftoken'))
+        return self.request('POST', path, urlencode(data), {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        })
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        response = self._send(method, path, body, headers)
+        if response is None:
+            return 0
+        for header in response.headers.get_all('Set-Cookie') or ():
+            name, _, rest = header.partition('=')
+            value = rest.split(';', 1)[0].strip('"')
+            if value:
+                self.cookies[name] = value
+            else:
+                self.cookies.pop(name, None)
+        return response.status
+
+    def _send(self, method, path, body, headers):
+        # Сервер закрывает простаивающие keep-alive соединения, поэтому
+        # ошибку на старом соединении повторяем один раз на новом.
+        reused = self.connection is not None
+        while True:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=30
+                )
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                response.read()
+                return response
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if not reused:
+                    return None
+                reused = False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,160 @@
+"""Смешанная нагрузка чтение/запись на страницы заметок для профилей SQLite.
+
+    python -m benchmarks.sqlite_profile --threads 8 --duration 10
+
+Каждый профиль запускается в отдельном процессе на своей базе:
+
+* default - django.db.backends.sqlite3, журнал по умолчанию,
+  соединение открывается на каждый запрос;
+* tuned - yanote.backends.sqlite3 с PRAGMA и CONN_MAX_AGE из settings.
+
+Потоки ходят через тестовый клиент Django: чтение списка и заметки,
+и с долей --write-ratio редактирование своей заметки.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.load import summarize
+
+PROFILES = ('default', 'tuned')
+
+
+def configure(profile, path):
+    os.environ['YANOTE_DATABASE'] = str(path)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+    from yanote import settings
+    if profile == 'default':
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': str(path),
+        }
+    import django
+    django.setup()
+
+
+def prepare(threads, notes):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.test import Client
+
+    from notes.models import Note
+
+    call_command('migrate', verbosity=0)
+    clients = []
+    for index in range(threads):
+        user = get_user_model().objects.create(username=f'bench-{index}')
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {number}', text='Текст ' * 50,
+                 slug=f'bench-{index}-{number}', author=user)
+            for number in range(notes)
+        )
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        clients.append((client, [f'bench-{index}-{number}'
+                                 for number in range(notes)]))
+    return clients
+
+
+def run_profile(options):
+    from django.db import close_old_connections
+
+    clients = prepare(options.threads, options.notes)
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + options.duration
+
+    def worker(client, slugs, seed):
+        rng = random.Random(seed)
+        own = {'read': [], 'write': []}
+        own_errors = {'read': 0, 'write': 0}
+        while time.monotonic() < deadline:
+            slug = rng.choice(slugs)
+            started = time.perf_counter()
+            if rng.random() < options.write_ratio:
+                kind = 'write'
+                response = client.post(f'/edit/{slug}/', {
+                    'title': f'Заметка {rng.random()}',
+                    'text': 'Текст ' * 50,
+                    'slug': slug,
+                })
+                ok = response.status_code == 302
+            else:
+                kind = 'read'
+                path = rng.choice(('/notes/', f'/note/{slug}/'))
+                ok = client.get(path).status_code == 200
+            # Тестовый клиент не закрывает соединения сам - делаем это
+            # как обработчик запросов, с учётом CONN_MAX_AGE.
+            close_old_connections()
+            if ok:
+                own[kind].append(time.perf_counter() - started)
+            else:
+                own_errors[kind] += 1
+        with lock:
+            for kind in own:
+                latencies[kind].extend(own[kind])
+                errors[kind] += own_errors[kind]
+
+    started = time.monotonic()
+    workers = [
+        threading.Thread(target=worker, args=(client, slugs, seed))
+        for seed, (client, slugs) in enumerate(clients)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return {
+        kind: summarize(latencies[kind], errors[kind], elapsed)
+        for kind in latencies
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--notes', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--profile', choices=PROFILES)
+    parser.add_argument('--output', help='Куда сохранить JSON с результатами.')
+    options = parser.parse_args()
+
+    if options.profile:
+        with tempfile.TemporaryDirectory() as directory:
+            configure(options.profile, Path(directory) / 'bench.sqlite3')
+            print(json.dumps(run_profile(options)))
+        return
+
+    results = {}
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_profile',
+             '--profile', profile,
+             '--threads', str(options.threads),
+             '--notes', str(options.notes),
+             '--duration', str(options.duration),
+             '--write-ratio', str(options.write_ratio)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[profile] = json.loads(output.splitlines()[-1])
+        for kind, stats in results[profile].items():
+            print(
+                f'{profile:8} {kind:5} {stats["rps"]:>8} rps  '
+                f'p99 {stats["p99_ms"]} ms  ошибок {stats["errors"]}'
+            )
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
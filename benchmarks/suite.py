@@ -0,0 +1,179 @@
+"""Нагрузочный прогон сценариев yanote с JSON-отчётом.
+
+    python -m benchmarks.suite --modes client wsgi --output head.json
+    python -m benchmarks.compare base.json head.json
+
+База создаётся во временном каталоге и наполняется benchmarks.data.
+Режим client гоняет запросы через тестовый клиент Django в потоках
+этого процесса, wsgi и asgi - через gunicorn и uvicorn (пакеты из
+benchmarks/requirements.txt). Каждый сценарий из benchmarks.scenarios
+идёт --duration секунд на каждом уровне конкурентности; в отчёт
+попадают rps и p50/p95/p99 задержки.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks import data
+from benchmarks.load import start_server, summarize, wait_for_port
+from benchmarks.scenarios import SCENARIOS, Worker
+from benchmarks.sessions import ClientSession, HttpSession
+
+HOST = '127.0.0.1'
+MODES = ('client', 'wsgi', 'asgi')
+
+
+def run_scenario(workers, scenario, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def loop(worker):
+        own_latencies = []
+        own_errors = 0
+        while time.monotonic() < deadline:
+            request = scenario(worker)
+            started = time.perf_counter()
+            if request():
+                own_latencies.append(time.perf_counter() - started)
+            else:
+                own_errors += 1
+        with lock:
+            latencies.extend(own_latencies)
+            errors[0] += own_errors
+
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=loop, args=(worker,)) for worker in workers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.monotonic() - started)
+
+
+def make_workers(mode, accounts, concurrency, port):
+    """По потоку на пользователя; пользователей по кругу, если их меньше."""
+    workers = []
+    for number in range(concurrency):
+        user, slugs = accounts[number % len(accounts)]
+        if mode == 'client':
+            session = ClientSession(user)
+            guest = ClientSession()
+        else:
+            cookie = ClientSession(user).client.cookies['sessionid']
+            session = HttpSession(HOST, port, {'sessionid': cookie.value})
+            guest = HttpSession(HOST, port)
+            # CSRF-токены получаем заранее, вне замеров.
+            session.get('/add/')
+            guest.get('/auth/login/')
+        workers.append(Worker(number, user.username, slugs, session, guest))
+    return workers
+
+
+def describe(options):
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import django
+    return {
+        'commit': commit,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'users': options.users,
+        'notes': options.notes,
+        'duration': options.duration,
+        'workers': options.workers,
+        'threads': options.threads,
+    }
+
+
+def run_mode(mode, options, accounts):
+    server = None
+    if mode != 'client':
+        server = start_server(
+            mode, HOST, options.port, options.workers, options.threads
+        )
+        wait_for_port(HOST, options.port)
+    results = []
+    try:
+        for concurrency in options.concurrency:
+            workers = make_workers(
+                mode, accounts, concurrency, options.port
+            )
+            for name in options.scenarios:
+                stats = run_scenario(
+                    workers, SCENARIOS[name], options.duration
+                )
+                stats.update(
+                    mode=mode, scenario=name, concurrency=concurrency
+                )
+                results.append(stats)
+                print(
+                    f'{mode:6} {name:7} c={concurrency:<3} '
+                    f'{stats["rps"]:>8} rps  p50 {stats["p50_ms"]} ms  '
+                    f'p99 {stats["p99_ms"]} ms  ошибок {stats["errors"]}'
+                )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--notes', type=int, default=100)
+    parser.add_argument(
+        '--modes', nargs='+', choices=MODES, default=('client',)
+    )
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=tuple(SCENARIOS),
+        default=tuple(SCENARIOS),
+    )
+    parser.add_argument(
+        '--concurrency', type=int, nargs='+', default=(1, 8)
+    )
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument(
+        '--threads', type=int, default=8,
+        help='Потоков на воркер gunicorn.',
+    )
+    parser.add_argument('--port', type=int, default=8811)
+    parser.add_argument('--output', help='Куда сохранить JSON-отчёт.')
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['YANOTE_DATABASE'] = str(Path(directory) / 'bench.sqlite3')
+        data.setup()
+        from django.core.management import call_command
+
+        call_command('migrate', verbosity=0)
+        accounts = data.generate(options.users, options.notes)
+        report = {'meta': describe(options), 'results': []}
+        for mode in options.modes:
+            report['results'].extend(run_mode(mode, options, accounts))
+    if options.output:
+        Path(options.output).write_text(
+            json.dumps(report, indent=2, ensure_ascii=False)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,45 @@
 from django.contrib import admin
 
-from .models import Note
+from .models import Note, PurgeJob, Task
 
-admin.site.register(Note)
+
+@admin.register(Note)
+class NoteAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'author', 'updated_at')
+
+    def get_queryset(self, request):
+        """В списке текст не показывается, а бывает большим."""
+        return super().get_queryset(request).defer('text')
+
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    """Ход фоновой очистки, задачи создаёт notes/purge.py."""
+    list_display = (
+        'id', 'author_id', 'shard', 'reason', 'progress', 'created_at',
+        'finished_at',
+    )
+    list_filter = ('reason', 'shard')
+
+    @admin.display(description='Удалено')
+    def progress(self, job):
+        return f'{job.purged} из {job.total}'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, job=None):
+        return False
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Очередь run_worker: упавшие задачи можно удалить."""
+    list_display = ('id', 'name', 'key', 'status', 'attempts', 'run_at')
+    list_filter = ('status', 'name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, task=None):
+        return False
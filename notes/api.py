@@ -0,0 +1,335 @@
+import json
+from http import HTTPStatus
+
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import purge, sharding, sync, tags
+from .forms import WARNING, NoteForm
+from .models import Note, PurgeJob
+from .pagination import paginate_keyset
+from .serializers import note_to_dict
+from .signals import notes_bulk_saved
+from .slugs import allocate_slugs, slug_from_title
+
+MAX_OPERATIONS = 500
+OPERATIONS = ('create', 'update', 'delete')
+
+
+def error(status, message):
+    return JsonResponse({'error': message}, status=status)
+
+
+class ApiMixin:
+    """JSON-ответы и авторизация по сессии без редиректа на логин."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error(HTTPStatus.UNAUTHORIZED, 'Нужна авторизация.')
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        """Пользователь может работать только со своими заметками."""
+        return Note.objects.for_author(self.request.user)
+
+
+class NotesApi(ApiMixin, View):
+    """Список заметок пользователя страницами по курсору."""
+    page_size = 100
+
+    def get(self, request):
+        page, next_cursor = paginate_keyset(
+            self.get_queryset().only('id', 'title', 'slug').order_by('id'),
+            request.GET.get('after'),
+            self.page_size,
+        )
+        return JsonResponse({
+            'results': [
+                note_to_dict(note, fields=('id', 'title', 'slug'))
+                for note in page
+            ],
+            'next': next_cursor,
+        })
+
+
+class NoteApi(ApiMixin, View):
+    """Заметка целиком."""
+
+    def get(self, request, slug):
+        note = self.get_queryset().filter(slug=slug).first()
+        if note is None:
+            return error(HTTPStatus.NOT_FOUND, 'Заметка не найдена.')
+        return JsonResponse(note_to_dict(note))
+
+
+class SyncApi(ApiMixin, View):
+    """Изменения заметок после курсора клиента страницами.
+
+    Клиент повторяет запрос с полученным cursor, пока more истинно.
+    reset означает, что заметки переехали в другой шард и курсор
+    устарел: клиент должен забыть локальную копию, изменения
+    отдаются с начала.
+    """
+    page_size = 100
+    max_page_size = 500
+
+    def get(self, request):
+        alias = sharding.shard_for(request.user.pk)
+        after, reset = 0, False
+        if request.GET.get('cursor'):
+            try:
+                cursor_alias, after = sync.decode_cursor(
+                    request.GET['cursor']
+                )
+            except ValueError as exc:
+                return error(HTTPStatus.BAD_REQUEST, str(exc))
+            if cursor_alias != alias:
+                after, reset = 0, True
+        try:
+            limit = int(request.GET.get('limit', self.page_size))
+        except ValueError:
+            return error(HTTPStatus.BAD_REQUEST, 'Некорректный limit.')
+        limit = min(max(limit, 1), self.max_page_size)
+        changes, more = sync.changes(request.user.pk, alias, after, limit)
+        if changes:
+            after = changes[-1]['seq']
+        return JsonResponse({
+            'changes': changes,
+            'cursor': sync.encode_cursor(alias, after),
+            'more': more,
+            'reset': reset,
+        })
+
+
+class BatchNoteForm(NoteForm):
+    """Форма для пакета: уникальность slug проверяется сразу для всех."""
+    # Теги пакет не меняет.
+    tag_names = None
+
+    def clean_slug(self):
+        return self.cleaned_data.get('slug')
+
+    def validate_unique(self):
+        pass
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class NotesBatchApi(ApiMixin, View):
+    """Пакетное создание, изменение и удаление заметок.
+
+    Тело запроса - JSON-список операций:
+    {"op": "create", "data": {...}}, {"op": "update", "slug": ...,
+    "data": {...}}, {"op": "delete", "slug": ...}. Пакет применяется
+    в одной транзакции целиком или не применяется вовсе: сначала
+    удаления, затем изменения, затем создания.
+
+    CSRF-токен не нужен: принимается только application/json, а такой
+    запрос с чужого сайта браузер без CORS не отправит.
+    """
+
+    def post(self, request):
+        if request.content_type != 'application/json':
+            return error(
+                HTTPStatus.UNSUPPORTED_MEDIA_TYPE, 'Ожидается JSON.'
+            )
+        try:
+            operations = json.loads(request.body)
+        except ValueError:
+            return error(HTTPStatus.BAD_REQUEST, 'Некорректный JSON.')
+        if not isinstance(operations, list) or not operations:
+            return error(HTTPStatus.BAD_REQUEST, 'Ожидается список операций.')
+        if len(operations) > MAX_OPERATIONS:
+            return error(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                f'Не больше {MAX_OPERATIONS} операций за запрос.',
+            )
+        results, plan = self.validate(operations)
+        if any(result['status'] == 'error' for result in results):
+            return JsonResponse(
+                {'results': results}, status=HTTPStatus.BAD_REQUEST
+            )
+        shard = sharding.shard_for(request.user.pk)
+        try:
+            # Реестр slug живёт в основной базе, заметки - в шарде автора.
+            with transaction.atomic(), transaction.atomic(using=shard):
+                self.apply(plan, results, shard)
+        except IntegrityError:
+            return error(
+                HTTPStatus.CONFLICT, 'Slug занят параллельным запросом.'
+            )
+        return JsonResponse({'results': results})
+
+    def validate(self, operations):
+        """Проверяет пакет целиком, не изменяя базу."""
+        notes = self.load_targets(operations)
+        results = []
+        plan = {op: [] for op in OPERATIONS}
+        # Прежние slug изменяемых и удаляемых заметок по id.
+        plan['stored'] = {}
+        for index, operation in enumerate(operations):
+            result = {'index': index, 'status': 'ok'}
+            results.append(result)
+            if not isinstance(operation, dict) or (
+                    operation.get('op') not in OPERATIONS):
+                result.update(status='error', errors={
+                    'op': ['Допустимые операции: ' + ', '.join(OPERATIONS)]
+                })
+                continue
+            op = result['op'] = operation['op']
+            note = None
+            if op != 'create':
+                note = notes.get(operation.get('slug'))
+                if note is None:
+                    result.update(status='error', errors={
+                        'slug': ['Заметка не найдена.']
+                    })
+                    continue
+                if note.pk in plan['stored']:
+                    result.update(status='error', errors={
+                        'slug': ['Заметка уже изменяется в этом пакете.']
+                    })
+                    continue
+                plan['stored'][note.pk] = note.slug
+            if op == 'delete':
+                plan[op].append((result, note))
+                continue
+            data = operation.get('data')
+            if not isinstance(data, dict):
+                result.update(status='error', errors={
+                    'data': ['Ожидается объект с полями заметки.']
+                })
+                continue
+            if note is not None:
+                data = {
+                    'title': note.title, 'text': note.text,
+                    'slug': note.slug, **data,
+                }
+            form = BatchNoteForm(data=data, instance=note)
+            if not form.is_valid():
+                result.update(status='error', errors={
+                    field: list(messages)
+                    for field, messages in form.errors.items()
+                })
+                continue
+            plan[op].append((result, form.save(commit=False)))
+        # slug освобождают только изменяемые заметки. Удаляемые держат
+        # свои slug, пока purge_notes не удалит строки.
+        plan['released'] = set(plan['stored'].values()) - {
+            note.slug for _, note in plan['delete']
+        }
+        self.check_slugs(plan)
+        return results, plan
+
+    def load_targets(self, operations):
+        """Изменяемые и удаляемые заметки пакета одним запросом по slug."""
+        targets = [
+            (operation.get('op'), operation.get('slug'))
+            for operation in operations
+            if isinstance(operation, dict)
+            and operation.get('op') in ('update', 'delete')
+        ]
+        queryset = self.get_queryset().filter(
+            slug__in={slug for _, slug in targets}
+        )
+        if all(op == 'delete' for op, _ in targets):
+            # Удаляемым заметкам текст не нужен.
+            queryset = queryset.defer('text')
+        return {note.slug: note for note in queryset}
+
+    def check_slugs(self, plan):
+        """Проверяет явные slug пакета одним запросом, как NoteForm."""
+        changing = plan['update'] + plan['create']
+        wanted = [note.slug for _, note in changing if note.slug]
+        taken = set(
+            sharding.slug_queryset().filter(slug__in=wanted).exclude(
+                slug__in=plan['released']
+            ).values_list('slug', flat=True)
+        )
+        for result, note in changing:
+            if not note.slug:
+                continue
+            if note.slug in taken:
+                result.update(status='error', errors={
+                    'slug': [note.slug + WARNING]
+                })
+            taken.add(note.slug)
+
+    def apply(self, plan, results, shard):
+        deleted = [note.pk for _, note in plan['delete']]
+        if deleted:
+            tags.detach(deleted, shard)
+            purge.soft_delete(
+                self.get_queryset().filter(pk__in=deleted),
+                self.request.user.pk, PurgeJob.NOTES,
+            )
+        for result, note in plan['delete']:
+            result['slug'] = note.slug
+        updated = [note for _, note in plan['update']]
+        created = [note for _, note in plan['create']]
+        self.allocate_empty_slugs(updated + created, plan['released'])
+        slugs = {note.slug for note in updated + created}
+        sharding.release_slugs(plan['released'] - slugs)
+        sharding.claim_slugs(self.request.user.pk, slugs)
+        if updated:
+            now = timezone.now()
+            for note in updated:
+                note.updated_at = now
+                # HTML сохранит фоновая задача, см. notes/rendering.py.
+                note.render_version = 0
+            self.update(updated, plan['stored'], shard)
+        if created:
+            self.create(created, shard)
+        if updated or created:
+            notes_bulk_saved.send(sender=Note, notes=updated + created)
+        for result, note in plan['update'] + plan['create']:
+            result.update(id=note.pk, slug=note.slug)
+
+    def update(self, notes, stored, shard):
+        """Сохраняет изменённые заметки одним bulk_update.
+
+        UNIQUE в SQLite проверяется для каждой строки сразу, поэтому
+        если заметки пакета передают slug друг другу, сначала все
+        переименованные получают временные slug. Символа ~ нет в
+        допустимых slug, и временный slug не совпадёт с настоящим.
+        """
+        notes_by_shard = Note.objects.using(shard)
+        renamed = [note for note in notes if note.slug != stored[note.pk]]
+        held = {stored[note.pk] for note in renamed}
+        if any(note.slug in held for note in renamed):
+            notes_by_shard.bulk_update(
+                [Note(pk=note.pk, slug=f'~{note.pk}') for note in renamed],
+                ('slug',),
+            )
+        notes_by_shard.bulk_update(
+            notes, ('title', 'text', 'slug', 'updated_at', 'render_version')
+        )
+
+    def allocate_empty_slugs(self, notes, released):
+        """Подбирает пустые slug одной пачкой в обход явных slug пакета.
+
+        Прежние slug изменяемых заметок не считаются занятыми: заметка
+        с пустым slug сохраняет свой, как при правке через форму.
+        """
+        empty = [note for note in notes if not note.slug]
+        slugs = allocate_slugs(
+            [slug_from_title(note.title) for note in empty],
+            reserved=[note.slug for note in notes], released=released,
+        )
+        for note, slug in zip(empty, slugs):
+            note.slug = slug
+
+    def create(self, notes, shard):
+        for note in notes:
+            note.author = self.request.user
+        Note.objects.using(shard).bulk_create(notes)
+        # SQLite не возвращает id из bulk_create - берём их по slug.
+        ids = dict(self.get_queryset().filter(
+            slug__in=[note.slug for note in notes]
+        ).values_list('slug', 'id'))
+        for note in notes:
+            note.pk = ids[note.slug]
+            note._state.adding = False
@@ -0,0 +1,150 @@
+"""Асинхронные версии страниц чтения для запуска под ASGI.
+
+Обычные CBV под ASGI выполняются через sync_to_async с
+thread_sensitive=True, то есть в одном общем потоке по очереди. Здесь
+обращения к базе уходят в собственный ограниченный пул потоков
+(NOTES_ASYNC_DB_WORKERS), а цикл событий занят только вводом-выводом.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+
+from . import tags
+from .api import NotesApi, error
+from .models import Note
+from .pagination import paginate_keyset
+from .serializers import note_to_dict
+from .views import NotesList
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'NOTES_ASYNC_DB_WORKERS', 8),
+                thread_name_prefix='notes-db',
+            )
+    return _executor
+
+
+def _call(func, *args):
+    # Потоки пула живут дольше запроса: соединения проверяются так же,
+    # как это делает обработчик запросов Django.
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args):
+    """Выполняет синхронный код с доступом к базе в пуле потоков."""
+    loop = asyncio.get_running_loop()
+    # Контекст копируется, чтобы в потоке пула была видна, например,
+    # привязка чтения к основной базе после записи.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(context.run, _call, func, *args)
+    )
+
+
+def resolve_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+def get_queryset(user):
+    """Пользователь может работать только со своими заметками."""
+    return Note.objects.for_author(user)
+
+
+def load_page(user, cursor, page_size, fields, *prefetch):
+    page, next_cursor = paginate_keyset(
+        get_queryset(user).only(*fields).order_by('id').prefetch_related(
+            *prefetch
+        ),
+        cursor, page_size,
+    )
+    return list(page), next_cursor
+
+
+def load_note(user, slug, *deferred):
+    return get_queryset(user).filter(slug=slug).defer(*deferred).first()
+
+
+def login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await run_db(resolve_user, request)
+        if user is None:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, user, *args, **kwargs)
+    return wrapper
+
+
+def api_login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await run_db(resolve_user, request)
+        if user is None:
+            return error(HTTPStatus.UNAUTHORIZED, 'Нужна авторизация.')
+        return await view(request, user, *args, **kwargs)
+    return wrapper
+
+
+@login_required
+async def notes_list(request, user):
+    """Список заметок пользователя."""
+    page, next_cursor = await run_db(
+        load_page, user, request.GET.get('after'), NotesList.page_size,
+        ('id', 'title', 'slug'), tags.prefetch(),
+    )
+    return await run_db(render, request, 'notes/list.html', {
+        'object_list': page, 'next_cursor': next_cursor,
+    })
+
+
+@login_required
+async def note_detail(request, user, slug):
+    """Заметка подробно: выводится готовый HTML без исходного текста."""
+    note = await run_db(load_note, user, slug, 'text')
+    if note is None:
+        raise Http404('Заметка не найдена.')
+    return await run_db(render, request, 'notes/detail.html', {
+        'object': note, 'note': note,
+    })
+
+
+@api_login_required
+async def api_notes_list(request, user):
+    """Список заметок в JSON страницами по курсору."""
+    fields = ('id', 'title', 'slug')
+    page, next_cursor = await run_db(
+        load_page, user, request.GET.get('after'), NotesApi.page_size,
+        fields,
+    )
+    return JsonResponse({
+        'results': [note_to_dict(note, fields=fields) for note in page],
+        'next': next_cursor,
+    })
+
+
+@api_login_required
+async def api_note_detail(request, user, slug):
+    """Заметка целиком в JSON."""
+    note = await run_db(load_note, user, slug)
+    if note is None:
+        return error(HTTPStatus.NOT_FOUND, 'Заметка не найдена.')
+    return JsonResponse(note_to_dict(note))
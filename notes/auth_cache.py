@@ -0,0 +1,121 @@
+"""Кеш сессий и пользователей, чтобы не ходить за ними в базу.
+
+Двухуровневый: небольшой LRU в памяти процесса поверх общего кеша
+Django. Общий кеш сбрасывается сразу при выходе, смене пароля и
+сохранении пользователя; копии в памяти других процессов живут не
+дольше NOTES_AUTH_CACHE_LOCAL_TTL секунд, поэтому он короткий.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.contrib.auth import get_user as load_user
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+
+def is_enabled():
+    return getattr(settings, 'NOTES_AUTH_CACHE_ENABLED', False)
+
+
+class LocalCache:
+    """Потокобезопасный LRU с TTL; хранит копии, а не сами объекты."""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, payload = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = time.monotonic() + getattr(
+            settings, 'NOTES_AUTH_CACHE_LOCAL_TTL', 5
+        )
+        size = getattr(settings, 'NOTES_AUTH_CACHE_SIZE', 1024)
+        with self._lock:
+            self._data[key] = (expires, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local = LocalCache()
+
+
+def user_key(user_id):
+    return f'notes:auth:user:{user_id}'
+
+
+def get_cached_user(user_id):
+    key = user_key(user_id)
+    user = local.get(key)
+    if user is None:
+        user = cache.get(key)
+        if user is not None:
+            local.set(key, user)
+    return user
+
+
+def remember_user(user):
+    key = user_key(user.pk)
+    cache.set(key, user, getattr(settings, 'NOTES_AUTH_CACHE_TIMEOUT', 300))
+    local.set(key, user)
+
+
+def forget_user(user_id):
+    key = user_key(user_id)
+    local.delete(key)
+    cache.delete(key)
+
+
+def get_user(request):
+    """Как django.contrib.auth.get_user, но пользователь из кеша.
+
+    Хеш сессии сверяется и для пользователя из кеша; при расхождении
+    решение принимает обычная проверка по базе.
+    """
+    try:
+        user_id = get_user_model()._meta.pk.to_python(
+            request.session[SESSION_KEY]
+        )
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    user = None
+    if backend_path in settings.AUTHENTICATION_BACKENDS:
+        user = get_cached_user(user_id)
+    if user is None:
+        user = load_user(request)
+        if user.is_authenticated:
+            remember_user(user)
+        return user
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if not session_hash or not constant_time_compare(
+            session_hash, user.get_session_auth_hash()):
+        return load_user(request)
+    user.backend = backend_path
+    return user
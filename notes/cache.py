@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PREFIX = 'notes'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'NOTES_CACHE_ENABLED', False)
+
+
+def get_timeout():
+    return getattr(settings, 'NOTES_CACHE_TIMEOUT', 300)
+
+
+def version_key(user_id):
+    return f'{PREFIX}:version:{user_id}'
+
+
+def new_version():
+    # Версия от времени, а не 1: если ключ версии вытеснили из кеша,
+    # старые фрагменты с прежней версией не станут снова видны.
+    return time.time_ns()
+
+
+def get_version(user_id):
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(user_id):
+    """Инвалидирует все фрагменты пользователя и только их."""
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), new_version(), timeout=None)
+
+
+def fragment_key(kind, user_id, *parts):
+    # Части ключа - slug, id из курсора и хеш фильтра: в них нет
+    # пробелов и двоеточий, и ключ не выходит за 250 символов.
+    suffix = ':'.join(map(str, parts))
+    return f'{PREFIX}:{kind}:{user_id}:{get_version(user_id)}:{suffix}'
+
+
+def record(kind, hit):
+    with _stats_lock:
+        _stats[(kind, 'hit' if hit else 'miss')] += 1
+
+
+def get_stats():
+    """Счётчики попаданий и промахов в этом процессе по видам страниц."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class CachedPageMixin:
+    """Кеширует отрисованную страницу пользователя до его следующей записи.
+
+    Включается настройкой NOTES_CACHE_ENABLED; ключ строится из
+    cache_kind и get_cache_parts().
+    """
+    cache_kind = None
+
+    def get_cache_parts(self):
+        return ()
+
+    def get(self, request, *args, **kwargs):
+        if not is_enabled():
+            return super().get(request, *args, **kwargs)
+        key = fragment_key(
+            self.cache_kind, request.user.pk, *self.get_cache_parts()
+        )
+        content = cache.get(key)
+        record(self.cache_kind, content is not None)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.render()
+        if response.status_code == 200:
+            cache.set(key, response.content, get_timeout())
+        return response
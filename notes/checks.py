@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Кеши, которые каждый процесс держит у себя.
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_replica_cache(app_configs, **kwargs):
+    """Метки записи и снимка реплики должны видеть все процессы.
+
+    С кешем процесса запрос в другом процессе не узнает о записи
+    автора и прочитает с реплики старые данные.
+    """
+    if not getattr(settings, 'NOTES_READ_REPLICA', None):
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in LOCAL_CACHES:
+        return []
+    return [Error(
+        'NOTES_READ_REPLICA требует общего для процессов кеша.',
+        hint=f'Замените {backend} в CACHES["default"], например, на '
+             'Redis, Memcached или DatabaseCache.',
+        obj='NOTES_READ_REPLICA',
+        id='notes.E001',
+    )]
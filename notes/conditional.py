@@ -0,0 +1,44 @@
+from django.db.models import Count, Max
+
+from . import markup
+from .models import Note
+
+
+def note_updated_at(request, slug):
+    """Время изменения заметки, запомненное на запросе.
+
+    ETag и Last-Modified считаются по одному запросу к индексу.
+    """
+    if not hasattr(request, '_note_updated_at'):
+        request._note_updated_at = Note.objects.for_author(
+            request.user
+        ).filter(slug=slug).values_list('updated_at', flat=True).first()
+    return request._note_updated_at
+
+
+def detail_etag(request, slug):
+    """Версия страницы: время изменения и версия рендера Markdown."""
+    updated_at = note_updated_at(request, slug)
+    if updated_at is None:
+        return None
+    return (
+        f'note-{request.user.pk}-{slug}-{markup.VERSION}-'
+        f'{updated_at.timestamp():.6f}'
+    )
+
+
+def detail_last_modified(request, slug):
+    return note_updated_at(request, slug)
+
+
+def list_etag(request):
+    """Версия списка: число заметок и время последнего изменения.
+
+    Last-Modified для списка не отдаётся: удаление заметки не сдвигает
+    max(updated_at), а число заметок в ETag это изменение замечает.
+    """
+    state = Note.objects.for_author(request.user).aggregate(
+        count=Count('id'), last=Max('updated_at')
+    )
+    last = state['last'].timestamp() if state['last'] else 0
+    return f'list-{request.user.pk}-{state["count"]}-{last:.6f}'
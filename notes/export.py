@@ -0,0 +1,77 @@
+"""Выгрузка заметок пользователя потоком.
+
+Строки читаются итератором пачками, архив собирается на лету: в
+памяти не больше одной пачки строк и одного блока ответа, сколько бы
+заметок ни было у пользователя.
+"""
+import zipfile
+
+from .serializers import dump_line
+
+# Сколько строк читать из базы за раз.
+CHUNK_ROWS = 500
+# Ответ отдаётся блоками примерно такого размера.
+BLOCK_BYTES = 64 * 1024
+
+
+def rows(queryset):
+    return queryset.order_by('id').values_list(
+        'title', 'text', 'slug'
+    ).iterator(chunk_size=CHUNK_ROWS)
+
+
+def ndjson(queryset, username):
+    """NDJSON в формате export_notes: его принимает import_notes."""
+    block = []
+    size = 0
+    for title, text, slug in rows(queryset):
+        line = dump_line(title, text, slug, username).encode()
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_BYTES:
+            yield b''.join(block)
+            block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+
+def markdown(title, text):
+    return f'# {title}\n\n{text}\n'.encode()
+
+
+class Buffer:
+    """Поток без seek для ZipFile: отдаёт накопленное и забывает его."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts, self.size = [], 0
+        return data
+
+
+def zip_archive(queryset):
+    """ZIP с файлом <slug>.md на каждую заметку.
+
+    ZipFile пишет в поток без seek с дескрипторами данных после
+    каждого файла, поэтому архив отдаётся частями по мере сборки.
+    """
+    buffer = Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for title, text, slug in rows(queryset):
+            with archive.open(f'{slug}.md', 'w') as entry:
+                entry.write(markdown(title, text))
+            if buffer.size >= BLOCK_BYTES:
+                yield buffer.take()
+    # Оглавление архива пишется при закрытии ZipFile.
+    yield buffer.take()
@@ -0,0 +1,59 @@
+"""Текстовое поле, которое хранится в базе сжатым.
+
+Значение в базе - байты с байтом-заголовком: RAW - дальше текст в
+UTF-8, ZLIB - текст, сжатый zlib. Сжимается только текст не короче
+NOTES_TEXT_COMPRESS_MIN байт и только если это действительно экономит
+место. Для Python-кода и форм поле ведёт себя как обычный TextField.
+"""
+import zlib
+
+from django.conf import settings
+from django.db import models
+
+RAW = b'\x00'
+ZLIB = b'\x01'
+LEVEL = 6
+
+
+def compress(text):
+    data = text.encode()
+    threshold = getattr(settings, 'NOTES_TEXT_COMPRESS_MIN', 1024)
+    if len(data) >= threshold:
+        packed = zlib.compress(data, LEVEL)
+        if len(packed) < len(data):
+            return ZLIB + packed
+    return RAW + data
+
+
+def decompress(value):
+    """Текст из значения в базе; понимает и ещё не сжатые строки."""
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    header, data = value[:1], value[1:]
+    if header == ZLIB:
+        return zlib.decompress(data).decode()
+    if header == RAW:
+        return data.decode()
+    # Строка, перенесённая в двоичный столбец без преобразования.
+    return value.decode()
+
+
+class CompressedTextField(models.TextField):
+    """TextField, который в базе лежит сжатым в двоичном столбце.
+
+    Поиск по содержимому (contains и т.п.) по такому столбцу не
+    работает - для этого есть полнотекстовый индекс.
+    """
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is None:
+            return None
+        return connection.Database.Binary(compress(value))
+
+    def from_db_value(self, value, expression, connection):
+        return decompress(value)
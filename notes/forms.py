@@ -1,7 +1,7 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from pytils.translit import slugify
 
+from . import sharding, tags
 from .models import Note
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
@@ -9,20 +9,50 @@ WARNING = ' - такой slug уже существует, придумайте
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    tag_names = forms.CharField(
+        label='Теги', required=False, help_text='Через запятую'
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and 'tag_names' in self.fields:
+            self.initial.setdefault('tag_names', ', '.join(sorted(
+                self.instance.tags.values_list('name', flat=True)
+            )))
+
+    def clean_tag_names(self):
+        names = tags.parse(self.cleaned_data.get('tag_names', ''))
+        if len(names) > tags.MAX_TAGS:
+            raise ValidationError(f'Не больше {tags.MAX_TAGS} тегов.')
+        for name in names:
+            if len(name) > tags.MAX_LENGTH:
+                raise ValidationError(
+                    f'Тег длиннее {tags.MAX_LENGTH} символов: {name}'
+                )
+        return names
+
+    def save(self, commit=True):
+        note = super().save(commit)
+        if commit and 'tag_names' in self.fields:
+            tags.set_tags(
+                note, self.cleaned_data.get('tag_names', []),
+                note._state.db,
+            )
+        return note
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
+        """Обрабатывает случай, если slug не уникален.
+
+        Пустой slug не проверяется: уникальный адрес по заголовку
+        подберёт Note.save.
+        """
+        slug = self.cleaned_data.get('slug')
+        if not slug or slug == self.instance.slug:
+            return slug
+        if sharding.slug_queryset().filter(slug=slug).exists():
             raise ValidationError(slug + WARNING)
         return slug
@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes import revisions, sharding
+from notes.models import NoteRevision
+
+
+class Command(BaseCommand):
+    help = ('Прореживает старую историю заметок: из ревизий старше '
+            '--days дней остаётся последняя за каждый день.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        for using in sharding.get_shards():
+            note_ids = NoteRevision.objects.using(using).filter(
+                created_at__lt=cutoff
+            ).values_list('note_id', flat=True).distinct().order_by()
+            for note_id in list(note_ids):
+                total += revisions.compact(note_id, using, cutoff)
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено ревизий: {total}')
+        )
@@ -0,0 +1,71 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import sharding
+from notes.models import Note
+from notes.serializers import dump_line
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заметки в формате NDJSON, не держа их все в памяти.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.',
+        )
+        parser.add_argument(
+            '--author', help='Выгрузить заметки только этого пользователя.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.usernames = {}
+        querysets = [
+            Note.objects.using(alias) for alias in sharding.get_shards()
+        ]
+        if options['author']:
+            author = get_user_model().objects.filter(
+                username=options['author']
+            ).first()
+            if author is None:
+                raise CommandError(f'Нет пользователя {options["author"]}')
+            querysets = [Note.objects.for_author(author)]
+        querysets = [
+            queryset.order_by('id').values_list(
+                'title', 'text', 'slug', 'author_id'
+            )
+            for queryset in querysets
+        ]
+        if options['output'] == '-':
+            total, elapsed = self.export(querysets, sys.stdout, options)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                total, elapsed = self.export(querysets, output, options)
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено заметок: {total} '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
+
+    def username(self, author_id):
+        # Пользователи лежат в основной базе, заметки - в шардах.
+        if author_id not in self.usernames:
+            self.usernames[author_id] = get_user_model().objects.filter(
+                pk=author_id
+            ).values_list('username', flat=True).first()
+        return self.usernames[author_id]
+
+    def export(self, querysets, output, options):
+        started = time.monotonic()
+        total = 0
+        for queryset in querysets:
+            rows = queryset.iterator(chunk_size=options['chunk_size'])
+            for title, text, slug, author_id in rows:
+                output.write(
+                    dump_line(title, text, slug, self.username(author_id))
+                )
+                total += 1
+        return total, time.monotonic() - started
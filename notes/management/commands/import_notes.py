@@ -0,0 +1,142 @@
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import IntegrityError, transaction
+
+from notes import sharding
+from notes.models import Note
+from notes.serializers import load_line
+from notes.signals import notes_bulk_saved
+from notes.slugs import ATTEMPTS, allocate_slugs, slug_from_title
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Загружает заметки из NDJSON пачками через bulk_create. '
+            'Авторы ищутся по username.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл NDJSON, по умолчанию stdin.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько заметок вставлять в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        self.authors = {}
+        if options['path'] == '-':
+            total, elapsed = self.load(sys.stdin, options['batch_size'])
+        else:
+            with open(options['path'], encoding='utf-8') as source:
+                total, elapsed = self.load(source, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено заметок: {total} '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
+
+    def load(self, source, batch_size):
+        started = time.monotonic()
+        total = 0
+        lines = enumerate(source, start=1)
+        while True:
+            chunk = list(islice(lines, batch_size))
+            if not chunk:
+                break
+            total += self.insert(chunk)
+            elapsed = time.monotonic() - started
+            self.stderr.write(
+                f'{total} строк, {total / max(elapsed, 1e-9):.0f} строк/с'
+            )
+        return total, time.monotonic() - started
+
+    def parse(self, chunk):
+        records = []
+        for number, line in chunk:
+            if not line.strip():
+                continue
+            try:
+                record = load_line(line)
+                if record.get('slug'):
+                    validate_slug(record['slug'])
+            except (ValueError, ValidationError) as error:
+                raise CommandError(f'Строка {number}: {error}')
+            records.append(record)
+        return records
+
+    def resolve_authors(self, usernames):
+        usernames = set(usernames)
+        missing = usernames - self.authors.keys()
+        if missing:
+            self.authors.update(
+                User.objects.filter(
+                    username__in=missing
+                ).values_list('username', 'id')
+            )
+        unknown = usernames - self.authors.keys()
+        if unknown:
+            raise CommandError(
+                'Неизвестные пользователи: ' + ', '.join(sorted(unknown))
+            )
+
+    def insert(self, chunk):
+        records = self.parse(chunk)
+        if not records:
+            return 0
+        self.resolve_authors(record['author'] for record in records)
+        notes = []
+        for record in records:
+            title = record.get('title') or Note._meta.get_field(
+                'title'
+            ).get_default()
+            notes.append(Note(
+                title=title,
+                text=record['text'],
+                slug=record.get('slug') or slug_from_title(title),
+                author_id=self.authors[record['author']],
+            ))
+        bases = [note.slug for note in notes]
+        for attempt in range(1, ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    slugs = allocate_slugs(bases)
+                    for note, slug in zip(notes, slugs):
+                        note.slug = slug
+                    self.save(notes)
+                break
+            except IntegrityError as error:
+                # slug мог занять параллельный запрос - пробуем ещё раз.
+                if attempt == ATTEMPTS:
+                    raise CommandError(f'Пачка не загружена: {error}')
+        return len(notes)
+
+    def save(self, notes):
+        """Вставляет пачку в шарды авторов, по транзакции на шард."""
+        by_shard = defaultdict(list)
+        for note in notes:
+            by_shard[sharding.shard_for(note.author_id)].append(note)
+        saved = []
+        with ExitStack() as stack:
+            for alias, shard_notes in by_shard.items():
+                stack.enter_context(transaction.atomic(using=alias))
+                by_author = defaultdict(list)
+                for note in shard_notes:
+                    by_author[note.author_id].append(note.slug)
+                for author_id, slugs in by_author.items():
+                    sharding.claim_slugs(author_id, slugs)
+                queryset = Note.objects.using(alias)
+                queryset.bulk_create(shard_notes, batch_size=len(shard_notes))
+                saved.extend(queryset.filter(
+                    slug__in=[note.slug for note in shard_notes]
+                ))
+            notes_bulk_saved.send(sender=Note, notes=saved)
@@ -0,0 +1,163 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from notes import search, sharding, tags
+from notes.models import (
+    Note, NoteRevision, NoteTag, NoteTombstone, Tag,
+)
+from notes.signals import notes_bulk_saved
+
+
+class Command(BaseCommand):
+    help = ('Переносит заметки автора в другой шард. Запускать, когда '
+            'автор не редактирует заметки: если их число изменится во '
+            'время копирования, перенос откатывается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('shard', help='Псевдоним базы из NOTES_SHARDS.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        target = options['shard']
+        if target not in sharding.get_shards():
+            raise CommandError(f'{target} нет в NOTES_SHARDS.')
+        author = get_user_model().objects.filter(
+            username=options['username']
+        ).first()
+        if author is None:
+            raise CommandError(f'Нет пользователя {options["username"]}.')
+        source = sharding.shard_for(author.pk)
+        if source == target:
+            self.stdout.write('Заметки автора уже в этом шарде.')
+            return
+        moved = self.move(author, source, target, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено заметок: {moved} ({source} -> {target})'
+        ))
+
+    def move(self, author, source, target, batch_size):
+        """Копирует заметки, затем переключает автора и чистит source.
+
+        Копии фиксируются в target до того, как что-либо удаляется в
+        source; размещение и реестр slug в основной базе фиксируются
+        раньше удаления. Если переключить автора не удалось, копии
+        удаляются из target.
+        """
+        source_notes = Note.objects.using(source).filter(author=author)
+        expected = source_notes.count()
+        with transaction.atomic(using=target):
+            slugs = self.copy(source_notes, author, source, target,
+                              batch_size)
+        try:
+            with transaction.atomic(using=source):
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    if len(slugs) != expected or (
+                            source_notes.count() != expected):
+                        raise CommandError(
+                            'Заметки автора менялись во время переноса, '
+                            'повторите.'
+                        )
+                    sharding.place(author.pk, target)
+                    sharding.claim_slugs(author.pk, slugs)
+                # Помеченные удалёнными не переносятся, удаляются сразу.
+                self.drop(author, source)
+        except BaseException:
+            if sharding.shard_for(author.pk) != target:
+                with transaction.atomic(using=target):
+                    self.drop(author, target)
+            raise
+        notes_bulk_saved.send(
+            sender=Note, notes=list(Note.objects.for_author(author))
+        )
+        return len(slugs)
+
+    def copy(self, source_notes, author, source, target, batch_size):
+        """Копирует заметки пачками, возвращает их slug."""
+        slugs = []
+        last_pk = 0
+        while True:
+            batch = list(
+                source_notes.filter(pk__gt=last_pk).order_by('id')[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                return slugs
+            last_pk = batch[-1].pk
+            # id в другом шарде свои, поэтому копии получают новые.
+            Note.objects.using(target).bulk_create(
+                Note(title=note.title, text=note.text, slug=note.slug,
+                     author_id=note.author_id,
+                     text_html=note.text_html,
+                     render_version=note.render_version)
+                for note in batch
+            )
+            new_ids = self.new_ids(batch, target)
+            self.copy_revisions(new_ids, source, target)
+            self.copy_tags(new_ids, author, source, target)
+            slugs.extend(note.slug for note in batch)
+
+    def drop(self, author, alias):
+        """Удаляет данные автора из alias без сигналов удаления.
+
+        Заметки не удалены, а переехали: post_delete освободил бы их
+        slug в реестре и записал бы следы удаления для синхронизации.
+        """
+        notes = Note.all_objects.using(alias).filter(author=author)
+        search.unindex_notes(notes.values_list('id', flat=True), alias)
+        for model in (NoteTag, NoteRevision):
+            model.objects.using(alias).filter(
+                note__author=author
+            )._raw_delete(alias)
+        notes._raw_delete(alias)
+        for model in (Tag, NoteTombstone):
+            model.objects.using(alias).filter(
+                author_id=author.pk
+            )._raw_delete(alias)
+
+    def new_ids(self, batch, target):
+        """Новые id копий в target по id оригиналов, сопоставленные по slug."""
+        by_slug = dict(
+            Note.objects.using(target).filter(
+                slug__in=[note.slug for note in batch]
+            ).values_list('slug', 'id')
+        )
+        return {note.pk: by_slug[note.slug] for note in batch}
+
+    def copy_revisions(self, new_ids, source, target):
+        """История переезжает вместе с заметками."""
+        NoteRevision.objects.using(target).bulk_create(
+            NoteRevision(
+                note_id=new_ids[revision.note_id],
+                number=revision.number, is_snapshot=revision.is_snapshot,
+                title=revision.title, data=revision.data,
+                created_at=revision.created_at,
+            )
+            for revision in NoteRevision.objects.using(source).filter(
+                note_id__in=new_ids
+            ).iterator()
+        )
+
+    def copy_tags(self, new_ids, author, source, target):
+        """Теги и их счётчики в target создаются по именам."""
+        links = list(NoteTag.objects.using(source).filter(
+            note_id__in=new_ids
+        ).values_list('note_id', 'tag__name'))
+        if not links:
+            return
+        by_name = {
+            tag.name: tag for tag in tags.ensure(
+                author.pk, {name for _, name in links}, target
+            )
+        }
+        NoteTag.objects.using(target).bulk_create(
+            NoteTag(note_id=new_ids[note_id], tag=by_name[name])
+            for note_id, name in links
+        )
+        tags.adjust_counts(target, Counter(
+            by_name[name].pk for _, name in links
+        ), 1)
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from notes import sharding
+from notes.models import AuthorShard, Note, NoteSlug
+
+
+class Command(BaseCommand):
+    help = ('Готовит базу к нескольким шардам: заносит slug всех '
+            'заметок в реестр NoteSlug и закрепляет авторов за базами, '
+            'где лежат их заметки. Запускать до или сразу после '
+            'добавления шарда в NOTES_SHARDS, до перезапуска сервера; '
+            'повторный запуск ничего не портит.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        slugs = authors = 0
+        for alias in sharding.get_shards():
+            slugs += self.register_slugs(alias, options['batch_size'])
+            authors += self.place_authors(alias)
+        self.stdout.write(self.style.SUCCESS(
+            f'В реестре slug: {slugs}, закреплено авторов: {authors}'
+        ))
+
+    def register_slugs(self, alias, batch_size):
+        """Slug заметок alias, включая помеченные удалёнными."""
+        notes = Note.all_objects.using(alias).order_by('id').values_list(
+            'id', 'slug', 'author_id'
+        )
+        registry = NoteSlug.objects.using(DEFAULT_DB_ALIAS)
+        total = 0
+        last_pk = 0
+        while True:
+            batch = list(notes.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return total
+            last_pk = batch[-1][0]
+            registry.bulk_create(
+                (NoteSlug(slug=slug, author_id=author_id)
+                 for _, slug, author_id in batch),
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+
+    def place_authors(self, alias):
+        """Закрепляет авторов заметок за alias, не трогая перенесённых."""
+        author_ids = set(
+            Note.all_objects.using(alias).values_list(
+                'author_id', flat=True
+            ).distinct()
+        )
+        AuthorShard.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            (AuthorShard(author_id=author_id, alias=alias)
+             for author_id in author_ids),
+            ignore_conflicts=True,
+        )
+        # Размещение по хешу могло попасть в кеш до запуска команды.
+        cache.delete_many(
+            [sharding.placement_key(author_id) for author_id in author_ids]
+        )
+        return len(author_ids)
@@ -0,0 +1,77 @@
+import pstats
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import profiling
+
+# Глубина, на которую разворачивается путь вызовов вверх от функции.
+MAX_DEPTH = 12
+
+
+def describe(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({"/".join(Path(filename).parts[-2:])}:{line})'
+
+
+def hot_path(stats, func):
+    """Цепочка самых тяжёлых вызывающих от функции вверх."""
+    path = [func]
+    while len(path) < MAX_DEPTH:
+        callers = stats.stats[path[-1]][4]
+        candidates = [caller for caller in callers if caller not in path]
+        if not candidates:
+            break
+        # Для вызывающего хранится (cc, nc, tt, ct) именно этого ребра.
+        path.append(max(candidates, key=lambda caller: callers[caller][3]))
+    return path
+
+
+class Command(BaseCommand):
+    help = ('Сводит сохранённые профили по страницам и печатает самые '
+            'горячие пути вызовов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'views', nargs='*',
+            help='Имена URL, например notes:list. По умолчанию все.',
+        )
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--dir', help='Каталог с профилями.')
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'] or profiling.get_directory())
+        if options['views']:
+            folders = [directory / profiling.label(view)
+                       for view in options['views']]
+        else:
+            folders = sorted(path for path in directory.glob('*')
+                             if path.is_dir())
+        reported = False
+        for folder in folders:
+            files = sorted(folder.glob('*.prof'))
+            if files:
+                self.report(folder.name, files, options['limit'])
+                reported = True
+        if not reported:
+            raise CommandError(f'Нет профилей в {directory}.')
+
+    def report(self, view, files, limit):
+        stats = pstats.Stats(*map(str, files))
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{view}: профилей {len(files)}, '
+            f'всего {stats.total_tt * 1000:.1f} мс'
+        ))
+        hottest = sorted(
+            stats.stats, key=lambda func: stats.stats[func][2], reverse=True
+        )[:limit]
+        for func in hottest:
+            own_time = stats.stats[func][2]
+            share = own_time / stats.total_tt * 100 if stats.total_tt else 0
+            self.stdout.write(
+                f'{own_time * 1000:9.1f} мс {share:5.1f}%  {describe(func)}'
+            )
+            for caller in hot_path(stats, func)[1:]:
+                self.stdout.write(f'{"":20}<- {describe(caller)}')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes import purge
+
+
+class Command(BaseCommand):
+    help = ('Удаляет помеченные удалёнными заметки пачками, '
+            'см. notes/purge.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить ожидающие задачи и выйти.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Сколько секунд ждать новых задач между проверками.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Строк в пачке, по умолчанию NOTES_PURGE_BATCH_SIZE.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done = purge.run_pending(options['batch_size'])
+            if done:
+                self.stdout.write(f'Выполнено задач очистки: {done}')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
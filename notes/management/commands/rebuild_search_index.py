@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from notes import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько заметок индексировать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write(
+                'Полнотекстовый индекс доступен только в SQLite.'
+            )
+            return
+        total = search.rebuild(options['batch_size'], stdout=self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS(f'Индекс перестроен, заметок: {total}')
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import replica
+
+
+class Command(BaseCommand):
+    help = 'Обновляет реплику для чтения копией основной базы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Псевдоним реплики, по умолчанию NOTES_READ_REPLICA.',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=1024,
+            help='Сколько страниц копировать за один шаг backup API.',
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database'] or replica.get_alias()
+        if not alias:
+            raise CommandError(
+                'Укажите --database или настройку NOTES_READ_REPLICA.'
+            )
+        replica.refresh(alias, options['pages'])
+        self.stdout.write(self.style.SUCCESS(f'Реплика {alias} обновлена.'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from notes import markup, sharding
+from notes.models import Note
+from notes.rendering import rerender
+
+
+class Command(BaseCommand):
+    help = ('Заново рендерит HTML заметок, полученный прежней версией '
+            'рендера, пачками по id.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        total = 0
+        for alias in sharding.get_shards():
+            stale = Note.objects.using(alias).exclude(
+                render_version=markup.VERSION
+            ).order_by('id').values_list('id', flat=True)
+            last_pk = 0
+            while True:
+                ids = list(
+                    stale.filter(pk__gt=last_pk)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                last_pk = ids[-1]
+                total += rerender(alias, ids)
+                self.stdout.write(f'{alias}: отрендерено заметок {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Отрендерено заметок: {total} (версия {markup.VERSION})'
+        ))
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from notes import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из таблицы Task, см. notes/tasks.py.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Сколько задач выполнять одновременно.',
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо потоков для тяжёлых задач.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Сколько секунд ждать, если очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.processes = options['processes']
+        if self.processes:
+            pool = ProcessPoolExecutor(concurrency)
+        else:
+            pool = ThreadPoolExecutor(concurrency)
+        with pool:
+            while True:
+                done = self.run_batch(pool, concurrency)
+                if done:
+                    self.stdout.write(f'Выполнено задач: {done}')
+                elif options['once']:
+                    return
+                else:
+                    time.sleep(options['interval'])
+
+    def run_batch(self, pool, concurrency):
+        claimed = tasks.claim(concurrency)
+        if self.processes:
+            # Дочерние процессы не должны делить открытые соединения.
+            connections.close_all()
+        for future in [pool.submit(tasks.execute, task_id)
+                       for task_id in claimed]:
+            try:
+                future.result()
+            except Exception:
+                # Задача останется выполняемой и по истечении
+                # NOTES_TASK_TIMEOUT достанется воркеру снова.
+                tasks.logger.exception('Сбой учёта задачи')
+        return len(claimed)
@@ -0,0 +1,153 @@
+"""Markdown заметок в безопасный HTML.
+
+Поддерживается подмножество Markdown: заголовки, абзацы, списки,
+цитаты, блоки и фрагменты кода, полужирный, курсив, ссылки и
+горизонтальная черта. Весь исходный текст сначала экранируется, а
+теги создаёт только сам рендерер, поэтому HTML из заметки в страницу
+не попадает. Ссылки допускаются только на http, https, mailto и
+относительные адреса.
+
+HTML рендерится при сохранении и хранится в Note.text_html вместе с
+VERSION. При изменении правил рендера VERSION увеличивается, и
+manage.py rerender_notes обновляет устаревшие строки.
+"""
+import html
+import re
+
+from django.utils.html import escape
+
+VERSION = 1
+
+FENCE_RE = re.compile(r'^\s*```')
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE_RE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+BULLET_RE = re.compile(r'^\s*[-*+]\s+(.*)$')
+NUMBER_RE = re.compile(r'^\s*\d{1,9}[.)]\s+(.*)$')
+QUOTE_RE = re.compile(r'^\s*>\s?(.*)$')
+
+CODE_RE = re.compile(r'`([^`\n]+)`')
+LINK_RE = re.compile(r'\[([^\]\n]+)\]\(([^)\s]+)\)')
+STRONG_RE = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*')
+EM_RE = re.compile(r'(?<![*\w])\*(?=[^\s*])(.+?)(?<=[^\s*])\*(?![*\w])')
+# Заглушка для готовых фрагментов, которые не должны обрабатываться
+# дальше; нулевой байт удаляется из исходного текста заранее.
+TOKEN_RE = re.compile('\x00(\\d+)\x00')
+
+SAFE_SCHEMES = ('http:', 'https:', 'mailto:')
+
+
+def render(text):
+    """HTML для текста заметки."""
+    lines = text.replace('\x00', '').replace('\r\n', '\n').split('\n')
+    blocks = []
+    index = 0
+    while index < len(lines):
+        index = read_block(lines, index, blocks)
+    return '\n'.join(blocks)
+
+
+def read_block(lines, index, blocks):
+    """Добавляет в blocks блок, начатый строкой index, и идёт дальше."""
+    line = lines[index]
+    if not line.strip():
+        return index + 1
+    if FENCE_RE.match(line):
+        return read_fence(lines, index, blocks)
+    heading = HEADING_RE.match(line)
+    if heading:
+        level = len(heading.group(1))
+        blocks.append(f'<h{level}>{inline(heading.group(2))}</h{level}>')
+        return index + 1
+    if RULE_RE.match(line):
+        blocks.append('<hr>')
+        return index + 1
+    for pattern, tag in ((BULLET_RE, 'ul'), (NUMBER_RE, 'ol')):
+        if pattern.match(line):
+            items, index = collect(lines, index, pattern)
+            blocks.append(f'<{tag}>' + ''.join(
+                f'<li>{inline(item)}</li>' for item in items
+            ) + f'</{tag}>')
+            return index
+    if QUOTE_RE.match(line):
+        items, index = collect(lines, index, QUOTE_RE)
+        blocks.append(
+            f'<blockquote><p>{inline_lines(items)}</p></blockquote>'
+        )
+        return index
+    items = []
+    while index < len(lines) and lines[index].strip() and (
+            not starts_block(lines[index])):
+        items.append(lines[index])
+        index += 1
+    blocks.append(f'<p>{inline_lines(items)}</p>')
+    return index
+
+
+def starts_block(line):
+    return any(pattern.match(line) for pattern in (
+        FENCE_RE, HEADING_RE, RULE_RE, BULLET_RE, NUMBER_RE, QUOTE_RE
+    ))
+
+
+def read_fence(lines, index, blocks):
+    """Блок кода до закрывающих ``` или до конца текста."""
+    code = []
+    index += 1
+    while index < len(lines) and not FENCE_RE.match(lines[index]):
+        code.append(lines[index])
+        index += 1
+    code = escape('\n'.join(code))
+    blocks.append(f'<pre><code>{code}</code></pre>')
+    return index + 1
+
+
+def collect(lines, index, pattern):
+    """Содержимое подряд идущих строк, подходящих под pattern."""
+    items = []
+    while index < len(lines):
+        match = pattern.match(lines[index])
+        if match is None:
+            break
+        items.append(match.group(1))
+        index += 1
+    return items, index
+
+
+def inline_lines(lines):
+    return '<br>\n'.join(inline(line.strip()) for line in lines)
+
+
+def inline(text):
+    """Оформление внутри строки; код и ссылки не обрабатываются дальше."""
+    done = []
+
+    def hold(fragment):
+        done.append(fragment)
+        return f'\x00{len(done) - 1}\x00'
+
+    text = CODE_RE.sub(
+        lambda match: hold(f'<code>{escape(match.group(1))}</code>'), text
+    )
+    text = LINK_RE.sub(lambda match: hold(link(*match.groups())), text)
+    text = escape(text)
+    text = STRONG_RE.sub(r'<strong>\1</strong>', text)
+    text = EM_RE.sub(r'<em>\1</em>', text)
+    return TOKEN_RE.sub(lambda match: done[int(match.group(1))], text)
+
+
+def link(label, url):
+    if not is_safe_url(url):
+        return escape(label)
+    return (
+        f'<a href="{escape(url)}" rel="nofollow noopener">'
+        f'{escape(label)}</a>'
+    )
+
+
+def is_safe_url(url):
+    """http(s), mailto или адрес без схемы."""
+    url = html.unescape(url).strip().lower()
+    scheme, colon, _ = url.partition(':')
+    if not colon or '/' in scheme or '?' in scheme or '#' in scheme:
+        return True
+    return url.startswith(SAFE_SCHEMES)
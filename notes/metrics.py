@@ -0,0 +1,235 @@
+"""Метрики запросов по именам URL в текстовом формате Prometheus.
+
+Для каждого имени URL считаются запросы, гистограмма задержки, число
+и суммарное время SQL-запросов, время отрисовки шаблона и размер
+ответа. Каждый поток пишет в свой словарь без блокировок, /metrics
+складывает словари всех потоков. Медленные запросы
+(NOTES_SLOW_REQUEST_MS) пишутся в лог notes.metrics с самыми долгими
+SQL-запросами.
+"""
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+TOP_QUERIES = 5
+
+METRICS = (
+    # (имя, тип, описание)
+    ('yanote_requests_total', 'counter', 'Обработанные запросы.'),
+    ('yanote_request_duration_seconds', 'histogram',
+     'Время обработки запроса.'),
+    ('yanote_db_queries_total', 'counter', 'SQL-запросы.'),
+    ('yanote_db_query_seconds_total', 'counter', 'Время SQL-запросов.'),
+    ('yanote_template_render_seconds_total', 'counter',
+     'Время отрисовки шаблонов.'),
+    ('yanote_response_bytes_total', 'counter', 'Размер ответов.'),
+)
+
+# Словари живых потоков; счётчики завершившихся потоков collect()
+# переносит в _retired, чтобы их словари не копились.
+_stores = {}
+_retired = {}
+_stores_lock = threading.Lock()
+_local = threading.local()
+_current = contextvars.ContextVar('notes_request_stats', default=None)
+
+
+def is_enabled():
+    return getattr(settings, 'NOTES_METRICS_ENABLED', False)
+
+
+def _store():
+    store = getattr(_local, 'store', None)
+    if store is None:
+        store = _local.store = {}
+        with _stores_lock:
+            _stores[threading.current_thread()] = store
+    return store
+
+
+def inc(name, labels, value=1):
+    store = _store()
+    key = (name, labels)
+    store[key] = store.get(key, 0) + value
+
+
+def observe(name, labels, value):
+    for index, bound in enumerate(BUCKETS):
+        if value <= bound:
+            break
+    else:
+        index = len(BUCKETS)
+    inc(f'{name}_bucket', labels + (('le', index),))
+    inc(f'{name}_sum', labels, value)
+    inc(f'{name}_count', labels)
+
+
+def _prune():
+    """Переносит счётчики завершившихся потоков в _retired."""
+    with _stores_lock:
+        for thread, store in list(_stores.items()):
+            if thread.is_alive():
+                continue
+            del _stores[thread]
+            for key, value in store.items():
+                _retired[key] = _retired.get(key, 0) + value
+        return [_retired, *_stores.values()]
+
+
+def collect():
+    """Сумма по всем потокам: {(имя, метки): значение}."""
+    totals = defaultdict(float)
+    for store in _prune():
+        # copy() выполняется под GIL целиком, итерация по копии безопасна.
+        for key, value in store.copy().items():
+            totals[key] += value
+    return totals
+
+
+def reset():
+    with _stores_lock:
+        _retired.clear()
+        for store in _stores.values():
+            store.clear()
+
+
+class RequestStats:
+    """SQL и отрисовка в рамках одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.top = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        item = (duration, sql)
+        if len(self.top) < TOP_QUERIES:
+            heapq.heappush(self.top, item)
+        else:
+            heapq.heappushpop(self.top, item)
+
+
+def start():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper для всех соединений."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started)
+
+
+def record_request(request, response, duration, stats):
+    match = request.resolver_match
+    view = match.view_name if match is not None else 'unresolved'
+    labels = (('view', view),)
+    inc('yanote_requests_total', labels + (
+        ('method', request.method), ('status', response.status_code),
+    ))
+    observe('yanote_request_duration_seconds', labels, duration)
+    inc('yanote_db_queries_total', labels, stats.queries)
+    inc('yanote_db_query_seconds_total', labels, stats.sql_time)
+    inc('yanote_template_render_seconds_total', labels, stats.render_time)
+    if not response.streaming:
+        inc('yanote_response_bytes_total', labels, len(response.content))
+    threshold = getattr(settings, 'NOTES_SLOW_REQUEST_MS', 500)
+    if threshold is not None and duration * 1000 >= threshold:
+        log_slow(request, view, duration, stats)
+
+
+def log_slow(request, view, duration, stats):
+    queries = ''.join(
+        f'\n  {sql_time * 1000:.1f} мс  {sql[:300]}'
+        for sql_time, sql in sorted(stats.top, reverse=True)
+    )
+    logger.warning(
+        'Медленный запрос %s %s (%s): %.0f мс, SQL: %d за %.0f мс%s',
+        request.method, request.path, view, duration * 1000,
+        stats.queries, stats.sql_time * 1000, queries,
+    )
+
+
+def _format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def _sample(name, labels, value):
+    return f'{name}{{{_format_labels(labels)}}} {value:g}'
+
+
+def _histogram(name, series, lines):
+    buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+    for (sample, labels), value in series:
+        if sample == f'{name}_bucket':
+            *labels, (_, index) = labels
+            buckets[tuple(labels)][index] += value
+    for labels, counts in sorted(buckets.items()):
+        total = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), counts):
+            total += count
+            lines.append(_sample(
+                f'{name}_bucket', labels + (('le', bound),), total
+            ))
+    for (sample, labels), value in series:
+        if sample != f'{name}_bucket':
+            lines.append(_sample(sample, labels, value))
+
+
+def render(families=()):
+    """Текст для /metrics в формате экспозиции Prometheus 0.0.4.
+
+    families - готовые метрики других модулей:
+    (имя, тип, описание, [(метки, значение)]).
+    """
+    totals = sorted(collect().items(), key=lambda item: str(item[0]))
+    lines = []
+    for name, kind, description in METRICS:
+        _header(name, kind, description, lines)
+        if kind == 'histogram':
+            series = [
+                item for item in totals
+                if item[0][0].rsplit('_', 1)[0] == name
+            ]
+            _histogram(name, series, lines)
+        else:
+            lines.extend(
+                _sample(sample, labels, value)
+                for (sample, labels), value in totals if sample == name
+            )
+    for name, kind, description, samples in families:
+        _header(name, kind, description, lines)
+        lines.extend(
+            _sample(name, labels, value) for labels, value in samples
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def _header(name, kind, description, lines):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} {kind}')
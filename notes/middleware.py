@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+from . import auth_cache, metrics, profiling, replica
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """Берёт пользователя из кеша, если включён NOTES_AUTH_CACHE."""
+
+    def process_request(self, request):
+        if not auth_cache.is_enabled():
+            return super().process_request(request)
+        request.user = SimpleLazyObject(
+            lambda: auth_cache.get_user(request)
+        )
+
+
+class HybridMiddleware:
+    """Основа middleware для WSGI и ASGI, как MiddlewareMixin в Django.
+
+    В асинхронной цепочке вызов идёт через __acall__, и асинхронные
+    страницы не переключаются ради middleware в поток и обратно.
+    Наследники пишут синхронный handle() и асинхронный __acall__().
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт, что экземпляр вызывается через await.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class ReadReplicaMiddleware(HybridMiddleware):
+    """Решает, можно ли этому запросу читать заметки с реплики."""
+
+    def handle(self, request):
+        if not replica.get_alias():
+            return self.get_response(request)
+        token = replica.activate(request.session.get(SESSION_KEY))
+        try:
+            return self.get_response(request)
+        finally:
+            replica.deactivate(token)
+
+    async def __acall__(self, request):
+        if not replica.get_alias():
+            return await self.get_response(request)
+        # Сессия и метки закрепления читаются из базы и кеша.
+        pinned = await sync_to_async(self.is_pinned)(request)
+        token = replica.enter(pinned)
+        try:
+            return await self.get_response(request)
+        finally:
+            replica.deactivate(token)
+
+    def is_pinned(self, request):
+        return replica.is_pinned_user(request.session.get(SESSION_KEY))
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Собирает метрики запроса, см. notes/metrics.py.
+
+    Стоит первым в MIDDLEWARE: так в задержку входят остальные
+    middleware, а process_template_response вызывается прямо перед
+    отрисовкой шаблона.
+    """
+
+    def handle(self, request):
+        if not metrics.is_enabled():
+            return self.get_response(request)
+        stats, token = metrics.start()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        metrics.record_request(
+            request, response, time.perf_counter() - started, stats
+        )
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.is_enabled():
+            return await self.get_response(request)
+        # Потоки sync_to_async получают копию контекста с этим stats.
+        stats, token = metrics.start()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        metrics.record_request(
+            request, response, time.perf_counter() - started, stats
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        stats = metrics.current()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.render_time += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Профилирует выборку запросов, см. notes/profiling.py."""
+
+    def handle(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+        response, path = profiling.profile(request, self.get_response)
+        return self.mark(request, response, path)
+
+    async def __acall__(self, request):
+        # Пользователь загружается из базы, только если профиль просят.
+        if not profiling.is_sampled() and not (
+                profiling.is_flagged(request)
+                and await sync_to_async(profiling.is_requested)(request)):
+            return await self.get_response(request)
+        with profiling.profiling(request) as saved:
+            response = await self.get_response(request)
+        return self.mark(request, response, next(iter(saved), None))
+
+    def mark(self, request, response, path):
+        if path is not None and profiling.is_requested(request):
+            response['X-Profile'] = path.name
+        return response
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+CREATE_SQL = (
+    'CREATE VIRTUAL TABLE notes_note_fts USING fts5('
+    "title, text, author_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+)
+FILL_SQL = (
+    'INSERT INTO notes_note_fts (rowid, title, text, author_id) '
+    'SELECT id, title, text, author_id FROM notes_note'
+)
+DROP_SQL = 'DROP TABLE notes_note_fts'
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(FILL_SQL)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_author_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:43
+
+from django.db import migrations
+import notes.fields
+
+BATCH_SIZE = 500
+SELECT_SQL = (
+    'SELECT id, text FROM notes_note WHERE id > %s ORDER BY id LIMIT %s'
+)
+UPDATE_SQL = 'UPDATE notes_note SET text = %s WHERE id = %s'
+
+
+def convert(connection, encode):
+    """Перезаписывает text пачками по id, не читая таблицу целиком."""
+    last_pk = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(SELECT_SQL, [last_pk, BATCH_SIZE])
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            cursor.executemany(
+                UPDATE_SQL, [(encode(text), pk) for pk, text in rows]
+            )
+
+
+def compress_texts(apps, schema_editor):
+    connection = schema_editor.connection
+    convert(connection, lambda text: connection.Database.Binary(
+        notes.fields.compress(notes.fields.decompress(text))
+    ))
+
+
+def decompress_texts(apps, schema_editor):
+    convert(schema_editor.connection, notes.fields.decompress)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0006_note_shards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0007_note_text_compressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='Полный снимок')),
+                ('title', models.CharField(max_length=100, verbose_name='Заголовок')),
+                ('data', notes.fields.CompressedTextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создана')),
+                ('note', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='notes.note')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='noterevision',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='notes_revision_number_uniq'),
+        ),
+    ]
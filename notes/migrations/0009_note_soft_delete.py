@@ -0,0 +1,44 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0008_note_revisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author_id', models.BigIntegerField(verbose_name='Автор')),
+                ('shard', models.CharField(max_length=100, verbose_name='База')),
+                ('reason', models.CharField(choices=[('user', 'Удалён пользователь'), ('notes', 'Пакетное удаление заметок')], max_length=10, verbose_name='Причина')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Помечено заметок')),
+                ('purged', models.PositiveIntegerField(default=0, verbose_name='Удалено заметок')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создана')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'очистка заметок',
+                'verbose_name_plural': 'очистка заметок',
+            },
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Удалена'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
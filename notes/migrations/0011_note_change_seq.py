@@ -0,0 +1,59 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:56
+
+from django.db import migrations, models, router
+from django.db.models import F, Max
+
+
+def number_notes(apps, schema_editor):
+    """Существующие заметки получают номера по id, счётчик - максимум."""
+    alias = schema_editor.connection.alias
+    Note = apps.get_model('notes', 'Note')
+    ChangeSequence = apps.get_model('notes', 'ChangeSequence')
+    if not router.allow_migrate_model(alias, Note):
+        return
+    notes = Note._base_manager.using(alias)
+    notes.update(change_seq=F('id'))
+    ChangeSequence.objects.using(alias).create(
+        pk=1, value=notes.aggregate(last=Max('id'))['last'] or 0
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0010_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField()),
+                ('author_id', models.BigIntegerField()),
+                ('slug', models.SlugField(max_length=100)),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Номер изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'change_seq'], name='notes_note_author_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notetombstone',
+            index=models.Index(fields=['author_id', 'change_seq'], name='notes_tomb_author_seq_idx'),
+        ),
+        migrations.RunPython(number_notes, migrations.RunPython.noop),
+    ]
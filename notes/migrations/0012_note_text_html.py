@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:01
+
+from django.db import migrations, models
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0011_note_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='render_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия рендера'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='text_html',
+            field=notes.fields.CompressedTextField(blank=True, default='', editable=False, verbose_name='HTML текста'),
+        ),
+    ]
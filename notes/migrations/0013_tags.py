@@ -0,0 +1,52 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0012_note_text_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=50, verbose_name='Тег')),
+                ('note_count', models.PositiveIntegerField(default=0, verbose_name='Заметок')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('author_id', 'name'), name='tag_author_name'),
+        ),
+        migrations.AddField(
+            model_name='notetag',
+            name='note',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='notes.note'),
+        ),
+        migrations.AddField(
+            model_name='notetag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='notes.tag'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='notes', through='notes.NoteTag', to='notes.Tag'),
+        ),
+        migrations.AddConstraint(
+            model_name='notetag',
+            constraint=models.UniqueConstraint(fields=('tag', 'note'), name='notetag_tag_note'),
+        ),
+    ]
@@ -1,6 +1,28 @@
 from django.conf import settings
-from django.db import models
-from pytils.translit import slugify
+from django.db import IntegrityError, models, router, transaction
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from . import markup, sharding, slugs, sync
+from .fields import CompressedTextField
+
+
+class NoteQuerySet(models.QuerySet):
+
+    def for_author(self, author):
+        """Заметки автора из его шарда."""
+        author_id = getattr(author, 'pk', author)
+        queryset = self
+        if sharding.is_sharded():
+            queryset = queryset.using(sharding.shard_for(author_id))
+        return queryset.filter(author_id=author_id)
+
+
+class NoteManager(models.Manager.from_queryset(NoteQuerySet)):
+    """Заметки без помеченных удалёнными, см. notes/purge.py."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Note(models.Model):
@@ -10,13 +32,13 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
-        max_length=100,
+        max_length=slugs.MAX_LENGTH,
         unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
@@ -24,14 +46,273 @@ class Note(models.Model):
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        # Заметки удалённого пользователя помечаются и удаляются
+        # пачками в фоне, см. notes/purge.py.
+        on_delete=models.DO_NOTHING,
+        # Заметки могут лежать в другой базе, чем пользователи.
+        db_constraint=False,
+    )
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+    deleted_at = models.DateTimeField('Удалена', null=True, blank=True)
+    # HTML текста и версия рендерера, которой он получен,
+    # см. notes/markup.py.
+    text_html = CompressedTextField(
+        'HTML текста', blank=True, default='', editable=False
+    )
+    render_version = models.PositiveSmallIntegerField(
+        'Версия рендера', default=0, editable=False
+    )
+    tags = models.ManyToManyField(
+        'Tag', through='NoteTag', related_name='notes', blank=True
     )
+    # Растёт с каждым изменением в шарде, см. notes/sync.py.
+    change_seq = models.BigIntegerField(
+        'Номер изменения', default=0, editable=False
+    )
+
+    objects = NoteManager()
+    # С помеченными удалёнными: для slug и очистки.
+    all_objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='notes_note_author_id_idx'
+            ),
+            models.Index(
+                fields=('author', 'updated_at'),
+                name='notes_note_author_upd_idx',
+            ),
+            models.Index(
+                fields=('author', 'change_seq'),
+                name='notes_note_author_seq_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        if sharding.is_sharded():
+            # Менеджер передаёт свой псевдоним (обычно default), а
+            # заметка всегда живёт в шарде автора.
+            kwargs['using'] = sharding.shard_for(self.author_id)
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        explicit = bool(self.slug)
+        base = self.slug or slugs.slug_from_title(self.title)
+        old_slug = self.stored_slug(using)
+        kwargs['update_fields'] = self.prepare_fields(
+            kwargs.get('update_fields')
+        )
+        for attempt in range(1, slugs.ATTEMPTS + 1):
+            claimed = False
+            try:
+                with transaction.atomic(using=using):
+                    if not explicit:
+                        self.slug = slugs.allocate_slug(
+                            base, exclude_pk=self.pk
+                        )
+                    claimed = sharding.claim_slug(self.author_id, self.slug)
+                    self.change_seq = sync.reserve(using)
+                    super().save(*args, **kwargs)
+                break
+            except IntegrityError:
+                if claimed:
+                    sharding.release_slugs((self.slug,))
+                # Явный slug занят - это ошибка пользователя; подобранный
+                # успел занять параллельный запрос - выбираем заново.
+                if explicit or attempt == slugs.ATTEMPTS:
+                    if not explicit:
+                        self.slug = ''
+                    raise
+        if old_slug and old_slug != self.slug:
+            sharding.release_slugs((old_slug,))
+
+    def prepare_fields(self, update_fields):
+        """Рендерит HTML, если меняется текст, и дополняет update_fields."""
+        if update_fields is None:
+            self.render()
+            return None
+        fields = {*update_fields, 'change_seq'}
+        if 'text' in fields:
+            self.render()
+            fields |= {'text_html', 'render_version'}
+        return fields
+
+    def render(self):
+        self.text_html = markup.render(self.text)
+        self.render_version = markup.VERSION
+
+    @property
+    def html(self):
+        """Готовый HTML; устаревший рендерится заново, но не сохраняется."""
+        if self.render_version == markup.VERSION:
+            return mark_safe(self.text_html)
+        return mark_safe(markup.render(self.text))
+
+    def stored_slug(self, using):
+        """Прежний slug из базы: его надо освободить в реестре шардов."""
+        if not (sharding.is_sharded() and self.pk):
+            return None
+        return type(self).all_objects.using(using).filter(
+            pk=self.pk
+        ).values_list('slug', flat=True).first()
+
+
+class NoteSlug(models.Model):
+    """Реестр slug всех шардов; ведётся только при нескольких шардах."""
+    slug = models.SlugField(max_length=slugs.MAX_LENGTH, unique=True)
+    author_id = models.BigIntegerField()
+
+
+class AuthorShard(models.Model):
+    """Автор, закреплённый за шардом мимо хеша.
+
+    Это перенесённые авторы и авторы, чьи заметки были в базе до
+    включения шардов (см. prepare_shards).
+    """
+    author_id = models.BigIntegerField(unique=True)
+    alias = models.CharField(max_length=100)
+
+
+class NoteRevision(models.Model):
+    """Состояние заметки после сохранения, см. notes/revisions.py.
+
+    data - полный текст для снимка или разница с предыдущей ревизией.
+    """
+    note = models.ForeignKey(
+        Note, on_delete=models.CASCADE, related_name='revisions'
+    )
+    number = models.PositiveIntegerField('Номер')
+    is_snapshot = models.BooleanField('Полный снимок', default=False)
+    title = models.CharField('Заголовок', max_length=100)
+    data = CompressedTextField()
+    created_at = models.DateTimeField('Создана', default=timezone.now)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='notes_revision_number_uniq'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id} #{self.number}'
+
+
+class PurgeJob(models.Model):
+    """Фоновое удаление помеченных заметок автора в одном шарде."""
+    USER = 'user'
+    NOTES = 'notes'
+    REASONS = (
+        (USER, 'Удалён пользователь'),
+        (NOTES, 'Пакетное удаление заметок'),
+    )
+    author_id = models.BigIntegerField('Автор')
+    shard = models.CharField('База', max_length=100)
+    reason = models.CharField('Причина', max_length=10, choices=REASONS)
+    total = models.PositiveIntegerField('Помечено заметок', default=0)
+    purged = models.PositiveIntegerField('Удалено заметок', default=0)
+    created_at = models.DateTimeField('Создана', default=timezone.now)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'очистка заметок'
+        verbose_name_plural = 'очистка заметок'
+
+    def __str__(self):
+        return f'{self.get_reason_display()}: автор {self.author_id}'
+
+
+class Task(models.Model):
+    """Отложенная задача для run_worker, см. notes/tasks.py."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ждёт'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+    name = models.CharField('Задача', max_length=100)
+    kwargs = models.JSONField('Аргументы', default=dict)
+    key = models.CharField('Ключ', max_length=200, blank=True)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    # Для ждущей задачи - когда запускать, для выполняемой - когда
+    # считать воркер упавшим и отдать задачу другому.
+    run_at = models.DateTimeField('Запуск', default=timezone.now)
+    error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        indexes = (models.Index(fields=('status', 'run_at')),)
+        constraints = (
+            # Одинаковая ждущая задача ставится в очередь один раз.
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(status='pending') & ~models.Q(key=''),
+                name='task_pending_key',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+
+class NoteTombstone(models.Model):
+    """След удалённой заметки для клиентов синхронизации."""
+    note_id = models.BigIntegerField()
+    author_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=slugs.MAX_LENGTH)
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author_id', 'change_seq'),
+                name='notes_tomb_author_seq_idx',
+            ),
+        )
+
+
+class ChangeSequence(models.Model):
+    """Счётчик изменений шарда: одна строка с id=1 в каждой базе."""
+    value = models.BigIntegerField(default=0)
+
+
+class Tag(models.Model):
+    """Тег автора; note_count ведёт notes/tags.py при записи."""
+    author_id = models.BigIntegerField()
+    name = models.CharField('Тег', max_length=50)
+    note_count = models.PositiveIntegerField('Заметок', default=0)
+
+    class Meta:
+        constraints = (
+            # Индекс заодно отдаёт теги автора в порядке имени.
+            models.UniqueConstraint(
+                fields=('author_id', 'name'), name='tag_author_name'
+            ),
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTag(models.Model):
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+    # Индекс по tag_id не нужен: его заменяет уникальный (tag, note).
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('tag', 'note'), name='notetag_tag_note'
+            ),
+        )
@@ -0,0 +1,63 @@
+from django.http import Http404
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Больший id не помещается в INTEGER SQLite: запрос упал бы с
+# OverflowError.
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(pk):
+    """Упаковывает id последней показанной записи в непрозрачный курсор."""
+    return urlsafe_base64_encode(force_bytes(pk))
+
+
+def decode_cursor(cursor):
+    """Возвращает id из курсора или 404, если курсор испорчен."""
+    try:
+        pk = int(force_str(urlsafe_base64_decode(cursor)))
+    except (TypeError, ValueError):
+        raise Http404('Некорректный курсор страницы.')
+    if not 0 <= pk <= MAX_PK:
+        raise Http404('Некорректный курсор страницы.')
+    return pk
+
+
+class Page:
+    """Уже выбранные записи страницы.
+
+    Умеет то, что нужно шаблонам и представлениям от QuerySet:
+    перебор, len() и count() без запроса к базе.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def count(self):
+        return len(self.rows)
+
+
+def paginate_keyset(queryset, cursor, page_size):
+    """Отдаёт страницу после курсора без OFFSET-сканирования.
+
+    queryset должен быть отсортирован по возрастанию pk.
+    Возвращает пару (Page, курсор следующей страницы или None).
+    Лишняя запись в выборке показывает, есть ли следующая страница,
+    без отдельного запроса.
+    """
+    if cursor:
+        queryset = queryset.filter(pk__gt=decode_cursor(cursor))
+    rows = list(queryset[:page_size + 1])
+    page = Page(rows[:page_size])
+    if len(rows) <= page_size:
+        return page, None
+    return page, encode_cursor(rows[page_size - 1].pk)
@@ -0,0 +1,154 @@
+"""Выборочное профилирование запросов через cProfile.
+
+Профилируется доля NOTES_PROFILE_SAMPLE_RATE запросов, а также запросы
+сотрудников с заголовком X-Profile или параметром ?_profile=1.
+Профили пишутся в NOTES_PROFILE_DIR/<имя URL>/, хранится не больше
+NOTES_PROFILE_MAX_FILES самых новых файлов. Накладные расходы жёстко
+ограничены: профилируется не больше одного запроса за раз на процесс,
+и время профилируемых запросов не превышает доли
+NOTES_PROFILE_MAX_SHARE от общего времени работы процесса.
+
+Асинхронные страницы обращаются к базе в пуле потоков, их профиль
+покажет только цикл событий, вместе с другими запросами в нём.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+from pathlib import Path
+
+from django.conf import settings
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_FLAG = '_profile'
+# Запас бюджета в секундах, чтобы редкий долгий запрос мог попасть
+# в профиль сразу после простоя.
+MAX_BUDGET = 5.0
+
+_lock = threading.Lock()
+_budget_lock = threading.Lock()
+_budget = [0.0, time.monotonic()]
+_sequence = count()
+
+
+def get_sample_rate():
+    return getattr(settings, 'NOTES_PROFILE_SAMPLE_RATE', 0.0)
+
+
+def get_directory():
+    return Path(getattr(settings, 'NOTES_PROFILE_DIR', 'profiles'))
+
+
+def is_flagged(request):
+    """Запрос просит профиль; право на это проверяет is_requested."""
+    return HEADER in request.META or QUERY_FLAG in request.GET
+
+
+def is_requested(request):
+    """Сотрудник явно попросил профиль этого запроса."""
+    if not is_flagged(request):
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def is_sampled():
+    rate = get_sample_rate()
+    return bool(rate and random.random() < rate)
+
+
+def should_profile(request):
+    return is_sampled() or is_requested(request)
+
+
+def _refill():
+    budget, updated = _budget
+    now = time.monotonic()
+    share = getattr(settings, 'NOTES_PROFILE_MAX_SHARE', 0.05)
+    _budget[:] = [min(MAX_BUDGET, budget + (now - updated) * share), now]
+
+
+def reset_budget():
+    with _budget_lock:
+        _budget[:] = [MAX_BUDGET, time.monotonic()]
+
+
+def acquire():
+    """Занимает право профилировать; False, если бюджет исчерпан."""
+    with _budget_lock:
+        _refill()
+        if _budget[0] <= 0:
+            return False
+    return _lock.acquire(blocking=False)
+
+
+def release(duration):
+    with _budget_lock:
+        _refill()
+        _budget[0] -= duration
+    _lock.release()
+
+
+def label(view_name):
+    return (view_name or 'unresolved').replace(':', '.')
+
+
+def save(profiler, view_name):
+    directory = get_directory() / label(view_name)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / (
+        f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-'
+        f'{next(_sequence)}.prof'
+    )
+    profiler.dump_stats(path)
+    rotate()
+    return path
+
+
+def rotate():
+    limit = getattr(settings, 'NOTES_PROFILE_MAX_FILES', 500)
+    files = sorted(
+        get_directory().glob('*/*.prof'), key=lambda path: path.stat().st_mtime
+    )
+    for path in files[:max(0, len(files) - limit)]:
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def profiling(request):
+    """Профилирует тело with; в список попадёт путь сохранённого профиля.
+
+    Профиль не снимается, если бюджет исчерпан или уже работает другой
+    профилировщик.
+    """
+    saved = []
+    if not acquire():
+        yield saved
+        return
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        try:
+            profiler.enable()
+        except ValueError:
+            # Уже работает другой профилировщик.
+            yield saved
+            return
+        try:
+            yield saved
+        finally:
+            profiler.disable()
+        match = request.resolver_match
+        saved.append(save(profiler, match.view_name if match else None))
+    finally:
+        release(time.perf_counter() - started)
+
+
+def profile(request, get_response):
+    """Выполняет запрос под cProfile; возвращает (ответ, путь профиля)."""
+    with profiling(request) as saved:
+        response = get_response(request)
+    return response, next(iter(saved), None)
@@ -0,0 +1,107 @@
+"""Отложенное удаление заметок.
+
+Удаление пользователя или пачки заметок только помечает строки
+deleted_at одним UPDATE: Note.objects их сразу не видит. Сами строки
+вместе с историей, поисковым индексом и slug удаляет purge_notes
+пачками по NOTES_PURGE_BATCH_SIZE, каждая в своей транзакции и с
+паузой NOTES_PURGE_PAUSE_MS между ними, чтобы не держать блокировку
+базы. Очистку запускает фоновая задача, purge_notes добирает
+оставшиеся задачи. Ход очистки виден в админке в PurgeJob.
+"""
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import sharding, sync, tasks
+from .models import Note, NoteTombstone, PurgeJob, Tag
+
+
+def batch_size():
+    return max(1, getattr(settings, 'NOTES_PURGE_BATCH_SIZE', 200))
+
+
+def pause():
+    return getattr(settings, 'NOTES_PURGE_PAUSE_MS', 50) / 1000
+
+
+def soft_delete(queryset, author_id, reason):
+    """Помечает заметки автора удалёнными и ставит задачу очистки."""
+    from .signals import authors_changed
+
+    shard = sharding.shard_for(author_id)
+    now = timezone.now()
+    # Номер изменения отдаёт удаление клиентам синхронизации сразу.
+    marked = sync.stamp(
+        queryset.using(shard), deleted_at=now, updated_at=now
+    )
+    if marked:
+        job = PurgeJob.objects.using(DEFAULT_DB_ALIAS).create(
+            author_id=author_id, shard=shard, reason=reason,
+            total=marked,
+        )
+        authors_changed((author_id,))
+        tasks.enqueue('notes.purge', job_id=job.pk)
+    return marked
+
+
+def purge_batch(job, size):
+    """Удаляет одну пачку со всеми сигналами post_delete."""
+    notes = Note.all_objects.using(job.shard)
+    with transaction.atomic(using=job.shard):
+        ids = list(
+            notes.filter(
+                author_id=job.author_id, deleted_at__isnull=False
+            ).order_by('id').values_list('id', flat=True)[:size]
+        )
+        if ids:
+            notes.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def run(job, size=None, delay=None):
+    size = size or batch_size()
+    delay = pause() if delay is None else delay
+    while True:
+        purged = purge_batch(job, size)
+        if not purged:
+            break
+        PurgeJob.objects.using(DEFAULT_DB_ALIAS).filter(pk=job.pk).update(
+            purged=F('purged') + purged
+        )
+        if not tasks.renew():
+            # Аренда истекла, очистку продолжает другой воркер.
+            return
+        if delay:
+            time.sleep(delay)
+    if job.reason == PurgeJob.USER:
+        # Следы удалений и теги удалённого аккаунта больше не нужны.
+        for model in (NoteTombstone, Tag):
+            model.objects.using(job.shard).filter(
+                author_id=job.author_id
+            ).delete()
+    job.finished_at = timezone.now()
+    job.save(update_fields=('finished_at',))
+
+
+@tasks.task('notes.purge')
+def purge_task(job_id):
+    job = PurgeJob.objects.using(DEFAULT_DB_ALIAS).filter(
+        pk=job_id, finished_at__isnull=True
+    ).first()
+    if job is not None:
+        run(job)
+
+
+def run_pending(size=None, delay=None):
+    """Выполняет незавершённые задачи по порядку, возвращает их число."""
+    jobs = PurgeJob.objects.using(DEFAULT_DB_ALIAS).filter(
+        finished_at__isnull=True
+    ).order_by('id')
+    done = 0
+    for job in jobs:
+        run(job, size, delay)
+        done += 1
+    return done
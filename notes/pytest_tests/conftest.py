@@ -1,9 +1,18 @@
 import pytest
+from django.core.cache import cache
 from django.test.client import Client
 
+from notes.auth_cache import local
+from notes.cache import reset_stats
 from notes.models import Note
 
 
+@pytest.fixture(autouse=True)
+def eager_tasks(settings):
+    """Фоновые задачи выполняются сразу, без run_worker."""
+    settings.NOTES_TASKS_EAGER = True
+
+
 @pytest.fixture
 def author(django_user_model):
     return django_user_model.objects.create(username='Автор')
@@ -51,3 +60,36 @@ def form_data():
         'text': 'Новый текст',
         'slug': 'new-slug'
     }
+
+
+@pytest.fixture
+def page_cache(settings):
+    settings.NOTES_CACHE_ENABLED = True
+    cache.clear()
+    reset_stats()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def auth_cache(settings):
+    settings.NOTES_AUTH_CACHE_ENABLED = True
+    settings.SESSION_ENGINE = 'notes.sessions'
+    cache.clear()
+    local.clear()
+    yield
+    cache.clear()
+    local.clear()
+
+
+@pytest.fixture(params=('small', 'large'))
+def dataset(request, author, not_author, note):
+    """Заметка автора среди немногих или многих чужих и своих заметок."""
+    if request.param == 'large':
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {number}', text='Текст',
+                 slug=f'bulk-{number}',
+                 author=author if number % 2 else not_author)
+            for number in range(2000)
+        )
+    return note
@@ -0,0 +1,97 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from notes.forms import WARNING
+from notes.models import Note
+
+BATCH_URL = reverse('notes:api-batch')
+
+
+def post_batch(client, operations):
+    return client.post(
+        BATCH_URL, json.dumps(operations), content_type='application/json'
+    )
+
+
+def test_batch_applies_all_operations(author_client, author, note):
+    other = Note.objects.create(title='Другая', text='Текст', author=author)
+    response = post_batch(author_client, [
+        {'op': 'create', 'data': {'title': 'Первая', 'text': 'Один'}},
+        {'op': 'create', 'data': {'title': 'Первая', 'text': 'Два'}},
+        {'op': 'update', 'slug': note.slug, 'data': {'text': 'Изменён'}},
+        {'op': 'delete', 'slug': other.slug},
+    ])
+    assert response.status_code == HTTPStatus.OK
+    results = response.json()['results']
+    assert [result['status'] for result in results] == ['ok'] * 4
+    assert results[0]['slug'] == 'pervaya'
+    assert results[1]['slug'] == 'pervaya-2'
+    assert Note.objects.get(pk=results[0]['id']).text == 'Один'
+    note.refresh_from_db()
+    assert note.text == 'Изменён'
+    assert not Note.objects.filter(pk=other.pk).exists()
+    assert Note.objects.filter(author=author).count() == 3
+
+
+def test_batch_swaps_slugs(author_client, author, note):
+    other = Note.objects.create(title='Другая', text='Текст', author=author)
+    response = post_batch(author_client, [
+        {'op': 'update', 'slug': note.slug, 'data': {'slug': other.slug}},
+        {'op': 'update', 'slug': other.slug, 'data': {'slug': note.slug}},
+    ])
+    assert response.status_code == HTTPStatus.OK
+    assert Note.objects.get(pk=note.pk).slug == other.slug
+    assert Note.objects.get(pk=other.pk).slug == note.slug
+
+
+def test_batch_empty_slug_keeps_own_slug(author_client, author):
+    note = Note.objects.create(title='Привет', text='Текст', author=author)
+    response = post_batch(author_client, [
+        {'op': 'update', 'slug': note.slug,
+         'data': {'slug': '', 'text': 'Новый'}},
+    ])
+    assert response.json()['results'][0]['slug'] == note.slug
+    assert Note.objects.get(pk=note.pk).slug == note.slug
+
+
+def test_batch_is_rolled_back_on_error(author_client, note):
+    response = post_batch(author_client, [
+        {'op': 'create', 'data': {'title': 'Новая', 'text': 'Текст'}},
+        {'op': 'create', 'data': {
+            'title': 'Дубль', 'text': 'Текст', 'slug': note.slug
+        }},
+    ])
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    results = response.json()['results']
+    assert results[0]['status'] == 'ok'
+    assert results[1]['errors'] == {'slug': [note.slug + WARNING]}
+    assert Note.objects.count() == 1
+
+
+def test_batch_cant_touch_other_users_notes(not_author_client, note):
+    response = post_batch(not_author_client, [
+        {'op': 'delete', 'slug': note.slug},
+    ])
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert Note.objects.filter(pk=note.pk).exists()
+
+
+@pytest.mark.django_db
+def test_api_requires_login(client):
+    response = post_batch(client, [])
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_api_read_paths(author_client, not_author_client, note):
+    response = author_client.get(reverse('notes:api-list'))
+    assert response.json() == {
+        'results': [{'id': note.id, 'title': note.title, 'slug': note.slug}],
+        'next': None,
+    }
+    url = reverse('notes:api-detail', args=(note.slug,))
+    assert author_client.get(url).json()['text'] == note.text
+    response = not_author_client.get(url)
+    assert response.status_code == HTTPStatus.NOT_FOUND
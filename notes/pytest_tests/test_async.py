@@ -0,0 +1,92 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import AsyncClient
+from django.urls import reverse
+from pytest_django.asserts import assertRedirects
+
+from notes import metrics, profiling
+from notes.middleware import (
+    MetricsMiddleware, ProfilingMiddleware, ReadReplicaMiddleware,
+)
+
+# Асинхронные страницы ходят в базу из своего пула потоков, поэтому
+# данные теста должны быть зафиксированы, а не висеть в транзакции.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def test_async_list_and_detail(author_client, note):
+    response = author_client.get(reverse('notes:async-list'))
+    assert response.status_code == HTTPStatus.OK
+    assert note.title in response.content.decode()
+    response = author_client.get(
+        reverse('notes:async-detail', args=(note.slug,))
+    )
+    assert note.text in response.content.decode()
+
+
+def test_async_detail_is_scoped_by_author(not_author_client, note):
+    url = reverse('notes:async-detail', args=(note.slug,))
+    assert not_author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+    url = reverse('notes:async-api-detail', args=(note.slug,))
+    assert not_author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_async_api(author_client, note):
+    response = author_client.get(reverse('notes:async-api-list'))
+    assert response.json()['results'] == [
+        {'id': note.id, 'title': note.title, 'slug': note.slug}
+    ]
+
+
+def test_async_redirects_anonymous(client):
+    url = reverse('notes:async-list')
+    login_url = reverse('users:login')
+    assertRedirects(client.get(url), f'{login_url}?next={url}')
+    response = client.get(reverse('notes:async-api-list'))
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.parametrize('middleware', (
+    ReadReplicaMiddleware, MetricsMiddleware, ProfilingMiddleware,
+))
+def test_middleware_keeps_chain_async(middleware):
+    async def view(request):
+        return HttpResponse()
+
+    assert asyncio.iscoroutinefunction(middleware(view))
+    assert not asyncio.iscoroutinefunction(middleware(HttpResponse))
+
+
+def test_asgi_request_through_middleware(settings, author, note):
+    settings.NOTES_READ_REPLICA = 'replica'
+    settings.NOTES_METRICS_ENABLED = True
+    metrics.reset()
+    cache.clear()
+    client = AsyncClient()
+    client.force_login(author)
+    response = asyncio.run(client.get(reverse('notes:async-list')))
+    assert response.status_code == HTTPStatus.OK
+    assert note.title in response.content.decode()
+    labels = (('view', 'notes:async-list'),)
+    totals = metrics.collect()
+    assert totals['yanote_requests_total', labels + (
+        ('method', 'GET'), ('status', HTTPStatus.OK),
+    )] == 1
+    assert totals['yanote_db_queries_total', labels] > 0
+    cache.clear()
+
+
+def test_asgi_staff_can_request_profile(settings, tmp_path, django_user_model):
+    settings.NOTES_PROFILE_DIR = tmp_path
+    profiling.reset_budget()
+    staff = django_user_model.objects.create(username='Сотрудник',
+                                             is_staff=True)
+    client = AsyncClient()
+    client.force_login(staff)
+    url = reverse('notes:async-list')
+    response = asyncio.run(client.get(f'{url}?_profile=1'))
+    assert (tmp_path / 'notes.async-list' / response['X-Profile']).exists()
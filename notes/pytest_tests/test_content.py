@@ -1,7 +1,15 @@
+from http import HTTPStatus
+
 import pytest
+from django.core.cache.backends.base import CacheKeyWarning
 from django.urls import reverse
 
+from notes import markup
+from notes.cache import get_stats
 from notes.forms import NoteForm
+from notes.models import Note
+from notes.pagination import encode_cursor
+from notes.views import NotesList
 
 
 @pytest.mark.parametrize(
@@ -46,3 +54,121 @@ def test_pages_contains_form(author_client, name, args):
     response = author_client.get(url)
     assert 'form' in response.context
     assert isinstance(response.context['form'], NoteForm)
+
+
+def test_notes_list_is_paginated_by_cursor(author, author_client):
+    Note.objects.bulk_create(
+        Note(title=f'Заметка {index}', text='Текст', slug=f'note-{index}',
+             author=author)
+        for index in range(NotesList.page_size + 1)
+    )
+    url = reverse('notes:list')
+    response = author_client.get(url)
+    first_page = list(response.context['object_list'])
+    next_cursor = response.context['next_cursor']
+    assert len(first_page) == NotesList.page_size
+    assert next_cursor is not None
+    response = author_client.get(url, {'after': next_cursor})
+    second_page = list(response.context['object_list'])
+    assert len(second_page) == 1
+    assert second_page[0].pk > first_page[-1].pk
+    assert response.context['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', ('!!!', encode_cursor(10 ** 30)))
+def test_notes_list_broken_cursor(author_client, cursor):
+    response = author_client.get(reverse('notes:list'), {'after': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize('cursor', ('a b', '\x01' * 300))
+def test_cached_list_rejects_unsafe_cursor(
+        page_cache, author_client, cursor, recwarn
+):
+    response = author_client.get(reverse('notes:list'), {'after': cursor})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert not [
+        warning for warning in recwarn
+        if issubclass(warning.category, CacheKeyWarning)
+    ]
+
+
+@pytest.mark.parametrize('name', ('notes:list', 'notes:detail'))
+def test_cached_page_skips_database(
+        page_cache, note, author_client, name, django_assert_num_queries
+):
+    args = (note.slug,) if name == 'notes:detail' else None
+    url = reverse(name, args=args)
+    first = author_client.get(url)
+    with django_assert_num_queries(3):
+        # Остаются запросы сессии, пользователя и состояния для ETag.
+        second = author_client.get(url)
+    assert second.content == first.content
+    kind = 'detail' if name == 'notes:detail' else 'list'
+    assert get_stats() == {(kind, 'miss'): 1, (kind, 'hit'): 1}
+
+
+def test_cached_page_invalidated_on_write(
+        page_cache, note, author_client, not_author_client,
+        django_capture_on_commit_callbacks
+):
+    url = reverse('notes:detail', args=(note.slug,))
+    author_client.get(url)
+    not_author_client.get(reverse('notes:list'))
+    with django_capture_on_commit_callbacks(execute=True):
+        note.title = 'Новый заголовок'
+        note.save()
+    assert 'Новый заголовок' in author_client.get(url).content.decode()
+    not_author_client.get(reverse('notes:list'))
+    assert get_stats()[('list', 'hit')] == 1
+
+
+def test_detail_not_modified(note, author_client):
+    url = reverse('notes:detail', args=(note.slug,))
+    response = author_client.get(url)
+    assert response.has_header('Last-Modified')
+    response = author_client.get(
+        url, HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    note.text = 'Другой текст'
+    note.save()
+    response = author_client.get(
+        url, HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_detail_revalidated_after_render_version_change(
+        page_cache, note, author_client, monkeypatch
+):
+    url = reverse('notes:detail', args=(note.slug,))
+    etag = author_client.get(url)['ETag']
+    monkeypatch.setattr(markup, 'VERSION', markup.VERSION + 1)
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert ('detail', 'hit') not in get_stats()
+
+
+def test_list_not_modified_until_note_deleted(
+        note, author_client, django_assert_num_queries
+):
+    url = reverse('notes:list')
+    etag = author_client.get(url)['ETag']
+    with django_assert_num_queries(3):
+        response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    note.delete()
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_cached_detail_hit_single_query(
+        auth_cache, page_cache, note, author_client, django_assert_num_queries
+):
+    url = reverse('notes:detail', args=(note.slug,))
+    first = author_client.get(url)
+    with django_assert_num_queries(1):
+        # Сессия и пользователь из кеша, остаётся запрос для ETag.
+        second = author_client.get(url)
+    assert second.content == first.content
@@ -0,0 +1,59 @@
+import io
+import json
+import zipfile
+from http import HTTPStatus
+from secrets import token_hex
+
+from django.urls import reverse
+
+from notes import export
+from notes.models import Note
+
+EXPORT_URL = reverse('notes:export')
+
+
+def download(client, kind):
+    response = client.get(EXPORT_URL, {'format': kind})
+    assert response.status_code == HTTPStatus.OK
+    assert response.streaming
+    assert 'attachment' in response['Content-Disposition']
+    return b''.join(response.streaming_content)
+
+
+def test_export_ndjson(author_client, author, note, not_author):
+    Note.objects.create(title='Чужая', text='Текст', author=not_author)
+    lines = download(author_client, 'ndjson').decode().splitlines()
+    assert [json.loads(line) for line in lines] == [{
+        'title': note.title, 'text': note.text, 'slug': note.slug,
+        'author': author.username,
+    }]
+
+
+def test_export_zip_has_file_per_note(author_client, author, note):
+    Note.objects.create(title='Вторая', text='Второй текст', author=author)
+    archive = zipfile.ZipFile(io.BytesIO(download(author_client, 'zip')))
+    assert sorted(archive.namelist()) == sorted(
+        [f'{note.slug}.md', 'vtoraya.md']
+    )
+    assert archive.read('vtoraya.md').decode() == (
+        '# Вторая\n\nВторой текст\n'
+    )
+
+
+def test_export_is_streamed_in_blocks(author, monkeypatch):
+    monkeypatch.setattr(export, 'BLOCK_BYTES', 1024)
+    Note.objects.bulk_create(
+        Note(title=f'Заметка {i}', text=token_hex(300), slug=f'bulk-{i}',
+             author=author)
+        for i in range(10)
+    )
+    queryset = Note.objects.filter(author=author)
+    blocks = list(export.ndjson(queryset, author.username))
+    assert len(blocks) > 1
+    assert all(len(block) < 2048 for block in blocks)
+    assert len(list(export.zip_archive(queryset))) > 1
+
+
+def test_export_unknown_format(author_client):
+    response = author_client.get(EXPORT_URL, {'format': 'pdf'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
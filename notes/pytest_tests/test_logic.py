@@ -1,12 +1,26 @@
+import os
+import sqlite3
+import threading
+import time
 from http import HTTPStatus
+from io import StringIO
 
 import pytest
+from django.core.cache import cache as django_cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test.client import Client
 from django.urls import reverse
 from pytest_django.asserts import assertFormError, assertRedirects
 from pytils.translit import slugify
 
+from notes import profiling, replica
+from notes.checks import check_replica_cache
 from notes.forms import WARNING
 from notes.models import Note
+from notes.routers import ReadReplicaRouter
+from notes.slugs import allocate_slugs
+from notes.write_queue import WriteQueue, get_write_queue
 
 
 def test_user_can_create_note(author_client, author, form_data):
@@ -82,3 +96,272 @@ def test_other_user_cant_delete_note(not_author_client, slug_for_args):
     response = not_author_client.post(url)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert Note.objects.count() == 1
+
+
+def test_search_ranks_title_matches_first(author, author_client):
+    in_text = Note.objects.create(
+        title='Покупки', text='Купить молоко', author=author
+    )
+    in_title = Note.objects.create(
+        title='Молоко', text='Не забыть', author=author
+    )
+    response = author_client.get(reverse('notes:search'), {'q': 'молоко'})
+    assert list(response.context['object_list']) == [in_title, in_text]
+
+
+def test_search_is_scoped_by_author(note, not_author_client):
+    response = not_author_client.get(
+        reverse('notes:search'), {'q': note.title}
+    )
+    assert list(response.context['object_list']) == []
+
+
+def test_search_index_follows_edit_and_delete(author_client, note):
+    url = reverse('notes:search')
+    author_client.post(
+        reverse('notes:edit', args=(note.slug,)),
+        {'title': 'Редкое слово', 'text': note.text, 'slug': note.slug},
+    )
+    response = author_client.get(url, {'q': 'редкое'})
+    assert list(response.context['object_list']) == [note]
+    author_client.post(reverse('notes:delete', args=(note.slug,)))
+    response = author_client.get(url, {'q': 'редкое'})
+    assert list(response.context['object_list']) == []
+
+
+def test_rebuild_search_index_command(author_client, note):
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM notes_note_fts')
+    call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+    response = author_client.get(reverse('notes:search'), {'q': 'Текст'})
+    assert list(response.context['object_list']) == [note]
+
+
+def test_export_import_roundtrip(author, note, tmp_path):
+    path = tmp_path / 'notes.ndjson'
+    call_command('export_notes', output=str(path), stderr=StringIO())
+    call_command('import_notes', str(path), batch_size=1, stdout=StringIO(),
+                 stderr=StringIO())
+    assert Note.objects.count() == 2
+    imported = Note.objects.exclude(pk=note.pk).get()
+    assert imported.title == note.title
+    assert imported.text == note.text
+    assert imported.author == author
+    assert imported.slug == note.slug + '-2'
+
+
+@pytest.mark.django_db
+def test_import_unknown_author(tmp_path):
+    path = tmp_path / 'notes.ndjson'
+    path.write_text(
+        '{"title": "Заголовок", "text": "Текст", "author": "Нет такого"}\n',
+        encoding='utf-8',
+    )
+    with pytest.raises(CommandError):
+        call_command('import_notes', str(path), stdout=StringIO(),
+                     stderr=StringIO())
+
+
+def test_same_title_gets_numbered_slug(author_client, form_data):
+    form_data.pop('slug')
+    url = reverse('notes:add')
+    for _ in range(3):
+        response = author_client.post(url, data=form_data)
+        assertRedirects(response, reverse('notes:success'))
+    expected_slug = slugify(form_data['title'])
+    assert set(Note.objects.values_list('slug', flat=True)) == {
+        expected_slug, expected_slug + '-2', expected_slug + '-3'
+    }
+
+
+def test_allocate_slugs_uses_one_query(note, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        allocated = allocate_slugs((note.slug, 'fresh', note.slug, 'fresh'))
+    assert allocated == [
+        note.slug + '-2', 'fresh', note.slug + '-3', 'fresh-2'
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_queue_commits_concurrent_writes_together(author):
+    write_queue = WriteQueue(window=0.2)
+    slugs = ('first', 'second', 'first')
+    outcomes = {}
+
+    def create(index, slug):
+        try:
+            outcomes[index] = write_queue.submit(
+                Note.objects.create, title='Заголовок', text='Текст',
+                slug=slug, author=author,
+            )
+        except IntegrityError as error:
+            outcomes[index] = error
+
+    threads = [
+        threading.Thread(target=create, args=(index, slug))
+        for index, slug in enumerate(slugs)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(Note.objects.values_list('slug', flat=True)) == [
+        'first', 'second'
+    ]
+    assert sum(
+        isinstance(outcome, IntegrityError) for outcome in outcomes.values()
+    ) == 1
+    stats = write_queue.get_stats()
+    assert stats['batches'] == 1
+    assert (stats['succeeded'], stats['failed']) == (2, 1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_views_write_through_queue(settings, author_client, form_data):
+    settings.NOTES_WRITE_QUEUE_ENABLED = True
+    response = author_client.post(reverse('notes:add'), data=form_data)
+    assertRedirects(response, reverse('notes:success'))
+    response = author_client.post(reverse('notes:add'), data=form_data)
+    assertFormError(
+        response, 'form', 'slug', errors=(form_data['slug'] + WARNING)
+    )
+    url = reverse('notes:delete', args=(form_data['slug'],))
+    assertRedirects(author_client.post(url), reverse('notes:success'))
+    assert Note.objects.count() == 0
+    settings.NOTES_METRICS_ENABLED = True
+    response = author_client.get(reverse('notes:metrics'))
+    assert 'yanote_write_queue_batches_total{db="default"}' in (
+        response.content.decode()
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_queue_restarts_dead_writer():
+    write_queue = WriteQueue(window=0)
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    write_queue._pid, write_queue._thread = os.getpid(), dead
+    assert write_queue.submit(int, '7') == 7
+    assert write_queue.get_stats()['restarts'] == 1
+
+
+def test_write_queue_per_database():
+    shard_queue = get_write_queue('shard_1')
+    assert shard_queue.using == 'shard_1'
+    assert shard_queue is not get_write_queue()
+
+
+def test_replica_backup_replaces_copy(tmp_path):
+    source = tmp_path / 'source.sqlite3'
+    target = tmp_path / 'replica.sqlite3'
+    with sqlite3.connect(source) as db:
+        db.execute('CREATE TABLE t (value)')
+        db.execute('INSERT INTO t VALUES (1)')
+    replica.backup(str(source), str(target))
+    with sqlite3.connect(source) as db:
+        db.execute('INSERT INTO t VALUES (2)')
+    reader = sqlite3.connect(target)
+    replica.backup(str(source), str(target))
+    # Открытое соединение дочитывает старый снимок, новое видит новый.
+    assert reader.execute('SELECT count(*) FROM t').fetchone() == (1,)
+    reader.close()
+    with sqlite3.connect(target) as db:
+        assert db.execute('SELECT count(*) FROM t').fetchone() == (2,)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_pinned_to_primary_after_write(settings, author):
+    settings.NOTES_READ_REPLICA = 'replica'
+    django_cache.clear()
+    router = ReadReplicaRouter()
+    token = replica.activate(author.pk)
+    assert router.db_for_read(Note) == 'replica'
+    replica.deactivate(token)
+
+    Note.objects.create(title='Заголовок', text='Текст', author=author)
+    token = replica.activate(author.pk)
+    assert router.db_for_read(Note) is None
+    replica.deactivate(token)
+
+    django_cache.set(replica.SNAPSHOT_KEY, time.time() + 1)
+    token = replica.activate(author.pk)
+    assert router.db_for_read(Note) == 'replica'
+    replica.deactivate(token)
+    django_cache.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pin_outlives_snapshot_taken_before_commit(settings, author):
+    settings.NOTES_READ_REPLICA = 'replica'
+    django_cache.clear()
+    with transaction.atomic():
+        Note.objects.create(title='Заголовок', text='Текст', author=author)
+        # refresh_replica снял снимок между записью и фиксацией.
+        django_cache.set(replica.SNAPSHOT_KEY, time.time())
+    assert replica.is_pinned_user(author.pk)
+    django_cache.clear()
+
+
+def test_replica_requires_shared_cache(settings):
+    assert check_replica_cache(None) == []
+    settings.NOTES_READ_REPLICA = 'replica'
+    assert [error.id for error in check_replica_cache(None)] == [
+        'notes.E001'
+    ]
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache',
+    }}
+    assert check_replica_cache(None) == []
+
+
+def test_password_change_drops_cached_user(auth_cache, author, author_client):
+    url = reverse('notes:list')
+    assert author_client.get(url).status_code == HTTPStatus.OK
+    author.set_password('new-password-1')
+    author.save()
+    response = author_client.get(url)
+    assert response.status_code == HTTPStatus.FOUND
+
+
+def test_staff_can_request_profile(
+        settings, tmp_path, django_user_model, note
+):
+    settings.NOTES_PROFILE_DIR = tmp_path
+    profiling.reset_budget()
+    staff = django_user_model.objects.create(username='Сотрудник',
+                                             is_staff=True)
+    client = Client()
+    client.force_login(staff)
+    url = reverse('notes:list')
+    assert 'X-Profile' not in client.get(url)
+    response = client.get(url, HTTP_X_PROFILE='1')
+    assert (tmp_path / 'notes.list' / response['X-Profile']).exists()
+    out = StringIO()
+    call_command('profile_report', 'notes:list', stdout=out)
+    assert out.getvalue().startswith('notes.list: профилей 1')
+
+
+def test_profile_flag_ignored_for_regular_users(
+        settings, tmp_path, author_client
+):
+    settings.NOTES_PROFILE_DIR = tmp_path
+    response = author_client.get(reverse('notes:list') + '?_profile=1')
+    assert 'X-Profile' not in response
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize('size, header', ((10, b'\x00'), (50_000, b'\x01')))
+def test_text_stored_compressed(author, size, header):
+    text = 'строка лога\n' * size
+    note = Note.objects.create(title='Лог', text=text, author=author)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT text FROM notes_note WHERE id = %s', [note.pk]
+        )
+        stored = bytes(cursor.fetchone()[0])
+    assert stored[:1] == header
+    if size > 1000:
+        assert len(stored) < len(text.encode()) / 10
+    assert Note.objects.get(pk=note.pk).text == text
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes import markup
+from notes.models import Note
+
+
+@pytest.mark.parametrize('text, html', (
+    ('# Заголовок', '<h1>Заголовок</h1>'),
+    ('**жирный** и *курсив*',
+     '<p><strong>жирный</strong> и <em>курсив</em></p>'),
+    ('- раз\n- два', '<ul><li>раз</li><li>два</li></ul>'),
+    ('1. раз', '<ol><li>раз</li></ol>'),
+    ('строка\nещё', '<p>строка<br>\nещё</p>'),
+    ('```\n<b>\n```', '<pre><code>&lt;b&gt;</code></pre>'),
+    ('`*не курсив*`', '<p><code>*не курсив*</code></p>'),
+    ('[сайт](https://example.com)',
+     '<p><a href="https://example.com" rel="nofollow noopener">'
+     'сайт</a></p>'),
+))
+def test_render(text, html):
+    assert markup.render(text) == html
+
+
+@pytest.mark.parametrize('text', (
+    '<script>alert(1)</script>',
+    '<img src=x onerror=alert(1)>',
+    '[x](javascript:alert(1))',
+    '[x](JaVaScRiPt&#58;alert(1))',
+    '[x](data:text/html;base64,PHNjcmlwdD4=)',
+    '[x"onmouseover="alert(1)](/ok)',
+))
+def test_render_is_sanitized(text):
+    html = markup.render(text)
+    assert '<script' not in html
+    assert '<img' not in html
+    assert 'href="javascript' not in html.lower()
+    assert 'href="data' not in html
+    assert '"onmouseover' not in html
+
+
+def test_html_is_rendered_on_save(author_client, note):
+    note.text = '**Новый** текст'
+    note.save(update_fields=('text',))
+    note.refresh_from_db()
+    assert note.render_version == markup.VERSION
+    assert note.text_html == '<p><strong>Новый</strong> текст</p>'
+    response = author_client.get(reverse('notes:detail', args=(note.slug,)))
+    assert '<strong>Новый</strong>' in response.content.decode()
+
+
+def test_bulk_saved_notes_are_rendered_in_background(author_client, note):
+    author_client.post(
+        reverse('notes:api-batch'),
+        json.dumps([{'op': 'update', 'slug': note.slug,
+                     'data': {'text': '*Пакет*'}}]),
+        content_type='application/json',
+    )
+    note.refresh_from_db()
+    assert note.render_version == markup.VERSION
+    assert note.text_html == '<p><em>Пакет</em></p>'
+
+
+def test_rerender_updates_stale_rows(note, monkeypatch):
+    monkeypatch.setattr(markup, 'VERSION', markup.VERSION + 1)
+    assert Note.objects.get(pk=note.pk).html == markup.render(note.text)
+    call_command('rerender_notes')
+    assert Note.objects.get(pk=note.pk).render_version == markup.VERSION
@@ -0,0 +1,62 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from notes import purge, search
+from notes.models import Note, NoteRevision, PurgeJob
+
+BATCH_URL = reverse('notes:api-batch')
+
+
+@pytest.fixture(autouse=True)
+def eager_tasks(settings):
+    """Очистку запускает сама проверка, а не фоновая задача."""
+    settings.NOTES_TASKS_EAGER = False
+
+
+@pytest.fixture
+def notes(author):
+    return [
+        Note.objects.create(title=f'Заметка {i}', text='Текст', author=author)
+        for i in range(5)
+    ]
+
+
+def test_user_deletion_marks_notes_and_queues_purge(author, notes):
+    author_id = author.pk
+    author.delete()
+    assert not Note.objects.filter(author_id=author_id).exists()
+    assert Note.all_objects.filter(author_id=author_id).count() == 5
+    job = PurgeJob.objects.get(author_id=author_id)
+    assert (job.reason, job.total, job.purged) == (PurgeJob.USER, 5, 0)
+
+
+def test_purge_runs_in_batches(author, notes):
+    author_id = author.pk
+    author.delete()
+    assert purge.run_pending(size=2, delay=0) == 1
+    assert not Note.all_objects.exists()
+    assert not NoteRevision.objects.exists()
+    assert search.ranked_ids(author_id, 'Заметка', 10) == []
+    job = PurgeJob.objects.get(author_id=author_id)
+    assert job.purged == 5
+    assert job.finished_at is not None
+    assert purge.run_pending() == 0
+
+
+def test_batch_delete_keeps_slug_until_purge(author_client, author, notes):
+    slug = notes[0].slug
+    response = author_client.post(
+        BATCH_URL, json.dumps([{'op': 'delete', 'slug': slug}]),
+        content_type='application/json',
+    )
+    assert response.json()['results'][0]['status'] == 'ok'
+    url = reverse('notes:detail', args=(slug,))
+    assert author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+    assert Note.objects.filter(author=author).count() == 4
+    call_command('purge_notes', '--once')
+    assert not Note.all_objects.filter(slug=slug).exists()
+    assert PurgeJob.objects.get().reason == PurgeJob.NOTES
@@ -0,0 +1,186 @@
+"""Бюджеты SQL-запросов страниц и проверка планов запросов.
+
+Число запросов не должно зависеть от объёма данных (признак N+1), а
+запросы к таблицам не должны переходить на полный просмотр.
+"""
+import json
+import re
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes import metrics, tags
+
+# Сессия и пользователь - два запроса на каждой странице с входом.
+BUDGETS = (
+    # (имя URL, нужен ли slug, бюджет)
+    ('notes:home', False, 2),
+    ('notes:add', False, 2),
+    ('notes:success', False, 2),
+    # Форма правки загружает теги заметки.
+    ('notes:edit', True, 4),
+    ('notes:delete', True, 3),
+    ('notes:detail', True, 4),
+    # Теги заметок страницы и теги боковой панели - по запросу.
+    ('notes:list', False, 6),
+    ('notes:search', False, 5),
+    ('notes:api-list', False, 3),
+    ('notes:api-detail', True, 3),
+    # Правка одной заметки пакетом; задачи в тестах выполняются сразу:
+    # номер изменения, индекс, HTML и история, с точками сохранения.
+    ('notes:api-batch', False, 26),
+    ('notes:metrics', False, 2),
+    ('notes:history', True, 4),
+    ('notes:revision', True, 4),
+    ('notes:api-sync', False, 4),
+)
+ASYNC_BUDGETS = (
+    ('notes:async-list', False, 4),
+    ('notes:async-detail', True, 3),
+    ('notes:async-api-list', False, 3),
+    ('notes:async-api-detail', True, 3),
+)
+SLUG_LOOKUPS = ('notes:edit', 'notes:delete', 'notes:detail')
+
+
+def url_for(name, with_slug, note):
+    args = (note.slug,) if with_slug else ()
+    if name == 'notes:revision':
+        args += (1,)
+    url = reverse(name, args=args or None)
+    if name == 'notes:search':
+        url += f'?q={note.title}'
+    return url
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(sql):
+    """Строки плана с полным просмотром таблицы или сортировкой без индекса.
+
+    Полнотекстовый поиск просматривает виртуальную таблицу FTS5 и
+    сортирует по рангу - это ожидаемо.
+    """
+    problems = []
+    if re.match(r'\d+ times: ', sql):
+        # executemany записывается без параметров, план не построить.
+        return problems
+    for line in explain(sql):
+        if line.startswith('SCAN ') and not (
+                'VIRTUAL TABLE' in line or 'CONSTANT ROW' in line):
+            problems.append(line)
+        if 'TEMP B-TREE' in line and ' MATCH ' not in sql:
+            problems.append(line)
+    return problems
+
+
+@pytest.fixture
+def metrics_enabled(settings):
+    """/metrics измеряется включённым, остальным страницам всё равно."""
+    settings.NOTES_METRICS_ENABLED = True
+
+
+def capture(client, url, data=None):
+    """SQL успешного запроса; с data - POST с этим JSON."""
+    with CaptureQueriesContext(connection) as context:
+        if data is None:
+            response = client.get(url)
+        else:
+            response = client.post(
+                url, json.dumps(data), content_type='application/json'
+            )
+    assert response.status_code == HTTPStatus.OK, url
+    return [query['sql'] for query in context.captured_queries]
+
+
+def capture_page(client, name, with_slug, note):
+    data = None
+    if name == 'notes:api-batch':
+        data = [{
+            'op': 'update', 'slug': note.slug, 'data': {'text': 'Новый'}
+        }]
+    return capture(client, url_for(name, with_slug, note), data)
+
+
+@pytest.mark.parametrize('name, with_slug, budget', BUDGETS)
+def test_query_budget(
+        metrics_enabled, dataset, author_client, name, with_slug, budget
+):
+    queries = capture_page(author_client, name, with_slug, dataset)
+    assert len(queries) <= budget, '\n'.join(queries)
+
+
+@pytest.mark.parametrize(
+    'name, with_slug', [(name, with_slug) for name, with_slug, _ in BUDGETS]
+)
+def test_queries_use_indexes(
+        metrics_enabled, dataset, author_client, name, with_slug
+):
+    for sql in capture_page(author_client, name, with_slug, dataset):
+        assert plan_problems(sql) == [], sql
+
+
+@pytest.mark.parametrize('name', SLUG_LOOKUPS)
+def test_slug_lookup_uses_unique_index(dataset, author_client, name):
+    queries = [
+        sql for sql in capture(
+            author_client, url_for(name, True, dataset)
+        )
+        if '"notes_note"."slug" =' in sql
+    ]
+    assert queries
+    for sql in queries:
+        assert any(
+            line.startswith('SEARCH notes_note USING INDEX')
+            and '(slug=?)' in line
+            for line in explain(sql)
+        ), sql
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('name, with_slug, budget', ASYNC_BUDGETS)
+def test_async_query_budget(author_client, note, name, with_slug, budget):
+    # Асинхронные страницы ходят в базу из пула потоков, поэтому
+    # запросы считаются через обёртку метрик во всех соединениях.
+    stats, token = metrics.start()
+    try:
+        response = author_client.get(url_for(name, with_slug, note))
+    finally:
+        metrics.stop(token)
+    assert response.status_code == HTTPStatus.OK
+    assert 0 < stats.queries <= budget
+
+
+@pytest.mark.parametrize(
+    'name', ('notes:list', 'notes:search', 'notes:api-list')
+)
+def test_lists_do_not_load_text(note, author_client, name):
+    for sql in capture(author_client, url_for(name, False, note)):
+        assert '"notes_note"."text"' not in sql
+
+
+def test_delete_does_not_load_text(note, author_client):
+    with CaptureQueriesContext(connection) as context:
+        author_client.post(reverse('notes:delete', args=(note.slug,)))
+    selects = [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith('SELECT')
+    ]
+    assert not any('"notes_note"."text"' in sql for sql in selects)
+
+
+@pytest.mark.parametrize('match', ('all', 'any'))
+def test_tag_filter_uses_indexes(dataset, author_client, match):
+    tags.set_tags(dataset, ['работа', 'важное'], 'default')
+    url = reverse('notes:list') + f'?tag=работа&tag=важное&match={match}'
+    queries = capture(author_client, url)
+    assert len(queries) <= 7
+    for sql in queries:
+        assert plan_problems(sql) == [], sql
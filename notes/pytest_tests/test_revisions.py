@@ -0,0 +1,89 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import revisions
+from notes.models import Note, NoteRevision
+
+pytestmark = pytest.mark.django_db
+
+
+def edit(note, text):
+    note.text = text
+    note.save()
+
+
+def test_delta_roundtrip():
+    old = 'первая\nвторая\nтретья\n'
+    new = 'первая\nновая\nтретья\nчетвёртая'
+    assert revisions.apply_delta(old, revisions.make_delta(old, new)) == new
+
+
+def test_revisions_rebuild_with_bounded_chain(settings, note):
+    settings.NOTES_REVISION_SNAPSHOT_EVERY = 4
+    texts = [note.text]
+    for number in range(10):
+        texts.append('\n'.join(f'строка {line}' for line in range(50))
+                     + f'\nправка {number}')
+        edit(note, texts[-1])
+    stored = NoteRevision.objects.filter(note=note).order_by('number')
+    assert [revision.is_snapshot for revision in stored] == [
+        True, True, False, False, False, True, False, False, False, True,
+        False,
+    ]
+    for number, text in enumerate(texts, start=1):
+        chain = revisions.get_chain(note.pk, 'default', number)
+        assert len(chain) <= 4
+        assert revisions.load(note, number) == (note.title, text)
+
+
+def test_unchanged_save_adds_no_revision(note):
+    note.save()
+    assert note.revisions.count() == 1
+
+
+def test_first_edit_keeps_state_before_history(author):
+    Note.objects.bulk_create([Note(
+        title='Старая', text='Было', slug='old', author=author
+    )])
+    note = Note.objects.get(slug='old')
+    edit(note, 'Стало')
+    assert revisions.load(note, 1) == ('Старая', 'Было')
+    assert revisions.load(note, 2) == ('Старая', 'Стало')
+
+
+def test_author_can_restore_revision(author_client, note):
+    edit(note, 'Новый текст')
+    url = reverse('notes:history', args=(note.slug,))
+    assert 'Ревизия 2' in author_client.get(url).content.decode()
+    url = reverse('notes:revision', args=(note.slug, 1))
+    assert 'Текст заметки' in author_client.get(url).content.decode()
+    author_client.post(url)
+    note.refresh_from_db()
+    assert note.text == 'Текст заметки'
+    assert note.revisions.count() == 3
+
+
+def test_other_user_cant_see_history(not_author_client, note):
+    for url in (
+        reverse('notes:history', args=(note.slug,)),
+        reverse('notes:revision', args=(note.slug, 1)),
+    ):
+        assert not_author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_compaction_keeps_last_revision_per_day(note):
+    for number in range(5):
+        edit(note, f'Текст {number}')
+    old = timezone.now() - timedelta(days=60)
+    note.revisions.filter(number__lte=4).update(created_at=old)
+    call_command('compact_revisions', '--days', '30', stdout=None)
+    assert list(
+        note.revisions.order_by('number').values_list('number', flat=True)
+    ) == [4, 5, 6]
+    assert revisions.load(note, 4) == (note.title, 'Текст 2')
+    assert revisions.load(note, 6) == (note.title, 'Текст 4')
@@ -1,9 +1,12 @@
+import threading
 from http import HTTPStatus
 
 import pytest
 from django.urls import reverse
 from pytest_django.asserts import assertRedirects
 
+from notes import metrics
+
 
 def test_home_availability_for_anonymous_user(client):
     url = reverse('notes:home')
@@ -23,7 +26,7 @@ def test_pages_availability_for_anonymous_user(client, name):
 
 @pytest.mark.parametrize(
     'name',
-    ('notes:list', 'notes:add', 'notes:success')
+    ('notes:list', 'notes:add', 'notes:success', 'notes:search')
 )
 def test_pages_availability_for_auth_user(not_author_client, name):
     url = reverse(name)
@@ -59,6 +62,7 @@ def test_pages_availability_for_different_users(
         ('notes:add', None),
         ('notes:success', None),
         ('notes:list', None),
+        ('notes:export', None),
     ),
 )
 def test_redirects(client, name, args):
@@ -67,3 +71,45 @@ def test_redirects(client, name, args):
     expected_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+def test_metrics_hidden_by_default(client):
+    response = client.get(reverse('notes:metrics'))
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_metrics_count_queries_per_view(settings, note, author_client):
+    settings.NOTES_METRICS_ENABLED = True
+    metrics.reset()
+    author_client.get(reverse('notes:list'))
+    response = author_client.get(reverse('notes:metrics'))
+    assert response.status_code == HTTPStatus.OK
+    lines = response.content.decode().splitlines()
+    assert (
+        'yanote_requests_total'
+        '{view="notes:list",method="GET",status="200"} 1'
+    ) in lines
+    assert (
+        'yanote_request_duration_seconds_bucket'
+        '{view="notes:list",le="+Inf"} 1'
+    ) in lines
+    queries = next(
+        line for line in lines
+        if line.startswith('yanote_db_queries_total{view="notes:list"}')
+    )
+    assert float(queries.split()[-1]) > 0
+
+
+def test_metrics_keep_counts_of_finished_threads():
+    metrics.reset()
+    labels = (('view', 'test'),)
+    worker = threading.Thread(
+        target=metrics.inc, args=('yanote_requests_total', labels)
+    )
+    worker.start()
+    worker.join()
+    assert metrics.collect()['yanote_requests_total', labels] == 1
+    assert worker not in metrics._stores
+    metrics.inc('yanote_requests_total', labels)
+    assert metrics.collect()['yanote_requests_total', labels] == 2
+    metrics.reset()
@@ -0,0 +1,159 @@
+import json
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.urls import reverse
+
+from notes import search, sharding, tags
+from notes.models import (
+    Note, NoteRevision, NoteSlug, NoteTombstone, Tag,
+)
+from notes.routers import ShardRouter
+
+SHARDS = ['default', 'shard_1']
+
+
+@pytest.fixture
+def shards(settings):
+    settings.NOTES_SHARDS = SHARDS
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_single_shard_is_default():
+    assert not sharding.is_sharded()
+    assert sharding.shard_for(1) == 'default'
+
+
+@pytest.mark.django_db
+def test_placement_overrides_hash(shards):
+    author_id = 42
+    assert sharding.shard_for(author_id) == sharding.hash_shard(author_id)
+    other, = set(SHARDS) - {sharding.hash_shard(author_id)}
+    sharding.place(author_id, other)
+    assert sharding.shard_for(author_id) == other
+
+
+@pytest.mark.django_db
+def test_slug_registry_rejects_foreign_slug(shards):
+    sharding.claim_slugs(1, ['first', 'second'])
+    sharding.claim_slugs(1, ['first'])
+    with pytest.raises(IntegrityError):
+        sharding.claim_slugs(2, ['second'])
+    sharding.release_slugs(['second'])
+    sharding.claim_slugs(2, ['second'])
+
+
+def test_registry_stays_in_default(shards):
+    router = ShardRouter()
+    assert router.allow_migrate('shard_1', 'notes', 'note')
+    assert not router.allow_migrate('shard_1', 'notes', 'noteslug')
+    assert router.allow_migrate('default', 'notes', 'noteslug') is None
+
+
+TWO_SHARDS = pytest.mark.django_db(databases=['default', 'shard_1'])
+
+
+@TWO_SHARDS
+def test_prepare_shards_keeps_existing_notes(
+        settings, author, not_author, note
+):
+    Note.objects.create(title='Вторая', text='Текст', author=not_author)
+    settings.NOTES_SHARDS = SHARDS
+    cache.clear()
+    call_command('prepare_shards', stdout=StringIO())
+    for user in (author, not_author):
+        assert sharding.shard_for(user.pk) == 'default'
+    assert set(NoteSlug.objects.values_list('slug', flat=True)) == {
+        note.slug, 'vtoraya',
+    }
+    with pytest.raises(IntegrityError):
+        sharding.claim_slugs(not_author.pk, [note.slug])
+    cache.clear()
+
+
+@pytest.fixture
+def sharded_author(shards, author):
+    """Автор, заметки которого лежат во втором шарде."""
+    sharding.place(author.pk, 'shard_1')
+    return author
+
+
+@pytest.fixture
+def sharded_note(sharded_author):
+    note = Note.objects.create(
+        title='Молоко', text='Купить молоко', author=sharded_author
+    )
+    tags.set_tags(note, ['покупки'], note._state.db)
+    return note
+
+
+@TWO_SHARDS
+def test_note_is_saved_to_author_shard(sharded_note):
+    assert sharded_note._state.db == 'shard_1'
+    assert Note.objects.using('shard_1').filter(
+        slug=sharded_note.slug
+    ).exists()
+    assert not Note.objects.using('default').exists()
+    assert NoteSlug.objects.filter(slug=sharded_note.slug).exists()
+
+
+@TWO_SHARDS
+@pytest.mark.parametrize('name, params', (
+    ('notes:list', {}),
+    ('notes:search', {'q': 'молоко'}),
+))
+def test_pages_read_author_shard(author_client, sharded_note, name, params):
+    response = author_client.get(reverse(name), params)
+    assert response.status_code == HTTPStatus.OK
+    assert sharded_note.title in response.content.decode()
+
+
+@TWO_SHARDS
+def test_batch_writes_author_shard(author_client, sharded_note):
+    response = author_client.post(
+        reverse('notes:api-batch'),
+        json.dumps([
+            {'op': 'create', 'data': {'title': 'Хлеб', 'text': 'Купить'}},
+            {'op': 'update', 'slug': sharded_note.slug,
+             'data': {'text': 'Уже купил'}},
+        ]),
+        content_type='application/json',
+    )
+    assert response.status_code == HTTPStatus.OK
+    notes = Note.objects.using('shard_1')
+    assert notes.get(slug='hleb').title == 'Хлеб'
+    assert notes.get(pk=sharded_note.pk).text == 'Уже купил'
+    assert not Note.objects.using('default').exists()
+    assert set(NoteSlug.objects.values_list('slug', flat=True)) == {
+        'hleb', sharded_note.slug,
+    }
+
+
+@TWO_SHARDS
+def test_move_author_notes(sharded_note, sharded_author):
+    sharded_note.text = 'Купить два литра'
+    sharded_note.save()
+    call_command(
+        'move_author_notes', sharded_author.username, 'default',
+        stdout=StringIO(),
+    )
+    assert sharding.shard_for(sharded_author.pk) == 'default'
+    for alias in ('shard_1', 'default'):
+        moved = alias == 'default'
+        assert Note.all_objects.using(alias).exists() is moved
+        assert NoteRevision.objects.using(alias).exists() is moved
+        assert Tag.objects.using(alias).exists() is moved
+        # Перенос - не удаление: следов для синхронизации нет.
+        assert not NoteTombstone.objects.using(alias).exists()
+    note = Note.objects.get(slug=sharded_note.slug)
+    assert note.text == 'Купить два литра'
+    assert [tag.name for tag in note.tags.all()] == ['покупки']
+    assert Tag.objects.get().note_count == 1
+    assert NoteSlug.objects.filter(slug=note.slug).exists()
+    assert search.ranked_ids(sharded_author.pk, 'литра', 10) == [note.pk]
@@ -0,0 +1,86 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from notes import sync
+from notes.models import Note
+from notes.signals import notes_bulk_saved
+
+SYNC_URL = reverse('notes:api-sync')
+
+
+def pull(client, cursor=None, limit=None):
+    params = {}
+    if cursor:
+        params['cursor'] = cursor
+    if limit:
+        params['limit'] = limit
+    response = client.get(SYNC_URL, params)
+    assert response.status_code == HTTPStatus.OK
+    return response.json()
+
+
+def test_sync_returns_only_changes_after_cursor(author_client, author, note):
+    first = pull(author_client)
+    assert [change['slug'] for change in first['changes']] == [note.slug]
+    assert first['changes'][0]['op'] == 'upsert'
+    assert not first['more']
+    other = Note.objects.create(title='Другая', text='Текст', author=author)
+    note.text = 'Изменён'
+    note.save()
+    second = pull(author_client, first['cursor'])
+    assert [change['id'] for change in second['changes']] == [
+        other.pk, note.pk
+    ]
+    assert second['changes'][1]['text'] == 'Изменён'
+    assert pull(author_client, second['cursor'])['changes'] == []
+
+
+def test_sync_reports_deletes(author_client, author, note):
+    other = Note.objects.create(title='Другая', text='Текст', author=author)
+    cursor = pull(author_client)['cursor']
+    author_client.post(reverse('notes:delete', args=(note.slug,)))
+    author_client.post(
+        reverse('notes:api-batch'),
+        json.dumps([{'op': 'delete', 'slug': other.slug}]),
+        content_type='application/json',
+    )
+    changes = pull(author_client, cursor)['changes']
+    assert {(change['op'], change['id']) for change in changes} == {
+        ('delete', note.pk), ('delete', other.pk)
+    }
+
+
+def test_sync_pages_are_bounded(author_client, author, note):
+    Note.objects.bulk_create(
+        Note(title=f'Заметка {i}', text='Текст', slug=f'bulk-{i}',
+             author=author)
+        for i in range(5)
+    )
+    created = list(Note.objects.filter(slug__startswith='bulk-'))
+    notes_bulk_saved.send(sender=Note, notes=created)
+    ids = [note.pk] + [other.pk for other in created]
+    seen, cursor, more = [], None, True
+    while more:
+        page = pull(author_client, cursor, limit=2)
+        assert len(page['changes']) <= 2
+        seen += [change['id'] for change in page['changes']]
+        cursor, more = page['cursor'], page['more']
+    assert sorted(seen) == sorted(ids)
+
+
+@pytest.mark.parametrize('cursor', (
+    'garbage', sync.encode_cursor('x', -1),
+    sync.encode_cursor('default', 10 ** 30),
+))
+def test_sync_rejects_bad_cursor(author_client, cursor):
+    response = author_client.get(SYNC_URL, {'cursor': cursor})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_sync_resets_cursor_from_other_shard(author_client, note):
+    page = pull(author_client, sync.encode_cursor('shard_1', 10 ** 6))
+    assert page['reset']
+    assert [change['id'] for change in page['changes']] == [note.pk]
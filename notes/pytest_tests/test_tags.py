@@ -0,0 +1,76 @@
+import json
+
+from django.urls import reverse
+
+from notes import tags
+from notes.models import Note, Tag
+
+LIST_URL = reverse('notes:list')
+
+
+def counts(author):
+    return dict(tags.counts(author.pk).values_list('name', 'note_count'))
+
+
+def listed(client, query):
+    response = client.get(LIST_URL + query)
+    return {note.pk for note in response.context['object_list']}
+
+
+def test_form_sets_tags_and_counts(author_client, author, form_data):
+    form_data['tag_names'] = 'Работа,  важное, работа'
+    author_client.post(reverse('notes:add'), data=form_data)
+    note = Note.objects.get()
+    assert sorted(note.tags.values_list('name', flat=True)) == [
+        'важное', 'работа'
+    ]
+    assert counts(author) == {'важное': 1, 'работа': 1}
+    form_data['tag_names'] = 'важное, дом'
+    author_client.post(reverse('notes:edit', args=(note.slug,)), form_data)
+    assert counts(author) == {'важное': 1, 'дом': 1}
+    response = author_client.get(reverse('notes:edit', args=(note.slug,)))
+    assert response.context['form'].initial['tag_names'] == 'важное, дом'
+
+
+def test_deletes_decrement_counts(author_client, author, note):
+    other = Note.objects.create(title='Другая', text='Текст', author=author)
+    tags.set_tags(note, ['общий'], 'default')
+    tags.set_tags(other, ['общий', 'свой'], 'default')
+    author_client.post(reverse('notes:delete', args=(note.slug,)))
+    assert counts(author) == {'общий': 1, 'свой': 1}
+    author_client.post(
+        reverse('notes:api-batch'),
+        json.dumps([{'op': 'delete', 'slug': other.slug}]),
+        content_type='application/json',
+    )
+    assert counts(author) == {}
+    assert Tag.objects.filter(author_id=author.pk).count() == 2
+
+
+def test_list_filters_by_all_or_any_tag(author_client, author, note):
+    other = Note.objects.create(title='Другая', text='Текст', author=author)
+    third = Note.objects.create(title='Третья', text='Текст', author=author)
+    tags.set_tags(note, ['а', 'б'], 'default')
+    tags.set_tags(other, ['а'], 'default')
+    tags.set_tags(third, ['б'], 'default')
+    assert listed(author_client, '?tag=а') == {note.pk, other.pk}
+    assert listed(author_client, '?tag=а&tag=б') == {note.pk}
+    assert listed(author_client, '?tag=а&tag=б&match=any') == {
+        note.pk, other.pk, third.pk
+    }
+    assert listed(author_client, '?tag=а&tag=нет') == set()
+
+
+def test_list_filter_ignores_tag_case(author_client, note):
+    tags.set_tags(note, ['работа'], 'default')
+    assert listed(author_client, '?tag=Работа') == {note.pk}
+    assert listed(author_client, '?tag=работа&tag=%20РАБОТА') == {note.pk}
+    response = author_client.get(LIST_URL + '?tag=Работа')
+    assert response.context['selected_tags'] == ['работа']
+
+
+def test_other_users_tags_are_not_used(not_author_client, author, note):
+    tags.set_tags(note, ['чужой'], 'default')
+    assert listed(not_author_client, '?tag=чужой') == set()
+    response = not_author_client.get(LIST_URL)
+    assert list(response.context['tags']) == []
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from notes import search, tasks
+from notes.models import Note, Task
+
+calls = []
+
+
+@tasks.task('tests.record')
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError(value)
+
+
+@tasks.task('tests.renew')
+def renew_lease():
+    # Аренда почти истекла, но задача ещё работает.
+    Task.objects.update(run_at=timezone.now())
+    calls.append(tasks.renew())
+    calls.append(tasks.claim(1))
+
+
+def run_worker():
+    # Тестовая база в памяти блокирует таблицы целиком, поэтому
+    # задачи выполняются в пуле по одной.
+    call_command('run_worker', '--once', '--concurrency', '1')
+
+
+@pytest.fixture(autouse=True)
+def eager_tasks(settings):
+    """Задачи идут через таблицу и run_worker в пуле потоков."""
+    settings.NOTES_TASKS_EAGER = False
+    settings.NOTES_TASK_MAX_ATTEMPTS = 2
+    calls.clear()
+
+
+def test_task_is_saved_on_commit_and_deduplicated(transactional_db):
+    with transaction.atomic():
+        tasks.enqueue('tests.record', value=1)
+        assert not Task.objects.exists()
+    tasks.enqueue('tests.record', key='same', value=2)
+    tasks.enqueue('tests.record', key='same', value=3)
+    assert Task.objects.count() == 2
+    run_worker()
+    assert sorted(calls) == [1, 2]
+    assert not Task.objects.exists()
+
+
+def test_failed_task_is_retried_with_backoff(transactional_db):
+    tasks.enqueue('tests.record', value=1, fail=True)
+    run_worker()
+    task = Task.objects.get()
+    assert (task.status, task.attempts) == (Task.PENDING, 1)
+    assert task.run_at > timezone.now()
+    assert 'RuntimeError' in task.error
+    Task.objects.update(run_at=timezone.now())
+    run_worker()
+    task.refresh_from_db()
+    assert (task.status, task.attempts) == (Task.FAILED, 2)
+    assert calls == [1, 1]
+
+
+def test_unknown_and_abandoned_tasks_fail(transactional_db):
+    Task.objects.create(name='tests.missing', key='missing')
+    Task.objects.create(
+        name='tests.record', key='abandoned', kwargs={'value': 1},
+        status=Task.RUNNING, attempts=2, run_at=timezone.now(),
+    )
+    run_worker()
+    assert dict(Task.objects.values_list('key', 'status')) == {
+        'missing': Task.FAILED, 'abandoned': Task.FAILED,
+    }
+    assert calls == []
+
+
+def test_long_task_renews_lease(transactional_db):
+    tasks.enqueue('tests.renew')
+    run_worker()
+    assert calls == [True, []]
+    assert not Task.objects.exists()
+
+
+def test_search_index_is_updated_by_worker(transactional_db, author):
+    note = Note.objects.create(title='Фоновая', text='Текст', author=author)
+    assert search.ranked_ids(author.pk, 'Фоновая', 10) == []
+    run_worker()
+    assert search.ranked_ids(author.pk, 'Фоновая', 10) == [note.pk]
+
+
+def test_batch_waits_for_worker(transactional_db, author, author_client):
+    response = author_client.post(reverse('notes:api-batch'), json.dumps([
+        {'op': 'create', 'data': {'title': 'Отложенная', 'text': '*Текст*'}},
+    ]), content_type='application/json')
+    slug = response.json()['results'][0]['slug']
+    url = reverse('notes:search')
+    response = author_client.get(url, {'q': 'Отложенная'})
+    assert list(response.context['object_list']) == []
+    assert Note.objects.get(slug=slug).render_version == 0
+    run_worker()
+    response = author_client.get(url, {'q': 'Отложенная'})
+    assert [note.slug for note in response.context['object_list']] == [slug]
+    assert Note.objects.get(slug=slug).text_html == '<p><em>Текст</em></p>'
@@ -0,0 +1,51 @@
+"""Фоновый рендер HTML заметок, сохранённых в обход Note.save.
+
+Массовые операции не рендерят Markdown в запросе: заметки остаются с
+устаревшей версией рендера (их HTML на чтении рендерится на лету), а
+фоновая задача сохраняет HTML позже. Та же функция обновляет старые
+строки после смены markup.VERSION, см. rerender_notes.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import markup, sharding, tasks
+from .models import Note
+
+# Сколько заметок рендерит одна задача.
+TASK_BATCH = 200
+
+
+def enqueue_render(notes):
+    by_shard = defaultdict(list)
+    for note in notes:
+        if note.render_version != markup.VERSION:
+            by_shard[sharding.shard_for(note.author_id)].append(note.pk)
+    for alias, ids in by_shard.items():
+        for start in range(0, len(ids), TASK_BATCH):
+            tasks.enqueue(
+                'notes.render', using=alias, alias=alias,
+                note_ids=ids[start:start + TASK_BATCH],
+            )
+
+
+@tasks.task('notes.render')
+def rerender(alias, note_ids):
+    """Сохраняет HTML заметок, если их не изменили после чтения.
+
+    Заметку, которую за это время сохранили снова, отличает новый
+    change_seq: её HTML уже отрендерил Note.save.
+    """
+    notes = Note.all_objects.using(alias).filter(pk__in=note_ids).only(
+        'id', 'text', 'change_seq'
+    )
+    rendered = 0
+    with transaction.atomic(using=alias):
+        for note in notes:
+            rendered += Note.all_objects.using(alias).filter(
+                pk=note.pk, change_seq=note.change_seq
+            ).update(
+                text_html=markup.render(note.text),
+                render_version=markup.VERSION,
+            )
+    return rendered
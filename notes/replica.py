@@ -0,0 +1,109 @@
+"""Чтение заметок с реплики и чтение своих записей с основной базы.
+
+Реплика - копия основной SQLite-базы, снятая backup API командой
+refresh_replica. После записи автор читает заметки с основной базы,
+пока реплика не обновится снимком, начатым позже этой записи.
+"""
+import contextvars
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from . import sharding
+
+SNAPSHOT_KEY = 'notes:replica:snapshot'
+# Дольше этого срока отметка о записи не живёт, даже если реплику
+# давно не обновляли: тогда чтение уходит на основную базу.
+PIN_TIMEOUT = 24 * 60 * 60
+
+_pinned = contextvars.ContextVar('notes_replica_pinned', default=False)
+
+
+def get_alias():
+    """Псевдоним реплики из NOTES_READ_REPLICA или None."""
+    return getattr(settings, 'NOTES_READ_REPLICA', None)
+
+
+def pin_key(user_id):
+    return f'notes:replica:pin:{user_id}'
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def pin(user_id):
+    """Отмечает запись пользователя: его чтения идут на основную базу."""
+    if not get_alias():
+        return
+    _pinned.set(True)
+
+    def mark():
+        cache.set(pin_key(user_id), time.time(), PIN_TIMEOUT)
+    mark()
+    # Снимок, начатый до фиксации, записи ещё не содержит: отметка
+    # обновляется после фиксации и оказывается позже такого снимка.
+    transaction.on_commit(mark, using=sharding.shard_for(user_id))
+
+
+def is_pinned_user(user_id):
+    """Писал ли пользователь после последнего снимка реплики."""
+    if user_id is None:
+        return False
+    state = cache.get_many((pin_key(user_id), SNAPSHOT_KEY))
+    wrote_at = state.get(pin_key(user_id))
+    snapshot_at = state.get(SNAPSHOT_KEY)
+    return wrote_at is not None and (
+        snapshot_at is None or wrote_at >= snapshot_at
+    )
+
+
+def activate(user_id):
+    """Решает для запроса, можно ли читать с реплики; возвращает токен."""
+    return enter(is_pinned_user(user_id))
+
+
+def enter(pinned):
+    """Закрепляет запрос за основной базой или нет; возвращает токен."""
+    return _pinned.set(pinned)
+
+
+def deactivate(token):
+    _pinned.reset(token)
+
+
+def backup(source, target, pages=1024):
+    """Снимает копию базы source в target без остановки чтения.
+
+    Копия пишется во временный файл и атомарно подменяет target:
+    открытые соединения дочитывают старый снимок, новые видят новый.
+    Копия переводится в журнал DELETE, чтобы у реплики не оставалось
+    файлов -wal от прошлого снимка.
+    """
+    temporary = f'{target}.tmp-{os.getpid()}'
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(temporary)
+    try:
+        source_connection.backup(target_connection, pages=pages)
+        target_connection.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target_connection.close()
+        source_connection.close()
+    os.replace(temporary, target)
+
+
+def refresh(alias=None, pages=1024):
+    """Обновляет реплику и запоминает время начала снимка."""
+    alias = alias or get_alias()
+    started = time.time()
+    backup(
+        str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME']),
+        str(connections[alias].settings_dict['NAME']),
+        pages,
+    )
+    cache.set(SNAPSHOT_KEY, started, None)
+    return started
@@ -0,0 +1,217 @@
+"""История заметки: полные снимки и разницы между ними.
+
+Каждое сохранение с новым заголовком или текстом добавляет ревизию.
+Ревизия - либо полный снимок текста, либо разница с предыдущей
+ревизией по строкам. Снимок делается не реже чем раз в
+NOTES_REVISION_SNAPSHOT_EVERY ревизий и тогда, когда разница вышла
+бы больше половины текста, поэтому любая ревизия собирается не больше
+чем из SNAPSHOT_EVERY - 1 разниц одним запросом.
+"""
+import json
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import NoteRevision
+
+
+def snapshot_every():
+    return max(1, getattr(settings, 'NOTES_REVISION_SNAPSHOT_EVERY', 10))
+
+
+def make_delta(old, new):
+    """Разница по строкам в JSON.
+
+    Число > 0 - взять столько строк старого текста, число < 0 -
+    пропустить их, строка - вставить её.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(old, delta):
+    lines = old.splitlines(keepends=True)
+    position = 0
+    result = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            result.append(op)
+        elif op > 0:
+            result.extend(lines[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(result)
+
+
+def encode(previous_text, text, since_snapshot):
+    """(снимок ли, data) для ревизии после since_snapshot разниц."""
+    if previous_text is None or since_snapshot + 1 >= snapshot_every():
+        return True, text
+    delta = make_delta(previous_text, text)
+    if len(delta) * 2 > len(text):
+        return True, text
+    return False, delta
+
+
+def get_chain(note_id, using, number=None):
+    """Ревизии от number (или последней) назад до снимка включительно."""
+    queryset = NoteRevision.objects.using(using).filter(note_id=note_id)
+    if number is not None:
+        queryset = queryset.filter(number__lte=number)
+    chain = []
+    for revision in queryset.order_by('-number')[:snapshot_every()]:
+        chain.append(revision)
+        if revision.is_snapshot:
+            return chain
+    if chain:
+        # Снимок дальше обычного: SNAPSHOT_EVERY уменьшили после записи.
+        return get_chain_unbounded(queryset, chain[-1].number, chain)
+    return chain
+
+
+def get_chain_unbounded(queryset, before, chain):
+    for revision in queryset.filter(number__lt=before).order_by('-number'):
+        chain.append(revision)
+        if revision.is_snapshot:
+            break
+    return chain
+
+
+def build(chain):
+    """Текст первой ревизии цепочки из снимка в её конце."""
+    text = chain[-1].data
+    for revision in reversed(chain[:-1]):
+        text = apply_delta(text, revision.data)
+    return text
+
+
+def get_using(note):
+    return note._state.db or router.db_for_write(type(note), instance=note)
+
+
+def load(note, number):
+    """(заголовок, текст) ревизии number или None, если её нет."""
+    chain = get_chain(note.pk, get_using(note), number)
+    if not chain or chain[0].number != number:
+        return None
+    return chain[0].title, build(chain)
+
+
+def snapshot(note, number=1):
+    return NoteRevision(
+        note_id=note.pk, number=number, is_snapshot=True,
+        title=note.title, data=note.text,
+    )
+
+
+def record(note, using=None):
+    """Добавляет ревизию, если заголовок или текст изменились."""
+    using = using or get_using(note)
+    chain = get_chain(note.pk, using)
+    if not chain:
+        snapshot(note).save(using=using)
+        return
+    previous_text = build(chain)
+    if chain[0].title == note.title and previous_text == note.text:
+        return
+    is_snapshot, data = encode(previous_text, note.text, len(chain) - 1)
+    NoteRevision.objects.using(using).create(
+        note_id=note.pk, number=chain[0].number + 1,
+        is_snapshot=is_snapshot, title=note.title, data=data,
+    )
+
+
+def record_many(notes):
+    """Ревизии после массовых операций; новым заметкам - снимки пачкой."""
+    by_shard = defaultdict(list)
+    for note in notes:
+        by_shard[get_using(note)].append(note)
+    for using, shard_notes in by_shard.items():
+        existing = set(
+            NoteRevision.objects.using(using).filter(
+                note_id__in=[note.pk for note in shard_notes]
+            ).values_list('note_id', flat=True).distinct()
+        )
+        NoteRevision.objects.using(using).bulk_create(
+            snapshot(note) for note in shard_notes
+            if note.pk not in existing
+        )
+        for note in shard_notes:
+            if note.pk in existing:
+                record(note, using)
+
+
+def ensure_base(note, using):
+    """Перед первой правкой старой заметки снимает её прежнее состояние."""
+    revisions = NoteRevision.objects.using(using).filter(note_id=note.pk)
+    if revisions.exists():
+        return
+    stored = type(note).objects.using(using).filter(pk=note.pk).only(
+        'title', 'text'
+    ).first()
+    if stored is not None:
+        snapshot(stored).save(using=using)
+
+
+def compact(note_id, using, cutoff):
+    """Оставляет из ревизий старше cutoff последнюю за каждый день.
+
+    Разницы выброшенных ревизий сливаются в разницу следующей
+    оставленной; цепочки пересчитываются. Возвращает число удалённых.
+    """
+    revisions = list(
+        NoteRevision.objects.using(using).filter(
+            note_id=note_id
+        ).order_by('number')
+    )
+    texts = []
+    for revision in revisions:
+        texts.append(
+            revision.data if revision.is_snapshot
+            else apply_delta(texts[-1], revision.data)
+        )
+    kept, dropped = [], []
+    for index, revision in enumerate(revisions):
+        following = (
+            revisions[index + 1] if index + 1 < len(revisions) else None
+        )
+        if (
+            following is not None
+            and revision.created_at < cutoff
+            and timezone.localdate(following.created_at)
+            == timezone.localdate(revision.created_at)
+        ):
+            dropped.append(revision.pk)
+        else:
+            kept.append((revision, texts[index]))
+    if not dropped:
+        return 0
+    previous_text, since_snapshot = None, 0
+    for revision, text in kept:
+        revision.is_snapshot, revision.data = encode(
+            previous_text, text, since_snapshot
+        )
+        since_snapshot = 0 if revision.is_snapshot else since_snapshot + 1
+        previous_text = text
+    with transaction.atomic(using=using):
+        NoteRevision.objects.using(using).filter(pk__in=dropped).delete()
+        NoteRevision.objects.using(using).bulk_update(
+            [revision for revision, _ in kept], ('is_snapshot', 'data'),
+            batch_size=100,
+        )
+    return len(dropped)
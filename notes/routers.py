@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import replica, sharding
+
+SHARDED_MODELS = (
+    'note', 'noterevision', 'notetombstone', 'tag', 'notetag',
+)
+DEFAULT_ONLY_MODELS = ('noteslug', 'authorshard', 'purgejob', 'task')
+
+
+class ShardRouter:
+    """Направляет заметку в шард её автора по подсказке instance.
+
+    Запросы без подсказки маршрутизируются явно через
+    Note.objects.for_author(); реестр slug и размещение авторов живут
+    только в основной базе.
+    """
+
+    def author_id(self, model, hints):
+        instance = hints.get('instance')
+        if instance is None or model._meta.model_name not in SHARDED_MODELS:
+            return None
+        if instance._meta.label == settings.AUTH_USER_MODEL:
+            return instance.pk
+        # Через __dict__: отложенное поле (only()) подгружалось бы
+        # запросом, который снова спросил бы роутер.
+        return instance.__dict__.get('author_id')
+
+    def db_for_read(self, model, **hints):
+        if not sharding.is_sharded():
+            return None
+        author_id = self.author_id(model, hints)
+        return None if author_id is None else sharding.shard_for(author_id)
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding.is_sharded():
+            return None
+        databases = {obj1._state.db, obj2._state.db}
+        if databases <= {DEFAULT_DB_ALIAS, *sharding.get_shards()}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in sharding.get_shards():
+            return None
+        return app_label == 'notes' and model_name not in DEFAULT_ONLY_MODELS
+
+
+class ReadReplicaRouter:
+    """Отправляет чтение заметок на реплику, если она включена.
+
+    Запись и остальные приложения (сессии, пользователи) всегда идут
+    на основную базу; реплика не мигрирует - её схема приходит вместе
+    со снимком. Чтение внутри открытой транзакции на основной базе
+    (подбор slug в Note.save, пакеты API, импорт) остаётся на ней.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica.get_alias()
+        if not alias or model._meta.app_label != 'notes':
+            return None
+        if replica.is_pinned() or connections[
+                DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        alias = replica.get_alias()
+        databases = {obj1._state.db, obj2._state.db}
+        if alias and databases <= {DEFAULT_DB_ALIAS, alias}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica.get_alias():
+            return False
+        return None
@@ -0,0 +1,142 @@
+import re
+from collections import defaultdict
+
+from django.db import connections
+
+from . import sharding, tasks
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+# Совпадение в заголовке весит больше, чем совпадение в тексте.
+TITLE_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+# Сколько заметок индексирует одна фоновая задача.
+TASK_BATCH = 500
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_supported(using=None):
+    """Полнотекстовый индекс есть только в SQLite (FTS5)."""
+    return connections[using or sharding.get_shards()[0]].vendor == 'sqlite'
+
+
+def build_match(query):
+    """Превращает ввод пользователя в безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 из запроса
+    не интерпретируются; последнее слово ищется по префиксу.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_notes(notes, using=None):
+    """Добавляет или обновляет заметки в индексе их шарда."""
+    by_shard = defaultdict(list)
+    for note in notes:
+        by_shard[using or sharding.shard_for(note.author_id)].append(note)
+    for alias, shard_notes in by_shard.items():
+        if not is_supported(alias):
+            continue
+        with connections[alias].cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                '(rowid, title, text, author_id) VALUES (%s, %s, %s, %s)',
+                [(note.pk, note.title, note.text, note.author_id)
+                 for note in shard_notes],
+            )
+
+
+def enqueue_index(notes):
+    """Индексирует заметки фоновой задачей после фиксации транзакции."""
+    by_shard = defaultdict(list)
+    for note in notes:
+        by_shard[sharding.shard_for(note.author_id)].append(note.pk)
+    for alias, ids in by_shard.items():
+        # Повторные сохранения одной заметки сливаются в одну задачу.
+        key = f'index:{alias}:{ids[0]}' if len(ids) == 1 else ''
+        for start in range(0, len(ids), TASK_BATCH):
+            tasks.enqueue(
+                'notes.index', key=key, using=alias, alias=alias,
+                note_ids=ids[start:start + TASK_BATCH],
+            )
+
+
+@tasks.task('notes.index')
+def index_task(alias, note_ids):
+    """Берёт заметки из базы: удалённые к этому времени пропускаются."""
+    index_notes(
+        Note.objects.using(alias).filter(pk__in=note_ids).only(
+            'id', 'title', 'text', 'author_id'
+        ),
+        using=alias,
+    )
+
+
+def unindex_notes(note_ids, using):
+    """Удаляет заметки из индекса шарда using."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(note_id,) for note_id in note_ids],
+        )
+
+
+def ranked_ids(author_id, query, limit):
+    """Возвращает id заметок автора, отсортированные по релевантности."""
+    match = build_match(query)
+    if not match:
+        return []
+    with connections[sharding.shard_for(author_id)].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND author_id = %s '
+            f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s',
+            (match, author_id, TITLE_WEIGHT, TEXT_WEIGHT, limit),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(queryset, author_id, query, limit=50):
+    """Ищет заметки внутри queryset и отдаёт их в порядке релевантности."""
+    if not is_supported(queryset.db):
+        return list(queryset.filter(title__icontains=query)[:limit])
+    ids = ranked_ids(author_id, query, limit)
+    notes = queryset.in_bulk(ids)
+    return [notes[note_id] for note_id in ids if note_id in notes]
+
+
+def rebuild(batch_size=1000, stdout=None):
+    """Перестраивает индекс каждого шарда, читая заметки пачками по id."""
+    total = 0
+    for alias in sharding.get_shards():
+        if not is_supported(alias):
+            continue
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        queryset = Note.objects.using(alias).only(
+            'id', 'title', 'text', 'author_id'
+        ).order_by('id')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            index_notes(batch, using=alias)
+            last_pk = batch[-1].pk
+            total += len(batch)
+            if stdout is not None:
+                stdout.write(f'Проиндексировано заметок: {total}')
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+    return total
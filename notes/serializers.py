@@ -0,0 +1,30 @@
+import json
+
+FIELDS = ('title', 'text', 'slug', 'author')
+API_FIELDS = ('id', 'title', 'text', 'slug', 'updated_at')
+
+
+def note_to_dict(note, fields=API_FIELDS):
+    """Заметка для JSON API."""
+    data = {field: getattr(note, field) for field in fields}
+    if 'updated_at' in data:
+        data['updated_at'] = data['updated_at'].isoformat()
+    return data
+
+
+def dump_line(title, text, slug, author):
+    """Одна заметка в формате NDJSON (строка с переводом строки)."""
+    return json.dumps(
+        dict(zip(FIELDS, (title, text, slug, author))), ensure_ascii=False
+    ) + '\n'
+
+
+def load_line(line):
+    """Разбирает строку NDJSON, проверяя обязательные поля."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError('ожидался JSON-объект')
+    for field in ('text', 'author'):
+        if not isinstance(record.get(field), str):
+            raise ValueError(f'нет поля {field}')
+    return record
@@ -0,0 +1,30 @@
+"""Движок сессий: cached_db с LRU в памяти процесса перед кешем.
+
+Включается через SESSION_ENGINE = 'notes.sessions'.
+"""
+from django.contrib.sessions.backends import cached_db
+
+from .auth_cache import local
+
+
+class SessionStore(cached_db.SessionStore):
+
+    def load(self):
+        key = self.cache_key
+        data = local.get(key)
+        if data is None:
+            data = super().load()
+            # Неизвестная или истёкшая сессия сбрасывает session_key.
+            if self.session_key is not None:
+                local.set(key, data)
+        return data
+
+    def save(self, must_create=False):
+        super().save(must_create)
+        local.delete(self.cache_key)
+
+    def delete(self, session_key=None):
+        session_key = session_key or self.session_key
+        super().delete(session_key)
+        if session_key is not None:
+            local.delete(self.cache_key_prefix + session_key)
@@ -0,0 +1,115 @@
+"""Раскладка заметок по нескольким базам по автору.
+
+Все заметки автора живут в одной базе-шарде из NOTES_SHARDS. Шард
+выбирается стабильным хешем author_id; перенесённые командой
+move_author_notes авторы записаны в таблице AuthorShard основной базы.
+Глобальную уникальность slug при нескольких шардах держит реестр
+NoteSlug в основной базе: slug сначала занимается там, затем заметка
+сохраняется в шарде. При одном шарде (по умолчанию) реестр не ведётся
+и всё работает как без шардирования.
+"""
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def get_shards():
+    return list(getattr(settings, 'NOTES_SHARDS', (DEFAULT_DB_ALIAS,)))
+
+
+def is_sharded():
+    return len(get_shards()) > 1
+
+
+def hash_shard(author_id):
+    shards = get_shards()
+    return shards[zlib.crc32(str(author_id).encode()) % len(shards)]
+
+
+def placement_key(author_id):
+    return f'notes:shard:{author_id}'
+
+
+def shard_for(author_id):
+    """Псевдоним базы, в которой лежат заметки автора."""
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+    alias = cache.get(placement_key(author_id))
+    if alias is None:
+        from .models import AuthorShard
+
+        alias = AuthorShard.objects.using(DEFAULT_DB_ALIAS).filter(
+            author_id=author_id
+        ).values_list('alias', flat=True).first() or hash_shard(author_id)
+        cache.set(placement_key(author_id), alias, CACHE_TIMEOUT)
+    return alias
+
+
+def place(author_id, alias):
+    """Закрепляет автора за шардом (после переноса его заметок)."""
+    from .models import AuthorShard
+
+    AuthorShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        author_id=author_id, defaults={'alias': alias}
+    )
+    key = placement_key(author_id)
+    cache.delete(key)
+    # До фиксации другие запросы могли снова закешировать старый шард.
+    transaction.on_commit(lambda: cache.delete(key), using=DEFAULT_DB_ALIAS)
+
+
+def slug_queryset():
+    """Откуда брать занятые slug: реестр или сама таблица заметок."""
+    from .models import Note, NoteSlug
+
+    if is_sharded():
+        return NoteSlug.objects.using(DEFAULT_DB_ALIAS)
+    # Помеченные удалёнными заметки держат slug до очистки.
+    return Note.all_objects.all()
+
+
+def claim_slugs(author_id, slugs):
+    """Занимает slug в реестре; IntegrityError, если slug чужой.
+
+    Уже занятые этим автором slug остаются за ним.
+    """
+    if not is_sharded():
+        return
+    from .models import NoteSlug
+
+    slugs = set(slugs)
+    registry = NoteSlug.objects.using(DEFAULT_DB_ALIAS)
+    registry.bulk_create(
+        (NoteSlug(slug=slug, author_id=author_id) for slug in slugs),
+        ignore_conflicts=True,
+    )
+    owned = registry.filter(slug__in=slugs, author_id=author_id).count()
+    if owned != len(slugs):
+        raise IntegrityError('slug занят другим автором')
+
+
+def claim_slug(author_id, slug):
+    """Занимает один slug; свой уже занятый slug не считается ошибкой."""
+    if not is_sharded():
+        return False
+    from .models import NoteSlug
+
+    claim, created = NoteSlug.objects.using(
+        DEFAULT_DB_ALIAS
+    ).get_or_create(slug=slug, defaults={'author_id': author_id})
+    if claim.author_id != author_id:
+        raise IntegrityError(f'slug {slug} занят другим автором')
+    return created
+
+
+def release_slugs(slugs):
+    if not is_sharded():
+        return
+    from .models import NoteSlug
+
+    NoteSlug.objects.using(DEFAULT_DB_ALIAS).filter(slug__in=slugs).delete()
@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import Signal, receiver
+
+from . import (auth_cache, cache, metrics, purge, rendering, replica,
+               revisions, search, sharding, sync, tags)
+from .models import Note, PurgeJob
+
+# Отправляется после массовых операций, которые обходят Note.save:
+# notes - сохранённые заметки с заполненными pk.
+notes_bulk_saved = Signal()
+
+# Сколько заметок получает номера изменений одним UPDATE.
+STAMP_BATCH = 500
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, using, **kwargs):
+    """Поисковый индекс обновляет фоновая задача, не запрос."""
+    search.enqueue_index((instance,))
+
+
+@receiver(pre_delete, sender=Note)
+def note_untagged(sender, instance, using, **kwargs):
+    """Связи удалит каскад, но счётчики тегов ведутся здесь."""
+    tags.detach((instance.pk,), using)
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, using, **kwargs):
+    search.unindex_notes((instance.pk,), using)
+    sharding.release_slugs((instance.slug,))
+    sync.tombstone(instance, using)
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def notes_bulk_stamped(sender, notes, **kwargs):
+    """Массовые сохранения обходят Note.save и номер изменения."""
+    by_shard = defaultdict(list)
+    for note in notes:
+        by_shard[sharding.shard_for(note.author_id)].append(note.pk)
+    for alias, ids in by_shard.items():
+        for start in range(0, len(ids), STAMP_BATCH):
+            sync.stamp(Note.all_objects.using(alias).filter(
+                pk__in=ids[start:start + STAMP_BATCH]
+            ))
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def notes_bulk_indexed(sender, notes, **kwargs):
+    search.enqueue_index(notes)
+
+
+@receiver(pre_save, sender=Note)
+def note_before_save(sender, instance, using, update_fields, **kwargs):
+    if not instance._state.adding and tracks_history(update_fields):
+        revisions.ensure_base(instance, using)
+
+
+@receiver(post_save, sender=Note)
+def note_revision(sender, instance, using, update_fields, **kwargs):
+    if tracks_history(update_fields):
+        revisions.record(instance, using)
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def notes_bulk_rendered(sender, notes, **kwargs):
+    rendering.enqueue_render(notes)
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def notes_bulk_revisions(sender, notes, **kwargs):
+    revisions.record_many(notes)
+
+
+def tracks_history(update_fields):
+    return update_fields is None or bool({'title', 'text'} & update_fields)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def author_deleted(sender, instance, using, **kwargs):
+    """Заметки только помечаются, строки удалит purge_notes."""
+    purge.soft_delete(
+        Note.objects.for_author(instance), instance.pk, PurgeJob.USER
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """Смена пароля, блокировка и прочее сохраняются через save."""
+    auth_cache.forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def user_logged_out_forget(sender, user, **kwargs):
+    if user is not None:
+        auth_cache.forget_user(user.pk)
+
+
+def invalidate_cache(author_ids):
+    """Сбрасывает кеш страниц авторов после фиксации транзакции."""
+    if not cache.is_enabled():
+        return
+    for author_id in author_ids:
+        transaction.on_commit(
+            lambda author_id=author_id: cache.bump_version(author_id),
+            using=sharding.shard_for(author_id),
+        )
+
+
+def authors_changed(author_ids):
+    author_ids = set(author_ids)
+    invalidate_cache(author_ids)
+    for author_id in author_ids:
+        replica.pin(author_id)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def note_changed(sender, instance, **kwargs):
+    authors_changed((instance.author_id,))
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def notes_bulk_changed(sender, notes, **kwargs):
+    authors_changed(note.author_id for note in notes)
+
+
+@receiver(connection_created)
+def connection_instrumented(sender, connection, **kwargs):
+    """Считает SQL-запросы в метрики во всех потоках и базах."""
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
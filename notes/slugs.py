@@ -0,0 +1,84 @@
+import re
+from functools import lru_cache
+
+from django.db.models import Q
+from pytils.translit import slugify
+
+MAX_LENGTH = 100
+# Сколько символов основы оставить под суффикс вида -1234567.
+SUFFIX_ROOM = 8
+FALLBACK = 'note'
+# Сколько основ проверять одним запросом (ограничение на число параметров).
+QUERY_CHUNK = 400
+# Сколько раз повторить вставку, если slug успел занять параллельный запрос.
+ATTEMPTS = 3
+
+
+@lru_cache(maxsize=4096)
+def slug_from_title(title):
+    """Транслитерирует заголовок; повторяющиеся заголовки берутся из кеша."""
+    return slugify(title)[:MAX_LENGTH] or FALLBACK
+
+
+def stem(base):
+    return base[:MAX_LENGTH - SUFFIX_ROOM]
+
+
+def with_suffix(base, number):
+    return f'{stem(base)}-{number}'
+
+
+def taken_slugs(bases, queryset):
+    """Занятые slug, совпадающие с основами или их вариантами с суффиксом.
+
+    Вместо LIKE используется диапазон [основа-, основа.), чтобы запрос
+    шёл по уникальному индексу slug.
+    """
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), QUERY_CHUNK):
+        condition = Q()
+        for base in bases[start:start + QUERY_CHUNK]:
+            condition |= Q(slug=base) | Q(
+                slug__gte=stem(base) + '-', slug__lt=stem(base) + '.'
+            )
+        taken.update(queryset.filter(condition).values_list('slug', flat=True))
+    return taken
+
+
+def allocate_slugs(bases, exclude_pk=None, reserved=(), released=()):
+    """Выдаёт уникальные slug: основа, затем основа-2, основа-3, ...
+
+    На всю пачку уходит один запрос; совпадения внутри пачки
+    разводятся в памяти. reserved - slug, которые уже обещаны другим
+    записям этой же пачки, released - занятые в базе slug, которые
+    пачка освобождает (прежние slug изменяемых записей).
+    """
+    from . import sharding
+
+    queryset = sharding.slug_queryset()
+    if exclude_pk is not None and not sharding.is_sharded():
+        queryset = queryset.exclude(pk=exclude_pk)
+    taken = taken_slugs(bases, queryset) - set(released)
+    taken.update(reserved)
+    numbers = {}
+    for slug in taken:
+        match = re.fullmatch(r'(.*)-(\d+)', slug)
+        if match:
+            number = int(match.group(2))
+            if number > numbers.get(match.group(1), 1):
+                numbers[match.group(1)] = number
+    result = []
+    for base in bases:
+        slug = base
+        if slug in taken:
+            number = numbers.get(stem(base), 1) + 1
+            numbers[stem(base)] = number
+            slug = with_suffix(base, number)
+        taken.add(slug)
+        result.append(slug)
+    return result
+
+
+def allocate_slug(base, exclude_pk=None):
+    return allocate_slugs((base,), exclude_pk)[0]
@@ -0,0 +1,112 @@
+"""Номера изменений заметок для инкрементальной синхронизации.
+
+Каждое сохранение заметки берёт следующий номер из счётчика
+ChangeSequence своего шарда, удаление оставляет NoteTombstone со своим
+номером. Номер берётся UPDATE-ом счётчика внутри транзакции записи,
+поэтому счётчик заблокирован до фиксации и номера видны клиентам в
+порядке фиксации. Клиент передаёт курсор - шард и последний
+полученный номер - и получает только изменения после него по индексу
+(author, change_seq).
+"""
+import heapq
+
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def reserve(alias, count=1):
+    """Занимает count номеров подряд и возвращает первый из них."""
+    from .models import ChangeSequence
+
+    counter = ChangeSequence.objects.using(alias).filter(pk=1)
+    with transaction.atomic(using=alias):
+        if not counter.update(value=F('value') + count):
+            ChangeSequence.objects.using(alias).create(pk=1, value=count)
+        return counter.values_list('value', flat=True).get() - count + 1
+
+
+def stamp(queryset, **fields):
+    """Даёт строкам queryset новые номера одним UPDATE.
+
+    Номер строки - начало занятого диапазона плюс её смещение по id,
+    так что номера различны без выборки каждой строки. queryset должен
+    быть привязан к базе записи через using().
+    """
+    with transaction.atomic(using=queryset.db):
+        bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+        low, high = bounds['low'], bounds['high']
+        if low is None:
+            return 0
+        start = reserve(queryset.db, high - low + 1)
+        # Строки, появившиеся после подсчёта границ, номер не получат.
+        return queryset.filter(pk__range=(low, high)).update(
+            change_seq=F('id') + (start - low), **fields
+        )
+
+
+def tombstone(note, using):
+    from .models import NoteTombstone
+
+    NoteTombstone.objects.using(using).create(
+        note_id=note.pk, author_id=note.author_id, slug=note.slug,
+        change_seq=reserve(using),
+    )
+
+
+# Больший номер не помещается в INTEGER SQLite.
+MAX_SEQ = 2 ** 63 - 1
+
+
+def encode_cursor(alias, seq):
+    return urlsafe_base64_encode(force_bytes(f'{alias}:{seq}'))
+
+
+def decode_cursor(cursor):
+    """Пара (шард, номер) или ValueError для испорченного курсора."""
+    try:
+        alias, seq = force_str(urlsafe_base64_decode(cursor)).split(':')
+        seq = int(seq)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректный курсор синхронизации.')
+    if not 0 <= seq <= MAX_SEQ:
+        raise ValueError('Некорректный курсор синхронизации.')
+    return alias, seq
+
+
+def changes(author_id, alias, after, limit):
+    """Изменения автора после номера after, не больше limit.
+
+    Возвращает (список изменений, есть ли ещё). Помеченная удалённой,
+    но ещё не очищенная заметка отдаётся как удаление.
+    """
+    from .models import Note, NoteTombstone
+
+    notes = Note.all_objects.using(alias).filter(
+        author_id=author_id, change_seq__gt=after
+    ).order_by('change_seq')[:limit + 1]
+    tombstones = NoteTombstone.objects.using(alias).filter(
+        author_id=author_id, change_seq__gt=after
+    ).order_by('change_seq')[:limit + 1]
+    merged = list(heapq.merge(
+        (change(note) for note in notes),
+        (deletion(item.note_id, item.slug, item.change_seq)
+         for item in tombstones),
+        key=lambda item: item['seq'],
+    ))
+    return merged[:limit], len(merged) > limit
+
+
+def change(note):
+    if note.deleted_at is not None:
+        return deletion(note.pk, note.slug, note.change_seq)
+    return {
+        'op': 'upsert', 'seq': note.change_seq, 'id': note.pk,
+        'title': note.title, 'text': note.text, 'slug': note.slug,
+        'updated_at': note.updated_at.isoformat(),
+    }
+
+
+def deletion(note_id, slug, seq):
+    return {'op': 'delete', 'seq': seq, 'id': note_id, 'slug': slug}
@@ -0,0 +1,122 @@
+"""Теги заметок и счётчики заметок по тегам.
+
+Tag.note_count - число живых заметок автора с этим тегом. Счётчики
+меняются вместе со связями NoteTag в той же транзакции, поэтому
+боковой панели не нужен GROUP BY по связям на каждый просмотр.
+Заметки фильтруются по тегам через уникальный индекс (tag, note).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Prefetch
+
+from . import sharding
+from .models import NoteTag, Tag
+
+MAX_LENGTH = 50
+MAX_TAGS = 20
+
+
+def parse(value):
+    """Имена тегов из строки через запятую, без повторов."""
+    return parse_list(value.split(','))
+
+
+def parse_list(values):
+    """Имена тегов в хранимом виде: без лишних пробелов, строчными."""
+    names = []
+    for value in values:
+        name = ' '.join(value.split()).lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def tags_for(author_id):
+    return Tag.objects.using(sharding.shard_for(author_id)).filter(
+        author_id=author_id
+    )
+
+
+def counts(author_id):
+    """Теги автора с заметками для боковой панели, по имени."""
+    return tags_for(author_id).filter(note_count__gt=0).only(
+        'name', 'note_count'
+    ).order_by('name')
+
+
+def prefetch():
+    """Теги заметок страницы одним запросом."""
+    return Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+
+
+def set_tags(note, names, using):
+    """Приводит теги заметки к names и обновляет счётчики."""
+    links = NoteTag.objects.using(using).filter(note=note)
+    current = dict(links.values_list('tag__name', 'tag_id'))
+    removed = [tag_id for name, tag_id in current.items()
+               if name not in names]
+    added = [name for name in names if name not in current]
+    with transaction.atomic(using=using):
+        if removed:
+            links.filter(tag_id__in=removed).delete()
+            adjust(using, removed, -1)
+        if added:
+            created = ensure(note.author_id, added, using)
+            NoteTag.objects.using(using).bulk_create(
+                NoteTag(note=note, tag=tag) for tag in created
+            )
+            adjust(using, [tag.pk for tag in created], 1)
+
+
+def ensure(author_id, names, using):
+    tags = Tag.objects.using(using)
+    tags.bulk_create(
+        (Tag(author_id=author_id, name=name) for name in names),
+        ignore_conflicts=True,
+    )
+    return list(tags.filter(author_id=author_id, name__in=names))
+
+
+def adjust(using, tag_ids, delta):
+    Tag.objects.using(using).filter(pk__in=tag_ids).update(
+        note_count=F('note_count') + delta
+    )
+
+
+def detach(note_ids, using):
+    """Снимает теги с удаляемых заметок, уменьшая счётчики."""
+    links = NoteTag.objects.using(using).filter(note_id__in=note_ids)
+    per_tag = Counter(links.values_list('tag_id', flat=True))
+    if not per_tag:
+        return
+    links.delete()
+    adjust_counts(using, per_tag, -1)
+
+
+def adjust_counts(using, per_tag, sign):
+    """Меняет счётчики на per_tag[id] одним UPDATE на каждую величину."""
+    by_delta = defaultdict(list)
+    for tag_id, count in per_tag.items():
+        by_delta[count].append(tag_id)
+    for count, tag_ids in by_delta.items():
+        adjust(using, tag_ids, sign * count)
+
+
+def filter_notes(queryset, author_id, names, match_any=False):
+    """Заметки со всеми тегами names или, с match_any, с любым из них."""
+    tag_ids = list(
+        tags_for(author_id).filter(name__in=names).values_list(
+            'id', flat=True
+        )
+    )
+    if match_any:
+        return queryset.filter(pk__in=NoteTag.objects.filter(
+            tag_id__in=tag_ids
+        ).values('note_id'))
+    if len(tag_ids) < len(set(names)):
+        return queryset.none()
+    for tag_id in tag_ids:
+        # Отдельный filter на каждый тег - отдельное соединение.
+        queryset = queryset.filter(notetag__tag_id=tag_id)
+    return queryset
@@ -0,0 +1,165 @@
+"""Фоновые задачи без внешнего брокера.
+
+Задачи хранятся в таблице Task основной базы и переживают перезапуск.
+enqueue записывает задачу только после фиксации транзакции, поэтому
+задача не увидит незафиксированных заметок. manage.py run_worker
+забирает задачи пачками и выполняет их в пуле потоков или процессов.
+Упавшая задача повторяется с экспоненциальной паузой, пока не кончатся
+NOTES_TASK_MAX_ATTEMPTS попыток; брошенная воркером задача тоже
+тратит попытку. Долгие задачи продлевают аренду вызовом renew().
+Ждущая задача с тем же ключом ставится
+в очередь один раз. С NOTES_TASKS_EAGER задачи выполняются сразу, это
+нужно тестам и разработке без воркера.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (DEFAULT_DB_ALIAS, IntegrityError, close_old_connections,
+                       transaction)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+# Задача, которую выполняет текущий поток воркера.
+_current = threading.local()
+
+
+def task(name):
+    """Регистрирует функцию как задачу с именем name."""
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def is_eager():
+    return getattr(settings, 'NOTES_TASKS_EAGER', False)
+
+
+def max_attempts():
+    return max(1, getattr(settings, 'NOTES_TASK_MAX_ATTEMPTS', 5))
+
+
+def backoff(attempts):
+    base = getattr(settings, 'NOTES_TASK_BACKOFF_SECONDS', 5)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def timeout():
+    return timedelta(seconds=getattr(settings, 'NOTES_TASK_TIMEOUT', 300))
+
+
+def tasks():
+    return Task.objects.using(DEFAULT_DB_ALIAS)
+
+
+def enqueue(name, *, key='', delay=0, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Ставит задачу после фиксации транзакции базы using."""
+    if name not in registry:
+        raise ValueError(f'Нет задачи {name}.')
+    if is_eager():
+        registry[name](**kwargs)
+        return
+    transaction.on_commit(
+        lambda: save(name, key, delay, kwargs), using=using
+    )
+
+
+def save(name, key, delay, kwargs):
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            tasks().create(
+                name=name, key=key, kwargs=kwargs,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # Такая же задача уже ждёт в очереди.
+        pass
+
+
+def claim(limit):
+    """Забирает до limit готовых задач и возвращает их id.
+
+    Выполняемая задача, у которой истёк run_at, считается брошенной
+    упавшим воркером. UPDATE с проверкой run_at не даст двум воркерам
+    забрать одну задачу.
+    """
+    now = timezone.now()
+    # Брошенная задача без оставшихся попыток больше не выполняется.
+    tasks().filter(
+        status=Task.RUNNING, run_at__lte=now, attempts__gte=max_attempts()
+    ).update(
+        status=Task.FAILED,
+        error='Воркер не завершил задачу за NOTES_TASK_TIMEOUT.',
+    )
+    ready = tasks().filter(
+        status__in=(Task.PENDING, Task.RUNNING), run_at__lte=now
+    )
+    claimed = []
+    for task_id in ready.order_by('run_at').values_list(
+            'id', flat=True)[:limit]:
+        if ready.filter(pk=task_id).update(
+                status=Task.RUNNING, run_at=now + timeout(),
+                attempts=F('attempts') + 1):
+            claimed.append(task_id)
+    return claimed
+
+
+def execute(task_id):
+    """Выполняет задачу: удачная удаляется, упавшая ждёт повтора."""
+    try:
+        job = _current.job = tasks().get(pk=task_id)
+        func = registry.get(job.name)
+        if func is None:
+            # Повтор не поможет: такой задачи нет в этой версии кода.
+            job.attempts = max_attempts()
+            fail(job, f'Нет задачи {job.name}.')
+            return
+        try:
+            func(**job.kwargs)
+        except Exception:
+            logger.exception('Задача %s упала', job)
+            fail(job, traceback.format_exc())
+        else:
+            job.delete()
+    finally:
+        _current.job = None
+        close_old_connections()
+
+
+def renew():
+    """Продлевает аренду выполняемой задачи на NOTES_TASK_TIMEOUT.
+
+    Возвращает False, если аренда уже истекла и задачу забрал другой
+    воркер: тогда продолжать её не нужно. Вне воркера всегда True.
+    """
+    job = getattr(_current, 'job', None)
+    if job is None:
+        return True
+    return bool(tasks().filter(
+        pk=job.pk, status=Task.RUNNING, attempts=job.attempts
+    ).update(run_at=timezone.now() + timeout()))
+
+
+def fail(job, error):
+    if job.attempts >= max_attempts():
+        job.status = Task.FAILED
+        job.error = error
+        job.save(update_fields=('status', 'error'))
+        return
+    job.status = Task.PENDING
+    job.run_at = timezone.now() + backoff(job.attempts)
+    job.error = error
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            job.save(update_fields=('status', 'run_at', 'error'))
+    except IntegrityError:
+        # Пока задача выполнялась, в очередь встала такая же.
+        job.delete()
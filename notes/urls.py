@@ -1,6 +1,6 @@
 from django.urls import path
 
-from notes import views
+from notes import api, async_views, views
 
 app_name = 'notes'
 
@@ -11,5 +11,35 @@ urlpatterns = [
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('notes/export/', views.NotesExport.as_view(), name='export'),
+    path(
+        'history/<slug:slug>/', views.NoteHistory.as_view(), name='history'
+    ),
+    path(
+        'history/<slug:slug>/<int:number>/',
+        views.NoteRevisionDetail.as_view(),
+        name='revision',
+    ),
+    path('search/', views.NoteSearch.as_view(), name='search'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path('metrics', views.Metrics.as_view(), name='metrics'),
+    path('api/notes/', api.NotesApi.as_view(), name='api-list'),
+    path(
+        'api/notes/batch/', api.NotesBatchApi.as_view(), name='api-batch'
+    ),
+    path('api/notes/<slug:slug>/', api.NoteApi.as_view(), name='api-detail'),
+    path('api/sync/', api.SyncApi.as_view(), name='api-sync'),
+    path('async/notes/', async_views.notes_list, name='async-list'),
+    path(
+        'async/note/<slug:slug>/', async_views.note_detail,
+        name='async-detail',
+    ),
+    path(
+        'async/api/notes/', async_views.api_notes_list,
+        name='async-api-list',
+    ),
+    path(
+        'async/api/notes/<slug:slug>/', async_views.api_note_detail,
+        name='async-api-detail',
+    ),
 ]
@@ -1,9 +1,21 @@
+from hashlib import md5
+
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.db import IntegrityError
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from .forms import NoteForm
+from . import (conditional, export, markup, metrics, revisions, search,
+               sharding, tags, write_queue)
+from .cache import CachedPageMixin
+from .forms import WARNING, NoteForm
 from .models import Note
+from .pagination import decode_cursor, paginate_keyset
 
 
 class Home(generic.TemplateView):
@@ -11,6 +23,18 @@ class Home(generic.TemplateView):
     template_name = 'notes/home.html'
 
 
+class Metrics(generic.View):
+    """Метрики процесса для Prometheus."""
+
+    def get(self, request):
+        if not metrics.is_enabled():
+            raise Http404
+        return HttpResponse(
+            metrics.render(write_queue.families()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+
 class NoteSuccess(LoginRequiredMixin, generic.TemplateView):
     """Страница успешного выполнения операции."""
     template_name = 'notes/success.html'
@@ -23,37 +47,229 @@ class NoteBase(LoginRequiredMixin):
 
     def get_queryset(self):
         """Пользователь может работать только со своими заметками."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.for_author(self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class NoteFormMixin:
+    """Сохранение формы заметки с защитой от гонки за slug.
+
+    Запись идёт через очередь групповой фиксации, если она включена.
+    """
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        try:
+            self.object = write_queue.run(
+                sharding.shard_for(self.request.user.pk), form.save
+            )
+        except IntegrityError:
+            # Между проверкой в форме и вставкой slug занял другой запрос.
+            form.add_error('slug', form.instance.slug + WARNING)
+            return self.form_invalid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class NoteCreate(NoteBase, NoteFormMixin, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteBase, NoteFormMixin, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
     """Удаление заметки."""
     template_name = 'notes/delete.html'
 
+    def get_queryset(self):
+        """Текст нужен только странице подтверждения."""
+        queryset = super().get_queryset()
+        if self.request.method == 'POST':
+            queryset = queryset.defer('text')
+        return queryset
+
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        success_url = self.get_success_url()
+        write_queue.run(
+            sharding.shard_for(request.user.pk), self.object.delete
+        )
+        return HttpResponseRedirect(success_url)
+
 
-class NotesList(NoteBase, generic.ListView):
+# Страницы личные: общие кеши их не хранят, браузер переспрашивает
+# сервер и получает 304, если ничего не изменилось.
+private_revalidate = cache_control(private=True, no_cache=True)
+
+
+@method_decorator(private_revalidate, name='get')
+@method_decorator(condition(etag_func=conditional.list_etag), name='get')
+class NotesList(NoteBase, CachedPageMixin, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
+    page_size = 50
+    cache_kind = 'list'
+
+    def get_cache_parts(self):
+        # Курсор приходит от пользователя: в ключ идёт проверенный id.
+        after = self.request.GET.get('after')
+        return (decode_cursor(after) if after else '', self.filter_key())
+
+    def filter_query(self):
+        """Параметры фильтра по тегам для ссылок на другие страницы."""
+        query = self.request.GET.copy()
+        query.pop('after', None)
+        return query.urlencode()
+
+    def selected_tags(self):
+        """Теги фильтра в том виде, в каком они хранятся."""
+        return tags.parse_list(self.request.GET.getlist('tag'))
+
+    def filter_key(self):
+        # В ключе кеша не может быть пробелов из имён тегов.
+        names = ','.join(sorted(self.selected_tags()))
+        key = f'{names}|{self.request.GET.get("match") == "any"}'
+        return md5(key.encode()).hexdigest()
+
+    def get_queryset(self):
+        """Только поля, которые выводятся в списке, в порядке id.
+
+        ?tag=a&tag=b оставляет заметки с обоими тегами, с
+        &match=any - с любым из них.
+        """
+        queryset = super().get_queryset().only(
+            'id', 'title', 'slug'
+        ).order_by('id').prefetch_related(tags.prefetch())
+        names = self.selected_tags()
+        if names:
+            queryset = tags.filter_notes(
+                queryset, self.request.user.pk, names,
+                match_any=self.request.GET.get('match') == 'any',
+            )
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        page, next_cursor = paginate_keyset(
+            self.object_list, self.request.GET.get('after'), self.page_size
+        )
+        return super().get_context_data(
+            object_list=page, next_cursor=next_cursor,
+            filter_query=self.filter_query(),
+            tags=tags.counts(self.request.user.pk),
+            selected_tags=self.selected_tags(), **kwargs
+        )
+
+
+class NotesExport(NoteBase, generic.View):
+    """Все заметки пользователя одним файлом: NDJSON или ZIP."""
+
+    def get(self, request):
+        kind = request.GET.get('format', 'ndjson')
+        queryset = self.get_queryset()
+        if kind == 'zip':
+            response = StreamingHttpResponse(
+                export.zip_archive(queryset), content_type='application/zip'
+            )
+        elif kind == 'ndjson':
+            response = StreamingHttpResponse(
+                export.ndjson(queryset, request.user.username),
+                content_type='application/x-ndjson',
+            )
+        else:
+            raise Http404('Неизвестный формат выгрузки.')
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes-{request.user.pk}.{kind}"'
+        )
+        return response
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/list.html'
+    limit = 50
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return []
+        return search.search(
+            super().get_queryset().only('id', 'title', 'slug')
+            .prefetch_related(tags.prefetch()),
+            self.request.user.pk,
+            self.query,
+            self.limit,
+        )
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(query=self.query, **kwargs)
 
 
-class NoteDetail(NoteBase, generic.DetailView):
+@method_decorator(private_revalidate, name='get')
+@method_decorator(
+    condition(
+        etag_func=conditional.detail_etag,
+        last_modified_func=conditional.detail_last_modified,
+    ),
+    name='get',
+)
+class NoteDetail(NoteBase, CachedPageMixin, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+    cache_kind = 'detail'
+
+    def get_queryset(self):
+        """Страница выводит готовый HTML, исходный текст не нужен."""
+        return super().get_queryset().defer('text')
+
+    def get_cache_parts(self):
+        # HTML устаревшей версии рендерится заново при новом VERSION.
+        return (self.kwargs['slug'], markup.VERSION)
+
+
+class NoteHistory(NoteBase, generic.DetailView):
+    """История правок заметки."""
+    template_name = 'notes/history.html'
+
+    def get_queryset(self):
+        return super().get_queryset().only('id', 'title', 'slug', 'author')
+
+    def get_context_data(self, **kwargs):
+        history = self.object.revisions.only(
+            'id', 'note', 'number', 'title', 'is_snapshot', 'created_at'
+        ).order_by('-number')
+        return super().get_context_data(history=history, **kwargs)
+
+
+class NoteRevisionDetail(NoteBase, generic.DetailView):
+    """Ревизия заметки; POST восстанавливает её."""
+    template_name = 'notes/revision.html'
+
+    def get_queryset(self):
+        return super().get_queryset().defer('text')
+
+    def get_object(self, queryset=None):
+        note = super().get_object(queryset)
+        revision = revisions.load(note, self.kwargs['number'])
+        if revision is None:
+            raise Http404('Нет такой ревизии.')
+        self.revision = dict(
+            zip(('title', 'text'), revision), number=self.kwargs['number']
+        )
+        return note
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(revision=self.revision, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        note = self.get_object()
+        note.title = self.revision['title']
+        note.text = self.revision['text']
+        write_queue.run(sharding.shard_for(request.user.pk), note.save)
+        return HttpResponseRedirect(
+            reverse('notes:detail', args=(note.slug,))
+        )
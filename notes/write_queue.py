@@ -0,0 +1,198 @@
+"""Групповая фиксация записей заметок для SQLite.
+
+SQLite пропускает только одного писателя, и каждая отдельная фиксация
+платит за fsync. Очередь собирает записи из параллельных запросов за
+окно в несколько миллисекунд и выполняет их одной транзакцией в
+отдельном потоке, своём для каждого шарда; каждая запись идёт в своей
+точке сохранения, поэтому ошибка одной (например, занятый slug) не
+откатывает соседние, а исключение возвращается именно тому запросу,
+который её вызвал. Статистика очередей публикуется на /metrics.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Статистика очередей на /metrics: (имя, тип, ключ get_stats, описание).
+METRICS = (
+    ('yanote_write_queue_submitted_total', 'counter', 'submitted',
+     'Записи, отправленные в очередь.'),
+    ('yanote_write_queue_failed_total', 'counter', 'failed',
+     'Записи, завершившиеся ошибкой.'),
+    ('yanote_write_queue_batches_total', 'counter', 'batches',
+     'Зафиксированные пачки записей.'),
+    ('yanote_write_queue_commit_seconds_total', 'counter', 'commit_seconds',
+     'Время выполнения и фиксации пачек.'),
+    ('yanote_write_queue_wait_seconds_total', 'counter', 'wait_seconds',
+     'Суммарное ожидание записей до ответа.'),
+    ('yanote_write_queue_restarts_total', 'counter', 'restarts',
+     'Перезапуски упавшего потока-писателя.'),
+    ('yanote_write_queue_depth', 'gauge', 'queued',
+     'Записи, ждущие в очереди.'),
+)
+
+
+def is_enabled():
+    return getattr(settings, 'NOTES_WRITE_QUEUE_ENABLED', False)
+
+
+class WriteQueue:
+    """Очередь записей с фиксацией пачками в одном потоке-писателе."""
+
+    def __init__(self, window=0.005, max_batch=100, timeout=30,
+                 using=DEFAULT_DB_ALIAS):
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.using = using
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            'submitted': 0, 'succeeded': 0, 'failed': 0, 'batches': 0,
+            'max_batch': 0, 'commit_seconds': 0.0, 'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0, 'restarts': 0,
+        }
+
+    def submit(self, func, *args, **kwargs):
+        """Выполняет func в общей транзакции и возвращает её результат."""
+        self._ensure_thread()
+        future = Future()
+        future.submitted_at = time.perf_counter()
+        self._queue.put((future, func, args, kwargs))
+        return future.result(timeout=self.timeout)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _ensure_thread(self):
+        with self._lock:
+            # После fork поток-писатель в дочернем процессе не существует.
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = None
+            if self._thread is not None and not self._thread.is_alive():
+                # Ждущие записи остаются в очереди для нового потока.
+                logger.error('Поток записи в %s упал, перезапуск', self.using)
+                self._stats['restarts'] += 1
+                self._thread = None
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'notes-write-queue-{self.using}',
+                    daemon=True,
+                )
+                self._thread.start()
+            self._stats['submitted'] += 1
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            close_old_connections()
+            started = time.perf_counter()
+            outcomes = self._commit(batch)
+            self._finish(batch, outcomes, time.perf_counter() - started)
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for _, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((func(*args, **kwargs), None))
+                    except Exception as error:
+                        outcomes.append((None, error))
+        except Exception as error:
+            # Не удалась сама фиксация: ошибка достаётся всей пачке.
+            return [(None, error)] * len(batch)
+        return outcomes
+
+    def _finish(self, batch, outcomes, commit_seconds):
+        now = time.perf_counter()
+        failed = sum(error is not None for _, error in outcomes)
+        waits = [now - future.submitted_at for future, *_ in batch]
+        with self._lock:
+            stats = self._stats
+            stats['batches'] += 1
+            stats['succeeded'] += len(batch) - failed
+            stats['failed'] += failed
+            stats['max_batch'] = max(stats['max_batch'], len(batch))
+            stats['commit_seconds'] += commit_seconds
+            stats['wait_seconds'] += sum(waits)
+            stats['max_wait_seconds'] = max(
+                stats['max_wait_seconds'], *waits
+            )
+        for (future, *_), (result, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+
+def get_write_queue(using=DEFAULT_DB_ALIAS):
+    """Очередь базы using: у каждого шарда свой писатель."""
+    with _write_queues_lock:
+        if using not in _write_queues:
+            _write_queues[using] = WriteQueue(
+                window=getattr(
+                    settings, 'NOTES_WRITE_QUEUE_WINDOW_MS', 5
+                ) / 1000,
+                max_batch=getattr(
+                    settings, 'NOTES_WRITE_QUEUE_MAX_BATCH', 100
+                ),
+                using=using,
+            )
+        return _write_queues[using]
+
+
+def run(using, func, *args, **kwargs):
+    """Выполняет запись в базу using через очередь или сразу."""
+    if is_enabled():
+        return get_write_queue(using).submit(func, *args, **kwargs)
+    with transaction.atomic(using=using):
+        return func(*args, **kwargs)
+
+
+def families():
+    """Статистика созданных очередей для metrics.render()."""
+    with _write_queues_lock:
+        stats = {
+            alias: write_queue.get_stats()
+            for alias, write_queue in sorted(_write_queues.items())
+        }
+    return [
+        (name, kind, description, [
+            ((('db', alias),), values[key])
+            for alias, values in stats.items()
+        ])
+        for name, kind, key, description in METRICS
+    ]
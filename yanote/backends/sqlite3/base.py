@@ -0,0 +1,71 @@
+"""SQLite с настройкой соединения для боевой нагрузки.
+
+Дополнительные ключи OPTIONS (в sqlite3.connect не передаются):
+
+* init_pragmas - словарь PRAGMA, которые выполняются на каждом новом
+  соединении поверх DEFAULT_PRAGMAS;
+* transaction_mode - DEFERRED (по умолчанию), IMMEDIATE или EXCLUSIVE.
+  В режиме WAL IMMEDIATE берёт блокировку записи в начале транзакции,
+  и писатели ждут друг друга по busy_timeout вместо немедленной ошибки
+  "database is locked" при повышении блокировки.
+
+Соединения переиспользуются между запросами через CONN_MAX_AGE.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+OWN_OPTIONS = ('init_pragmas', 'transaction_mode')
+
+NAME_RE = re.compile(r'[a-z_]+')
+VALUE_RE = re.compile(r'-?\d+|[A-Za-z_]+')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pragmas(self):
+        pragmas = {
+            **DEFAULT_PRAGMAS,
+            **self.settings_dict['OPTIONS'].get('init_pragmas', {}),
+        }
+        for name, value in pragmas.items():
+            if not NAME_RE.fullmatch(name) or not VALUE_RE.fullmatch(
+                    str(value)):
+                raise ImproperlyConfigured(
+                    f'Недопустимая PRAGMA в init_pragmas: {name}={value}'
+                )
+        return pragmas
+
+    def get_transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get(
+            'transaction_mode', 'DEFERRED'
+        ).upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из {TRANSACTION_MODES}'
+            )
+        return mode
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in OWN_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.get_pragmas().items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.get_transaction_mode()}')
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -22,11 +23,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'notes.middleware.CachedAuthenticationMiddleware',
+    'notes.middleware.ReadReplicaMiddleware',
+    'notes.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,11 +58,64 @@ WSGI_APPLICATION = 'yanote.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # SQLite с WAL и PRAGMA из OPTIONS, см. yanote/backends/sqlite3.
+        'ENGINE': 'yanote.backends.sqlite3',
+        # Бенчмарки подставляют сюда свой файл, чтобы не трогать рабочую базу.
+        'NAME': os.environ.get('YANOTE_DATABASE', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'init_pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'cache_size': -20000,
+                'mmap_size': 134217728,
+            },
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Копия default для чтения, обновляется командой refresh_replica.
+    # Соединения не переиспользуются, чтобы сразу видеть новый снимок.
+    'replica': {
+        'ENGINE': 'yanote.backends.sqlite3',
+        'NAME': os.environ.get(
+            'YANOTE_REPLICA_DATABASE', BASE_DIR / 'db.replica.sqlite3'
+        ),
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'init_pragmas': {'journal_mode': 'DELETE', 'query_only': 1},
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Второй шард. Заметки попадают в него, только если он указан в
+# NOTES_SHARDS; тесты проверяют на нём работу с двумя шардами.
+DATABASES['shard_1'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get(
+        'YANOTE_SHARD_DATABASE', BASE_DIR / 'db.shard_1.sqlite3'
+    ),
+}
+
+DATABASE_ROUTERS = [
+    'notes.routers.ShardRouter',
+    'notes.routers.ReadReplicaRouter',
+]
+
+# Базы, по которым раскладываются заметки авторов, см. notes/sharding.py.
+# Перед первым включением второго шарда на базе с заметками запустите
+# manage.py prepare_shards (до или сразу после изменения списка, до
+# перезапуска): иначе авторы уйдут в шард по хешу, а их заметки
+# останутся в default, и реестр slug не будет знать старые slug.
+NOTES_SHARDS = ['default']
+
+# Псевдоним реплики для чтения заметок; включать после первого
+# manage.py refresh_replica. Метки записи авторов и снимка хранятся в
+# кеше, поэтому CACHES['default'] должен быть общим для процессов
+# (проверка notes.E001).
+NOTES_READ_REPLICA = None
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -85,5 +142,62 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Кеш отрисованных страниц списка и заметки, см. notes/cache.py.
+NOTES_CACHE_ENABLED = False
+NOTES_CACHE_TIMEOUT = 300
+
+# Размер пула потоков для запросов к базе из асинхронных страниц.
+NOTES_ASYNC_DB_WORKERS = 8
+
+# Групповая фиксация записей заметок, см. notes/write_queue.py.
+NOTES_WRITE_QUEUE_ENABLED = False
+NOTES_WRITE_QUEUE_WINDOW_MS = 5
+NOTES_WRITE_QUEUE_MAX_BATCH = 100
+
+# Кеш сессий и пользователей, см. notes/auth_cache.py. Сессии кешируются
+# только с SESSION_ENGINE = 'notes.sessions'.
+NOTES_AUTH_CACHE_ENABLED = False
+NOTES_AUTH_CACHE_TIMEOUT = 300
+NOTES_AUTH_CACHE_SIZE = 1024
+NOTES_AUTH_CACHE_LOCAL_TTL = 5
+
+# Метрики по именам URL на /metrics и лог медленных запросов,
+# см. notes/metrics.py.
+NOTES_METRICS_ENABLED = False
+NOTES_SLOW_REQUEST_MS = 500
+
+# Выборочное профилирование запросов, см. notes/profiling.py.
+NOTES_PROFILE_SAMPLE_RATE = 0.0
+NOTES_PROFILE_DIR = os.environ.get(
+    'YANOTE_PROFILE_DIR', BASE_DIR / 'profiles'
+)
+NOTES_PROFILE_MAX_FILES = 500
+NOTES_PROFILE_MAX_SHARE = 0.05
+
+# Текст заметки короче этого числа байт хранится без сжатия,
+# см. notes/fields.py.
+NOTES_TEXT_COMPRESS_MIN = 1024
+
+# Как часто история заметки сохраняет полный снимок вместо разницы,
+# см. notes/revisions.py.
+NOTES_REVISION_SNAPSHOT_EVERY = 10
+
+# Помеченные удалёнными заметки purge_notes удаляет пачками по столько
+# строк с паузой между пачками, см. notes/purge.py.
+NOTES_PURGE_BATCH_SIZE = 200
+NOTES_PURGE_PAUSE_MS = 50
+
+# Фоновые задачи выполняет manage.py run_worker, см. notes/tasks.py.
+# Без запущенного воркера не обновляются поисковый индекс и HTML
+# заметок из пакетного API и не очищаются удалённые заметки, поэтому
+# рядом с сервером всегда должен работать run_worker.
+# С NOTES_TASKS_EAGER задачи выполняются сразу, без воркера.
+NOTES_TASKS_EAGER = False
+NOTES_TASK_MAX_ATTEMPTS = 5
+# Пауза перед повтором удваивается с каждой попыткой.
+NOTES_TASK_BACKOFF_SECONDS = 5
+# Через столько секунд задачу упавшего воркера забирает другой.
+NOTES_TASK_TIMEOUT = 300
+
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')